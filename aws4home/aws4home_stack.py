@@ -1,5 +1,6 @@
+import json
+
 from aws_cdk import (
-    BundlingOptions,
     DockerImage,
     Duration,
     Stack,
@@ -8,10 +9,16 @@ from aws_cdk import (
     aws_iam as iam,
     aws_lambda as lambda_,
     aws_logs as logs,
-    aws_route53 as route53
+    aws_route53 as route53,
+    aws_lambda_event_sources as event_sources,
+    aws_scheduler as scheduler,
+    aws_sqs as sqs,
+    aws_ssm as ssm
 )
 from constructs import Construct
 
+from aws4home import bundling
+
 class Aws4HomeStack(Stack):
 
     def __init__(self, scope: Construct, construct_id: str, params={}, **kwargs) -> None:
@@ -23,16 +30,45 @@ class Aws4HomeStack(Stack):
         deploy_region = params['DeployRegion']
         iss_prefix = params['IssPrefix']
         iss_url = params['IssUrl']
+        iss_tle_url = params.get('IssTleUrl', "https://celestrak.org/NORAD/elements/gp.php?CATNR=25544&FORMAT=TLE")
+        iss_min_elevation = params.get('IssMinElevation', "10")
+        iss_state_backend = params.get('IssStateBackend', "ssm")
+        iss_route53_mirror = params.get('IssRoute53Mirror', False)
         iss_long = params['IssLongitude']
         iss_lat = params['IssLatitude']
+        # Optional: several homes, [{"name", "latitude", "longitude", "topic", "tz"}], served by the one ISS function
+        iss_locations = params.get('IssLocations', [])
         bond_prefix = params['BondPrefix']
         bond_url = params['BondUrl']
+        bond_cache_ttl = params.get('BondCacheTtl', "21600")
         lunar_prefix = params['LunarPrefix']
+        # Moon events the lunar lander lights up for (moonrise, new, full), at the ISS home unless configured
+        lunar_events = params.get('LunarEvents', ["moonrise"])
+        lunar_lat = params.get('LunarLatitude', iss_lat)
+        lunar_long = params.get('LunarLongitude', iss_long)
         domain_name = params['DomainName']
         mqtt_topic = params['MqttTopic']
         tz = params['TimeZone']
         powertools_layer_arn = params['Layers']['Powertools']
         garagedoor_shadow_prefix = params['GaragedoorShadowPrefix']
+        garagedoor_shadow_queue = params.get('GaragedoorShadowQueue', False)
+        materialize_schedules = params.get('MaterializeSchedules', False)
+        tracing_enabled = params.get('Tracing', True)
+        consolidated = params.get('Consolidated', False)
+        # Optional: one timeline and rule for every display instead of a rule per feature, see function/timeline
+        timeline_enabled = params.get('Timeline', False)
+        timeline_prefix = params.get('TimelinePrefix', "timeline")
+        timeline_priorities = params.get('TimelinePriorities', {iss_prefix: 30, lunar_prefix: 20, bond_prefix: 10})
+        timeline_preempt = params.get('TimelinePreempt', True)
+        if timeline_enabled and materialize_schedules:
+            raise ValueError("Timeline and MaterializeSchedules can't be combined")
+        # Logging policy of every function, see aws4home_runtime/logpolicy.py
+        log_environment = {
+            "LOG_LEVEL": params.get('LogLevel', "INFO"),
+            "AWS4HOME_LOG_DEBUG_SAMPLE_RATE": str(params.get('LogDebugSampleRate', 0.01)),
+            "AWS4HOME_LOG_EVENT": str(params.get('LogEvent', True)).lower(),
+            "AWS4HOME_LOG_EVENT_MAX_BYTES": str(params.get('LogEventMaxBytes', 2048)),
+        }
 
         hosted_zone = route53.HostedZone.from_lookup(
             self, 'HostedZone',
@@ -40,91 +76,164 @@ class Aws4HomeStack(Stack):
             private_zone=False
         )
 
+        # Optional: upcoming passes/shows are written as one-time schedules instead of re-scheduling one rule
+        schedule_env = {}
+        if materialize_schedules:
+            schedule_group = scheduler.CfnScheduleGroup(
+                self, 'ScheduleGroup',
+                name="aws4home"
+            )
+            scheduler_role = iam.Role(
+                self, 'RoleScheduler',
+                assumed_by=iam.ServicePrincipal("scheduler.amazonaws.com"),
+                description="Invokes aws4home functions from one-time schedules"
+            )
+            schedule_env = {
+                "SCHEDULE_GROUP": schedule_group.name,
+                "SCHEDULE_ROLE_ARN": scheduler_role.role_arn
+            }
+
+        timeline_env = {}
+        if timeline_enabled:
+            timeline_env = {
+                "TIMELINE_PREFIX": timeline_prefix,
+                "TIMELINE_SOURCES": ",".join([iss_prefix, bond_prefix, lunar_prefix]),
+                "TIMELINE_PRIORITIES": json.dumps(timeline_priorities),
+                "TIMELINE_PREEMPT": str(timeline_preempt).lower()
+            }
+
         powertools = lambda_.LayerVersion.from_layer_version_arn(
             self,
             id="LayerPowertools",
             layer_version_arn=powertools_layer_arn
         )
 
-        requests = lambda_.LayerVersion(
-            self, 'LayerRequests',
-            code=lambda_.Code.from_asset(
-                'layer/requests',
-                bundling=BundlingOptions(
-                    image=lambda_.Runtime.PYTHON_3_12.bundling_image,
-                    command=[
-                        "bash", "-c",
-                        "mkdir /asset-output/python && pip install -r requirements.txt -t /asset-output/python && cp -au . /asset-output"
-                    ]
-                )
-            ),
+        runtime = lambda_.LayerVersion(
+            self, 'LayerRuntime',
+            code=lambda_.Code.from_asset('layer/runtime'),
+            description="Shared aws4home runtime (warm AWS client pool)",
             compatible_runtimes=[lambda_.Runtime.PYTHON_3_12],
             compatible_architectures=[
                 lambda_.Architecture.ARM_64]
         )
 
-        pytz = lambda_.LayerVersion(
-            self, 'LayerPytz',
-            code=lambda_.Code.from_asset(
-                'layer/pytz',
-                bundling=BundlingOptions(
-                    image=lambda_.Runtime.PYTHON_3_12.bundling_image,
-                    command=[
-                        "bash", "-c",
-                        "mkdir /asset-output/python && pip install -r requirements.txt -t /asset-output/python && cp -au . /asset-output"
-                    ]
-                )
-            ),
-            compatible_runtimes=[lambda_.Runtime.PYTHON_3_12],
-            compatible_architectures=[
-                lambda_.Architecture.ARM_64]
-        )
+        # One stripped, precompiled dependency layer per function, see aws4home/bundling.py
+        if consolidated:
+            deps_router = lambda_.LayerVersion(
+                self, 'LayerDepsRouter',
+                code=bundling.dependency_layer_code('router', lambda_.Runtime.PYTHON_3_12, lambda_.Architecture.ARM_64),
+                description="Dependencies of all features (bs4, numpy, requests)",
+                compatible_runtimes=[lambda_.Runtime.PYTHON_3_12],
+                compatible_architectures=[
+                    lambda_.Architecture.ARM_64]
+            )
+            deps_iss = deps_bond = None
+        else:
+            deps_iss = lambda_.LayerVersion(
+                self, 'LayerDepsIss',
+                code=bundling.dependency_layer_code('iss', lambda_.Runtime.PYTHON_3_12, lambda_.Architecture.ARM_64),
+                description="ISS dependencies (numpy, requests)",
+                compatible_runtimes=[lambda_.Runtime.PYTHON_3_12],
+                compatible_architectures=[
+                    lambda_.Architecture.ARM_64]
+            )
 
-        bs4 = lambda_.LayerVersion(
-            self, 'LayerBs4',
-            code=lambda_.Code.from_asset(
-                'layer/bs4',
-                bundling=BundlingOptions(
-                    image=lambda_.Runtime.PYTHON_3_12.bundling_image,
-                    command=[
-                        "bash", "-c",
-                        "mkdir /asset-output/python && pip install -r requirements.txt -t /asset-output/python && cp -au . /asset-output"
-                    ]
-                )
-            ),
-            compatible_runtimes=[lambda_.Runtime.PYTHON_3_12],
-            compatible_architectures=[
-                lambda_.Architecture.ARM_64]
-        )
+            deps_bond = lambda_.LayerVersion(
+                self, 'LayerDepsBond',
+                code=bundling.dependency_layer_code('bond', lambda_.Runtime.PYTHON_3_12, lambda_.Architecture.ARM_64),
+                description="Bond dependencies (bs4, requests)",
+                compatible_runtimes=[lambda_.Runtime.PYTHON_3_12],
+                compatible_architectures=[
+                    lambda_.Architecture.ARM_64]
+            )
 
-        iss = lambda_.Function(
-            self, 'FnIss',
-            runtime=lambda_.Runtime.PYTHON_3_12,
-            architecture=lambda_.Architecture.ARM_64,
-            code=lambda_.Code.from_asset(
-                'function/iss',
-                bundling=BundlingOptions(
-                    image=lambda_.Runtime.PYTHON_3_12.bundling_image,
-                    command=[
-                        "bash", "-c","cp -au . /asset-output"
-                    ]
-                )
-            ),
-            handler="index.handler",
-            layers=[powertools, pytz, requests],
-            tracing=lambda_.Tracing.ACTIVE,
-            timeout=Duration.seconds(60),
-            memory_size=128,
+        # Optional: one function for all features, see function/router. Features are merged into it
+        # (environment, permissions, triggers) instead of being deployed as functions of their own,
+        # so rare invocations share one warm execution environment instead of cold starting four.
+        router = None
+        if consolidated:
+            router = lambda_.Function(
+                self, 'FnRouter',
+                runtime=lambda_.Runtime.PYTHON_3_12,
+                architecture=lambda_.Architecture.ARM_64,
+                code=bundling.function_code('function'),
+                handler="router/index.handler",
+                layers=[deps_router, powertools, runtime],
+                tracing=lambda_.Tracing.ACTIVE if tracing_enabled else lambda_.Tracing.DISABLED,
+                timeout=Duration.seconds(60),
+                # NumPy and bs4 in one process
+                memory_size=256,
+                environment={
+                    **log_environment,
+                    "POWERTOOLS_SERVICE_NAME": "aws4home",
+                    "AWS4HOME_ROUTES": json.dumps({
+                        iss_prefix: "iss",
+                        bond_prefix: "bond",
+                        lunar_prefix: "lunar-lander",
+                        garagedoor_shadow_prefix: "garagedoor-shadow",
+                        **({timeline_prefix: "timeline"} if timeline_enabled else {})
+                    }),
+                    # Sensor states sent straight to the function
+                    "AWS4HOME_DEFAULT_ROUTE": garagedoor_shadow_prefix
+                },
+                log_retention=logs.RetentionDays.ONE_MONTH
+            )
+
+        def feature_function(construct_id, path, layers, environment, initial_policy):
+            if router is not None:
+                for key, value in environment.items():
+                    if key != "POWERTOOLS_SERVICE_NAME":
+                        router.add_environment(key, value)
+                for statement in initial_policy:
+                    router.add_to_role_policy(statement)
+                return router
+            return lambda_.Function(
+                self, construct_id,
+                runtime=lambda_.Runtime.PYTHON_3_12,
+                architecture=lambda_.Architecture.ARM_64,
+                code=bundling.function_code(path),
+                handler="index.handler",
+                layers=layers,
+                tracing=lambda_.Tracing.ACTIVE if tracing_enabled else lambda_.Tracing.DISABLED,
+                timeout=Duration.seconds(60),
+                memory_size=128,
+                environment=environment,
+                initial_policy=initial_policy,
+                log_retention=logs.RetentionDays.ONE_MONTH
+            )
+
+        # Only the ssm state backend keeps the state in a parameter
+        iss_state = None
+        if iss_state_backend == "ssm":
+            iss_state = ssm.StringParameter(
+                self, 'ParameterIssState',
+                parameter_name=f"/{iss_prefix}/state",
+                description="Duration and risetime of the next ISS pass, handed from one run to the next",
+                string_value="{\"duration\": \"0\"}"
+            )
+
+        iss = feature_function(
+            'FnIss', 'function/iss', [deps_iss, powertools, runtime],
             environment={
-                "LOG_LEVEL": "DEBUG",
+                **log_environment,
                 "POWERTOOLS_SERVICE_NAME": iss_prefix,
+                "POWERTOOLS_METRICS_NAMESPACE": "aws4home",
+                "POWERTOOLS_TRACE_DISABLED": str(not tracing_enabled).lower(),
                 "HOSTED_ZONE_ID": hosted_zone.hosted_zone_id,
                 "ISS_PREFIX": iss_prefix,
                 "ISS_URL": iss_url,
+                "ISS_TLE_URL": iss_tle_url,
+                "ISS_MIN_ELEVATION": iss_min_elevation,
+                "STATE_BACKEND": iss_state_backend,
+                **({"STATE_PARAMETER": iss_state.parameter_name} if iss_state is not None else {}),
+                "STATE_ROUTE53_MIRROR": str(iss_route53_mirror).lower(),
                 "LATITUDE": iss_lat,
                 "LONGITUDE": iss_long,
+                "ISS_LOCATIONS": json.dumps(iss_locations),
                 "TZ": tz,
-                "MQTT_TOPIC": mqtt_topic
+                "MQTT_TOPIC": mqtt_topic,
+                **schedule_env,
+                **timeline_env
             },
             initial_policy=[
                 iam.PolicyStatement(
@@ -166,51 +275,44 @@ class Aws4HomeStack(Stack):
                         f"arn:aws:route53:::hostedzone/{hosted_zone.hosted_zone_id}"
                     ]
                 )
-            ],
-            log_retention=logs.RetentionDays.ONE_MONTH
+            ]
         )
         rule_iss = events.Rule(
             self, 'RuleIss',
             description=f"Scheduled trigger for {iss.function_name}",
-            schedule=events.Schedule.rate(Duration.minutes(15)),
+            schedule=events.Schedule.rate(Duration.hours(6) if materialize_schedules or timeline_enabled else Duration.minutes(15)),
             enabled=True,
             rule_name=iss_prefix
         )
         rule_iss.add_target(targets.LambdaFunction(iss))
-        route53.RecordSet(
-            self, 'RecordIssDuration',
-            record_type=route53.RecordType.TXT,
-            record_name=f"duration.{iss_prefix}.{domain_name}",
-            target=route53.RecordTarget.from_values("\"0\""),
-            zone=hosted_zone
-        )
+        if iss_state is not None:
+            iss_state.grant_read(iss)
+            iss_state.grant_write(iss)
+        # TXT records are only a mirror of the state parameter, unless they are the state backend itself
+        if iss_route53_mirror or iss_state_backend == "route53":
+            route53.RecordSet(
+                self, 'RecordIssDuration',
+                record_type=route53.RecordType.TXT,
+                record_name=f"duration.{iss_prefix}.{domain_name}",
+                target=route53.RecordTarget.from_values("\"0\""),
+                zone=hosted_zone
+            )
 
 
-        bond = lambda_.Function(
-            self, 'FnBond',
-            runtime=lambda_.Runtime.PYTHON_3_12,
-            architecture=lambda_.Architecture.ARM_64,
-            code=lambda_.Code.from_asset(
-                'function/bond',
-                bundling=BundlingOptions(
-                    image=lambda_.Runtime.PYTHON_3_12.bundling_image,
-                    command=[
-                        "bash", "-c","cp -au . /asset-output"
-                    ]
-                )
-            ),
-            handler="index.handler",
-            layers=[bs4, powertools, pytz, requests],
-            tracing=lambda_.Tracing.ACTIVE,
-            timeout=Duration.seconds(60),
-            memory_size=128,
+        bond = feature_function(
+            'FnBond', 'function/bond', [deps_bond, powertools, runtime],
             environment={
-                "LOG_LEVEL": "DEBUG",
+                **log_environment,
                 "POWERTOOLS_SERVICE_NAME": bond_prefix,
+                "POWERTOOLS_METRICS_NAMESPACE": "aws4home",
+                "POWERTOOLS_TRACE_DISABLED": str(not tracing_enabled).lower(),
                 "BOND_PREFIX": bond_prefix,
                 "BOND_URL": bond_url,
+                "BOND_CACHE_TTL": bond_cache_ttl,
                 "TZ": tz,
-                "MQTT_TOPIC": mqtt_topic
+                "MQTT_TOPIC": mqtt_topic,
+                **schedule_env,
+                **timeline_env
             },
             initial_policy=[
                 iam.PolicyStatement(
@@ -241,42 +343,43 @@ class Aws4HomeStack(Stack):
                         f"arn:aws:iot:{deploy_region}:{deploy_account_id}:client/*"
                     ]
                 )
-            ],
-            log_retention=logs.RetentionDays.ONE_MONTH
+            ]
         )
         rule_bond = events.Rule(
             self, 'RuleBond',
             description=f"Scheduled trigger for {bond.function_name}",
-            schedule=events.Schedule.rate(Duration.days(7)),
+            schedule=events.Schedule.rate(Duration.days(1) if materialize_schedules or timeline_enabled else Duration.days(7)),
             enabled=True,
             rule_name=bond_prefix
         )
         rule_bond.add_target(targets.LambdaFunction(bond))
 
-        lunar_lander = lambda_.Function(
-            self, 'FnLunarLander',
-            runtime=lambda_.Runtime.PYTHON_3_12,
-            architecture=lambda_.Architecture.ARM_64,
-            code=lambda_.Code.from_asset(
-                'function/lunar-lander',
-                bundling=BundlingOptions(
-                    image=lambda_.Runtime.PYTHON_3_12.bundling_image,
-                    command=[
-                        "bash", "-c","cp -au . /asset-output"
-                    ]
-                )
-            ),
-            handler="index.handler",
-            layers=[powertools],
-            tracing=lambda_.Tracing.ACTIVE,
-            timeout=Duration.seconds(60),
-            memory_size=128,
+        lunar_lander = feature_function(
+            'FnLunarLander', 'function/lunar-lander', [powertools, runtime],
             environment={
-                "LOG_LEVEL": "DEBUG",
+                **log_environment,
                 "POWERTOOLS_SERVICE_NAME": lunar_prefix,
-                "MQTT_TOPIC": mqtt_topic
+                "POWERTOOLS_METRICS_NAMESPACE": "aws4home",
+                "POWERTOOLS_TRACE_DISABLED": str(not tracing_enabled).lower(),
+                "LUNAR_PREFIX": lunar_prefix,
+                "LUNAR_EVENTS": ",".join(lunar_events),
+                "LUNAR_LATITUDE": lunar_lat,
+                "LUNAR_LONGITUDE": lunar_long,
+                "MQTT_TOPIC": mqtt_topic,
+                **schedule_env,
+                **timeline_env
             },
             initial_policy=[
+                iam.PolicyStatement(
+                    effect=iam.Effect.ALLOW,
+                    actions=[
+                        "events:DisableRule",
+                        "events:PutRule"
+                    ],
+                    resources=[
+                        f"arn:aws:events:{deploy_region}:{deploy_account_id}:rule/{lunar_prefix}*"
+                    ]
+                ),
                 iam.PolicyStatement(
                     effect=iam.Effect.ALLOW,
                     actions=[
@@ -295,53 +398,176 @@ class Aws4HomeStack(Stack):
                         f"arn:aws:iot:{deploy_region}:{deploy_account_id}:client/*"
                     ]
                 )
-            ],
-            log_retention=logs.RetentionDays.ONE_MONTH
+            ]
         )
-        # rule_lunar_lander = events.Rule(
-        #     self, 'RuleLunarLander',
-        #     description=f"Scheduled trigger for {lunar_lander.function_name}",
-        #     schedule=events.Schedule.cron(minute="17", hour="20"),
-        #     enabled=True,
-        #     rule_name=lunar_prefix
-        # )
-        # rule_lunar_lander.add_target(targets.LambdaFunction(lunar_lander))
+        # Re-scheduled by the function to the next moon event, see function/lunar-lander/ephemeris.py
+        rule_lunar_lander = events.Rule(
+            self, 'RuleLunarLander',
+            description=f"Scheduled trigger for {lunar_lander.function_name}",
+            schedule=events.Schedule.rate(Duration.days(1)),
+            enabled=True,
+            rule_name=lunar_prefix
+        )
+        rule_lunar_lander.add_target(targets.LambdaFunction(lunar_lander))
 
-        garagedoor_shadow = lambda_.Function(
-            self, 'FnGaragedoorShadow',
-            runtime=lambda_.Runtime.PYTHON_3_12,
-            architecture=lambda_.Architecture.ARM_64,
-            code=lambda_.Code.from_asset(
-                'function/garagedoor-shadow',
-                bundling=BundlingOptions(
-                    image=lambda_.Runtime.PYTHON_3_12.bundling_image,
-                    command=[
-                        "bash", "-c","cp -au . /asset-output"
-                    ]
+        if materialize_schedules:
+            for prefix, function in ((iss_prefix, iss), (bond_prefix, bond), (lunar_prefix, lunar_lander)):
+                function.grant_invoke(scheduler_role)
+                function.add_to_role_policy(
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=[
+                            "scheduler:CreateSchedule",
+                            "scheduler:DeleteSchedule"
+                        ],
+                        resources=[
+                            f"arn:aws:scheduler:{deploy_region}:{deploy_account_id}:schedule/{schedule_group.name}/{prefix}-*"
+                        ]
+                    )
                 )
-            ),
-            handler="index.handler",
-            layers=[powertools],
-            tracing=lambda_.Tracing.ACTIVE,
-            timeout=Duration.seconds(60),
-            memory_size=128,
+                function.add_to_role_policy(
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=[
+                            "scheduler:ListSchedules"
+                        ],
+                        resources=["*"]
+                    )
+                )
+                function.add_to_role_policy(
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=[
+                            "iam:PassRole"
+                        ],
+                        resources=[scheduler_role.role_arn]
+                    )
+                )
+
+        if timeline_enabled:
+            timeline_parameters = f"arn:aws:ssm:{deploy_region}:{deploy_account_id}:parameter/{timeline_prefix}/*"
+            timeline_rule = f"arn:aws:events:{deploy_region}:{deploy_account_id}:rule/{timeline_prefix}"
+            for prefix in (iss_prefix, bond_prefix, lunar_prefix):
+                ssm.StringParameter(
+                    self, f"ParameterTimeline{prefix.title().replace('-', '')}",
+                    parameter_name=f"/{timeline_prefix}/{prefix}",
+                    description=f"Upcoming {prefix} events on the display timeline",
+                    string_value="{}"
+                )
+
+            timeline = feature_function(
+                'FnTimeline', 'function/timeline', [powertools, runtime],
+                environment={
+                    **log_environment,
+                    "POWERTOOLS_SERVICE_NAME": timeline_prefix,
+                    "POWERTOOLS_METRICS_NAMESPACE": "aws4home",
+                    "POWERTOOLS_TRACE_DISABLED": str(not tracing_enabled).lower(),
+                    **timeline_env
+                },
+                initial_policy=[
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=[
+                            "ssm:GetParameters"
+                        ],
+                        resources=[timeline_parameters]
+                    ),
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=[
+                            "events:PutRule"
+                        ],
+                        resources=[timeline_rule]
+                    ),
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=[
+                            "iot:Publish"
+                        ],
+                        resources=[
+                            f"arn:aws:iot:{deploy_region}:{deploy_account_id}:topic/*"
+                        ]
+                    ),
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=[
+                            "iot:Connect"
+                        ],
+                        resources=[
+                            f"arn:aws:iot:{deploy_region}:{deploy_account_id}:client/*"
+                        ]
+                    )
+                ]
+            )
+            # Re-scheduled to the start of the next slot by the timeline function and whenever a feature
+            # submits its events
+            rule_timeline = events.Rule(
+                self, 'RuleTimeline',
+                description=f"Scheduled trigger for {timeline.function_name}",
+                schedule=events.Schedule.rate(Duration.days(1)),
+                enabled=True,
+                rule_name=timeline_prefix
+            )
+            rule_timeline.add_target(targets.LambdaFunction(timeline))
+
+            # Features write their own events, read everyone's and point the timeline rule at the next slot
+            # (one role if consolidated)
+            for function in dict.fromkeys((iss, bond, lunar_lander)):
+                function.add_to_role_policy(
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=[
+                            "ssm:GetParameter",
+                            "ssm:GetParameters",
+                            "ssm:PutParameter"
+                        ],
+                        resources=[timeline_parameters]
+                    )
+                )
+                function.add_to_role_policy(
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=[
+                            "events:PutRule"
+                        ],
+                        resources=[timeline_rule]
+                    )
+                )
+
+        garagedoor_shadow = feature_function(
+            'FnGaragedoorShadow', 'function/garagedoor-shadow', [powertools, runtime],
             environment={
-                "LOG_LEVEL": "DEBUG",
+                **log_environment,
                 "POWERTOOLS_SERVICE_NAME": garagedoor_shadow_prefix,
+                "POWERTOOLS_TRACE_DISABLED": str(not tracing_enabled).lower(),
+                "THING_NAME": "garagedoor",
+                "SHADOW_NAME": "garagedoor_1",
             },
             initial_policy=[
                 iam.PolicyStatement(
                     effect=iam.Effect.ALLOW,
                     actions=[
+                        "iot:GetThingShadow",
                         "iot:UpdateThingShadow"
                     ],
                     resources=[
                         f"arn:aws:iot:{deploy_region}:{deploy_account_id}:thing/*"
                     ]
                 )
-            ],
-            log_retention=logs.RetentionDays.ONE_MONTH
+            ]
         )
+        # Optional: sensor events are queued and a burst is merged into one shadow write
+        if garagedoor_shadow_queue:
+            queue_garagedoor_shadow = sqs.Queue(
+                self, 'QueueGaragedoorShadow',
+                queue_name=garagedoor_shadow_prefix,
+                visibility_timeout=Duration.seconds(360)
+            )
+            garagedoor_shadow.add_event_source(event_sources.SqsEventSource(
+                queue_garagedoor_shadow,
+                batch_size=10,
+                max_batching_window=Duration.seconds(5)
+            ))
         # rule_garagedoor_shadow = events.Rule(
         #     self, 'RuleGaragedoorShadow',
         #     description=f"Scheduled trigger for {garagedoor_shadow.function_name}",
@@ -0,0 +1,248 @@
+"""Asset code of the stack: function directories and one dependency layer per function."""
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import jsii
+from aws_cdk import (
+    AssetHashType,
+    BundlingOptions,
+    ILocalBundling,
+    aws_lambda as lambda_
+)
+
+# Asset code for the stack without a Docker container per asset where it isn't needed:
+# function directories are plain copies, dependencies are one layer per function, installed
+# locally for the target platform, stripped, precompiled and kept in CACHE_DIR under a hash of
+# the requirements, runtime and architecture. Docker bundling remains the fallback if the local
+# install fails (or AWS4HOME_BUNDLING=docker).
+
+CACHE_DIR = os.path.abspath(os.environ.get('AWS4HOME_BUNDLE_CACHE', '.bundle-cache'))
+LAYER_DIR = 'layer'
+
+# Bump when the build recipe changes, cached layers are rebuilt
+BUILD_VERSION = '2'
+
+PIP_PLATFORMS = {
+    'arm64': 'manylinux2014_aarch64',
+    'x86_64': 'manylinux2014_x86_64'
+}
+
+# Requirement sets (layer/<name>/requirements.txt) each function's dependency layer is resolved from
+DEPENDENCY_LAYERS = {
+    'iss': ['numpy', 'requests'],
+    'bond': ['bs4', 'requests'],
+    # Consolidated deployment, all features in one function
+    'router': ['bs4', 'numpy', 'requests']
+}
+
+# Not needed at runtime: test suites, console scripts and install metadata besides what
+# importlib.metadata reads. License files are shipped with the packages, as their licenses require.
+STRIP_DIRS = {'tests', 'test', '__pycache__'}
+KEEP_DIST_INFO = {'METADATA', 'top_level.txt', 'entry_points.txt'}
+KEEP_DIST_INFO_PREFIXES = ('LICENSE', 'LICENCE', 'COPYING', 'NOTICE', 'AUTHORS')
+KEEP_DIST_INFO_DIRS = {'licenses'}
+
+
+def function_code(path):
+    """Code of a function, previously `cp -au . /asset-output` in a container: the directory."""
+    return lambda_.Code.from_asset(path, exclude=['__pycache__', '*.pyc'])
+
+
+def requirements_paths(function_name):
+    """Requirements files a function's dependency layer is installed from."""
+    return [
+        os.path.join(LAYER_DIR, name, 'requirements.txt')
+        for name in DEPENDENCY_LAYERS[function_name]
+    ]
+
+
+def cache_key(requirements, runtime, architecture):
+    """Hash of the build recipe, the requirements, runtime and architecture."""
+    digest = hashlib.sha256(BUILD_VERSION.encode('utf-8'))
+    for path in requirements:
+        with open(path, 'rb') as requirements_file:
+            digest.update(requirements_file.read())
+    digest.update(runtime.name.encode('utf-8'))
+    digest.update(architecture.name.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def dependency_layer_code(function_name, runtime, architecture):
+    """Code of a function's dependency layer, from the cache, a local install or Docker."""
+    # Same key -> same asset hash, so neither a warm cache nor an existing cdk.out bundle is rebuilt
+    requirements = requirements_paths(function_name)
+    key = cache_key(requirements, runtime, architecture)
+    cached = os.path.join(CACHE_DIR, key)
+    if os.path.isdir(cached):
+        return lambda_.Code.from_asset(
+            cached, asset_hash=key, asset_hash_type=AssetHashType.CUSTOM, exclude=['report.json']
+        )
+
+    pip_requirements = ' '.join(
+        f"-r {os.path.relpath(path, LAYER_DIR)}" for path in requirements
+    )
+    return lambda_.Code.from_asset(
+        LAYER_DIR,
+        asset_hash=key,
+        asset_hash_type=AssetHashType.CUSTOM,
+        bundling=BundlingOptions(
+            image=runtime.bundling_image,
+            command=[
+                "bash", "-c",
+                f"pip install --no-compile {pip_requirements} -t /asset-output/python"
+                " && rm -rf /asset-output/python/bin"
+                " && find /asset-output/python -depth -type d"
+                " \\( -name tests -o -name test -o -name __pycache__ \\) -exec rm -rf {} +"
+                " && python -m compileall -q --invalidation-mode unchecked-hash"
+                " /asset-output/python"
+            ],
+            local=LocalPip(requirements, runtime, architecture, cached)
+        )
+    )
+
+
+def build_layer(requirements, target, runtime=None, architecture=None):
+    """Installs the requirements into target/python and returns a report of the result.
+
+    For the Lambda platform if runtime and architecture are given, else for this host.
+    """
+    python_dir = os.path.join(target, 'python')
+    command = [
+        sys.executable, '-m', 'pip', 'install', '--quiet', '--disable-pip-version-check',
+        '--no-compile', '-t', python_dir
+    ]
+    for path in requirements:
+        command += ['-r', path]
+    if runtime is not None:
+        command += [
+            '--platform', PIP_PLATFORMS[architecture.name],
+            '--implementation', 'cp',
+            '--python-version', runtime_version(runtime),
+            '--only-binary=:all:'
+        ]
+    subprocess.run(command, check=True)
+
+    stripped = strip(python_dir)
+    # .pyc files are only valid for the interpreter version that wrote them
+    interpreter = sys.executable if runtime is None else find_interpreter(runtime_version(runtime))
+    precompiled = interpreter is not None
+    if precompiled:
+        precompile(python_dir, interpreter)
+
+    report = dict(size(python_dir), stripped_bytes=stripped, precompiled=precompiled)
+    with open(os.path.join(target, 'report.json'), 'w', encoding='utf-8') as report_file:
+        json.dump(report, report_file, indent=2, sort_keys=True)
+    return report
+
+
+def strip(python_dir):
+    """Removes what isn't needed at runtime, returns the number of bytes removed."""
+    removed = 0
+    bin_dir = os.path.join(python_dir, 'bin')
+    if os.path.isdir(bin_dir):
+        removed += size(bin_dir)['bytes']
+        shutil.rmtree(bin_dir)
+
+    for root, dirs, files in os.walk(python_dir):
+        for name in [name for name in dirs if name in STRIP_DIRS]:
+            path = os.path.join(root, name)
+            removed += size(path)['bytes']
+            shutil.rmtree(path)
+            dirs.remove(name)
+        if root.endswith('.dist-info'):
+            for name in files:
+                if name in KEEP_DIST_INFO or name.upper().startswith(KEEP_DIST_INFO_PREFIXES):
+                    continue
+                removed += os.path.getsize(os.path.join(root, name))
+                os.remove(os.path.join(root, name))
+            for name in [name for name in dirs if name not in KEEP_DIST_INFO_DIRS]:
+                removed += size(os.path.join(root, name))['bytes']
+                shutil.rmtree(os.path.join(root, name))
+                dirs.remove(name)
+    return removed
+
+
+def precompile(python_dir, interpreter=sys.executable):
+    """Writes .pyc files next to the sources, with the interpreter of the target runtime."""
+    # /opt is read-only in Lambda, unchecked hash-based .pyc files are used without stat'ing the
+    # sources
+    subprocess.run(
+        [interpreter, '-m', 'compileall', '-q', '-j', '0', '--invalidation-mode', 'unchecked-hash',
+         python_dir],
+        check=True
+    )
+
+
+def find_interpreter(version):
+    """A python<version> on the PATH that is that version, or None."""
+    if version == f"{sys.version_info.major}.{sys.version_info.minor}":
+        return sys.executable
+    # Shims (pyenv, asdf) may exist without the version being installed
+    interpreter = shutil.which(f"python{version}")
+    if interpreter is None:
+        return None
+    probe = subprocess.run(
+        [interpreter, '-c', 'import sys; print(f"{sys.version_info[0]}.{sys.version_info[1]}")'],
+        capture_output=True, text=True, check=False
+    )
+    return interpreter if probe.returncode == 0 and probe.stdout.strip() == version else None
+
+
+def size(path):
+    """Unpacked size, file count and the largest top-level packages."""
+    total = 0
+    files = 0
+    packages = {}
+    for root, _, names in os.walk(path):
+        top = os.path.relpath(root, path).split(os.sep)[0]
+        for name in names:
+            file_size = os.path.getsize(os.path.join(root, name))
+            total += file_size
+            files += 1
+            package = top if top != '.' else name
+            packages[package] = packages.get(package, 0) + file_size
+    largest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:5]
+    return {'bytes': total, 'files': files, 'largest': largest}
+
+
+def runtime_version(runtime):
+    """e.g. 3.12 for python3.12"""
+    return runtime.name.replace('python', '')
+
+
+@jsii.implements(ILocalBundling)
+class LocalPip:  # pylint: disable=too-few-public-methods
+    """Local bundling of a dependency layer, Docker is the fallback."""
+
+    def __init__(self, requirements, runtime, architecture, cached):
+        self.requirements = requirements
+        self.runtime = runtime
+        self.architecture = architecture
+        self.cached = cached
+
+    def try_bundle(self, output_dir, *, _image=None, **_options):
+        """Builds the layer into the cache and copies it to output_dir, False for Docker."""
+        # The bundling options (image, ...) are Docker's. A keyword-only parameter has jsii pass
+        # them as keywords instead of one positional struct.
+        if os.environ.get('AWS4HOME_BUNDLING') == 'docker':
+            return False
+
+        build_dir = f"{self.cached}.{os.getpid()}"
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        try:
+            build_layer(self.requirements, build_dir, self.runtime, self.architecture)
+        except subprocess.CalledProcessError:
+            shutil.rmtree(build_dir, ignore_errors=True)
+            return False
+
+        shutil.rmtree(self.cached, ignore_errors=True)
+        os.replace(build_dir, self.cached)
+        shutil.copytree(
+            os.path.join(self.cached, 'python'), os.path.join(output_dir, 'python'),
+            dirs_exist_ok=True
+        )
+        return True
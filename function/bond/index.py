@@ -1,109 +1,163 @@
 import os
-import boto3
-import json
+import re
 import time
-from datetime import datetime
 from botocore.exceptions import ClientError
 
-from aws_lambda_powertools import Logger, Tracer
-import requests
-from bs4 import BeautifulSoup
-import pytz
-from pytz import timezone
+from aws_lambda_powertools import Logger, Metrics
+from aws4home_runtime import clients, dedupe, http_cache, httpclient, instrument, logpolicy, publisher, resilience, schedules, timeconv, timeline, tracing
+
+import listing
+import programme as programmes
 
 logger = Logger()
-tracer = Tracer()
+tracer = tracing.get_tracer()
+metrics = Metrics()
 
 bond_prefix = os.environ['BOND_PREFIX']
 bond_url = os.environ['BOND_URL']
+bond_cache_ttl = int(os.environ.get('BOND_CACHE_TTL', '21600'))
+bond_parser = os.environ.get('BOND_PARSER', 'stream')
 tz_local = os.environ['TZ']
 mqtt_topic = os.environ['MQTT_TOPIC']
 
-utc = pytz.utc
-local = timezone(tz_local)
+local = timeconv.zone(tz_local)
 
+# e.g. 17.10.202620.15Uhr
+SHOW_TIME = re.compile(r'(\d{1,2})\.(\d{1,2})\.(\d{4})(\d{1,2})\.(\d{2})Uhr')
 
-@tracer.capture_lambda_handler
-@logger.inject_lambda_context(log_event=True)
-def handler(event, context):
+# A run up to this many seconds after a show started was fired for it (and publishes), any other run (e.g.
+# fired by the retry rate) only reschedules
+DUE_WINDOW = 300
 
-  publish_to_iot(mqtt_topic, "bond", 7200)
 
-  program = []
+@tracer.capture_lambda_handler
+@logpolicy.inject(logger)
+@metrics.log_metrics
+@dedupe.report(metrics)
+@instrument.report(metrics)
+@publisher.batched(logger)
+@httpclient.deadline()
+def handler(event, context):
+  if schedules.is_scheduled_event(event):
+    publish_to_iot(mqtt_topic, event['pattern'], event['duration'])
+    return
 
   try:
-    page = requests.get(bond_url)
-    soup = BeautifulSoup(page.content, 'html.parser')
-    table = soup.find_all('table')[4]
-
     current_time_unix = int(time.time())
-    logger.debug(f"current time UNIX: {str(current_time_unix)}")
-
-    for tr in table.find_all('tr')[1:]:
-      tds = tr.find_all('td')
-      logger.debug(f"tds: {tds}")
-      when = (tds[0].text.strip() + tds[1].text.strip()).replace("\n", "")
-      when = when.replace("\xa0", "")
-      when = when.replace(" ", "")
-      if "/" in when:
-        when = when.split("/")[1]
-      logger.debug(f"when: {when}")
-      show_time_naive = datetime.strptime(when, '%d.%m.%Y%H.%MUhr')
-      show_time_local = local.localize(show_time_naive)
-      show_time_unix = int(datetime.timestamp(show_time_local))
-
-      logger.debug(f"show time NAIVE: {str(show_time_naive)} show time LOCAL: {str(show_time_local)} show time UNIX: {str(show_time_unix)}")
-
-      program.append({
-        'show_time_naive': show_time_naive,
-        'show_time_local': show_time_local,
-        'show_time_unix': show_time_unix,
-        'channel': tds[2].text,
-        'title': tds[3].text,
-      })
-
-    for show in program:
-      if show['show_time_unix'] > current_time_unix:
-        next_show_time = datetime.utcfromtimestamp(show['show_time_unix'])
-        cron_expression = 'cron(' + str(next_show_time.minute) + ' ' + str(next_show_time.hour) + ' ' + str(next_show_time.day) + ' ' + str(next_show_time.month) + ' ? ' + str(next_show_time.year) + ')'
-
-        logger.debug(f"next show time: {str(next_show_time)} new cron expression: {str(cron_expression)}")
-
-        update_event_rule(cron_expression)
-        return
+    logger.debug("current time UNIX: %s", current_time_unix)
+
+    # The last good programme if the listing is slow or down, see resilience
+    with instrument.stage('fetch'):
+      program = resilience.get(bond_url, parse_program, ttl=bond_cache_ttl, fetch=fetch_page)
+      # Before revalidating, the show that just started may have left the listing already
+      fired = programmes.due(program, current_time_unix, DUE_WINDOW) if isinstance(program, programmes.Programme) else None
+      if fired is not None:
+        fired = (program.titles[fired], program.channels[fired])
+      if not isinstance(program, programmes.Programme) or programmes.exhausted(program, current_time_unix):
+        # Cached listing ran out of shows (or predates the Programme format), revalidate with upstream
+        if not isinstance(program, programmes.Programme):
+          http_cache.invalidate(bond_url)
+        program = resilience.get(bond_url, parse_program, fetch=fetch_page)
+    logger.debug("http cache: %s, fallbacks: %s", http_cache.stats, resilience.stats)
+
+    if fired is not None and not schedules.enabled() and not timeline.enabled():
+      logger.info("show: %s on %s", *fired)
+      publish_to_iot(mqtt_topic, "bond", 7200)
+
+    first = programmes.next_index(program, current_time_unix)
+
+    if timeline.enabled():
+      events = [timeline.Event(show_time, 7200, bond_prefix, mqtt_topic, "bond") for show_time in program.times[first:]]
+      with instrument.stage('rule'):
+        expression = timeline.update(bond_prefix, events, current_time_unix, resilience.RETRY_EXPRESSION)
+      logger.info("timeline: %d show(s), next slot: %s", len(events), expression)
+      return
+
+    if schedules.enabled():
+      # One schedule per upcoming show, instead of re-scheduling the rule one show at a time
+      entries = [schedules.Entry(show_time, {'pattern': "bond", 'duration': 7200}) for show_time in program.times[first:]]
+      with instrument.stage('schedule'):
+        result = schedules.reconcile(bond_prefix, entries, context.invoked_function_arn)
+      logger.info("schedule: %s", result)
+      return
+
+    if first < len(program.times):
+      cron_expression = timeconv.cron(program.times[first])
+
+      logger.debug("next show: %s on %s new cron expression: %s", program.titles[first], program.channels[first], cron_expression)
+
+      update_event_rule(cron_expression)
+      return
+
+    # No upcoming show in the listing (yet), look again later
+    logger.warning("no upcoming show, next run: %s", resilience.RETRY_EXPRESSION)
+    update_event_rule(resilience.RETRY_EXPRESSION)
 
   except Exception as e:
+    if not schedules.enabled() and not timeline.enabled():
+      # No programme at all, keep the rule firing until upstream is back
+      update_event_rule(resilience.RETRY_EXPRESSION)
     raise Exception('ERROR - handler - Debug by hand: ' + str(e))
 
 
+@tracer.capture_method
+@instrument.timed('parse')
+def parse_program(page):
+  # Streaming parser stops after the listing table, BeautifulSoup on the full page is the fallback
+  if bond_parser == 'stream':
+    try:
+      return to_programme(listing.response_rows(page))
+    except Exception as e:
+      logger.warning("streaming parser failed, falling back to bs4: %s", e)
+      page.close()
+      page = fetch_page(bond_url, stream=False)
+
+  return to_programme(listing.soup_rows(page.content))
+
+
+def to_programme(rows):
+  shows = [to_show(row) for row in rows]
+  times = local.to_utc_many([wall for wall, _, _ in shows])
+  program = programmes.from_shows((utc, channel, title) for utc, (_, channel, title) in zip(times, shows))
+  logger.debug("parsed %d shows", len(program.times))
+  return program
+
+
+def fetch_page(url, headers=None, stream=None):
+  return httpclient.get(url, headers=headers, stream=(bond_parser == 'stream') if stream is None else stream)
+
+
+def to_show(row):
+  # -> (local wall time, see timeconv.wall(), channel, title)
+  when = (row.date.strip() + row.time.strip()).replace("\n", "")
+  when = when.replace("\xa0", "")
+  when = when.replace(" ", "")
+  if "/" in when:
+    when = when.split("/")[1]
+  match = SHOW_TIME.fullmatch(when)
+  if match is None:
+    raise ValueError(f"unexpected show time: {when}")
+  day, month, year, hour, minute = map(int, match.groups())
+  return timeconv.wall(year, month, day, hour, minute), row.channel, row.title
+
+
 @tracer.capture_method
 def publish_to_iot(topic, pattern, duration):
+  # Queued, sent with whatever else this invocation publishes, see publisher
+  publisher.publish(topic, pattern, duration)
 
-  try:
-    iot = boto3.client("iot-data",verify = False)
-    iot.publish(
-      topic=topic,
-      qos=0,
-      payload=json.dumps(
-        {
-          "pattern": pattern,
-          "duration": duration
-        }
-      ),
-    )
-  except ClientError as client_error:
-    logger.error(client_error)
 
 @tracer.capture_method
+@instrument.timed('rule')
 def update_event_rule(cron_expression):
 
   try:
-    events = boto3.client("events")
-    events.put_rule(
+    events = clients.get("events")
+    dedupe.write_once(f"rule:{bond_prefix}", cron_expression, lambda: events.put_rule(
       Name=bond_prefix,
       ScheduleExpression=cron_expression,
       State='ENABLED',
       Description='Scheduled trigger for [OVERWRITTEN w/ time of the next Bond movie on TV]',
-    )
+    ))
   except ClientError as client_error:
     logger.error(client_error)
\ No newline at end of file
@@ -0,0 +1,130 @@
+import codecs
+import re
+from collections import namedtuple
+from html.parser import HTMLParser
+
+# Rows of the TV listing, the fifth <table> of BOND_URL. stream_rows() parses the page incrementally
+# and stops as soon as that table is closed, soup_rows() is the BeautifulSoup fallback.
+
+Row = namedtuple('Row', ['date', 'time', 'channel', 'title'])
+
+TABLE_INDEX = 4
+CHUNK_SIZE = 8192
+SNIFF_SIZE = 1024
+
+_charset = re.compile(rb'<meta[^>]+charset=["\']?([A-Za-z0-9_-]+)', re.IGNORECASE)
+
+
+class _ListingParser(HTMLParser):
+
+  def __init__(self, table_index):
+    super().__init__(convert_charrefs=True)
+    self.table_index = table_index
+    self.tables_seen = 0
+    self.depth = 0
+    self.done = False
+    self.rows = []
+    self._row = None
+    self._cell = None
+
+  def handle_starttag(self, tag, attrs):
+    if tag == 'table':
+      if self.depth:
+        self.depth += 1
+      elif self.tables_seen == self.table_index:
+        self.depth = 1
+      self.tables_seen += 1
+    elif not self.depth:
+      return
+    elif tag == 'tr':
+      self._end_row()
+      self._row = []
+    elif tag == 'td' and self._row is not None:
+      self._end_cell()
+      self._cell = []
+
+  def handle_endtag(self, tag):
+    if not self.depth:
+      return
+    if tag == 'td':
+      self._end_cell()
+    elif tag == 'tr':
+      self._end_row()
+    elif tag == 'table':
+      self.depth -= 1
+      if not self.depth:
+        self._end_row()
+        self.done = True
+
+  def handle_data(self, data):
+    if self._cell is not None:
+      self._cell.append(data)
+
+  def _end_cell(self):
+    if self._cell is not None and self._row is not None:
+      self._row.append(''.join(self._cell))
+    self._cell = None
+
+  def _end_row(self):
+    self._end_cell()
+    if self._row is not None:
+      self.rows.append(self._row)
+    self._row = None
+
+
+def stream_rows(chunks, encoding=None, table_index=TABLE_INDEX):
+  # chunks: iterable of bytes, the header row of the table is skipped
+  parser = _ListingParser(table_index)
+  decoder = None
+  head = b''
+  header_skipped = False
+
+  for chunk in chunks:
+    if decoder is None:
+      # Charset is sniffed from a <meta> tag within the first KiB
+      head += chunk
+      match = _charset.search(head)
+      if not match and len(head) < SNIFF_SIZE:
+        continue
+      decoder = codecs.getincrementaldecoder(match.group(1).decode('ascii') if match else (encoding or 'utf-8'))(errors='replace')
+      chunk, head = head, b''
+
+    parser.feed(decoder.decode(chunk))
+    for cells in parser.rows:
+      if not header_skipped:
+        header_skipped = True
+        continue
+      yield _row(cells)
+    parser.rows.clear()
+
+    if parser.done:
+      return
+
+  if decoder is None:
+    parser.feed(head.decode(encoding or 'utf-8', errors='replace'))
+  parser.close()
+  for cells in parser.rows[0 if header_skipped else 1:]:
+    yield _row(cells)
+  if parser.tables_seen <= table_index:
+    raise IndexError(f"listing table {table_index} not found")
+
+
+def response_rows(response, table_index=TABLE_INDEX):
+  try:
+    yield from stream_rows(response.iter_content(CHUNK_SIZE), response.encoding, table_index)
+  finally:
+    response.close()
+
+
+def soup_rows(content, table_index=TABLE_INDEX):
+  from bs4 import BeautifulSoup
+
+  soup = BeautifulSoup(content, 'html.parser')
+  table = soup.find_all('table')[table_index]
+  for tr in table.find_all('tr')[1:]:
+    yield _row([td.text for td in tr.find_all('td')])
+
+
+def _row(cells):
+  cells = list(cells) + [''] * (4 - len(cells))
+  return Row(*cells[:4])
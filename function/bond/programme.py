@@ -0,0 +1,35 @@
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
+
+# The parsed TV listing as sorted parallel arrays: show times (unix seconds) and the channel/title of each
+# show. Small to pickle into the http cache in /tmp, and the next show is a binary search away.
+
+Programme = namedtuple('Programme', ['times', 'channels', 'titles'])
+
+
+def from_shows(shows):
+  # shows: iterable of (unix time, channel, title), in any order
+  ordered = sorted(shows, key=lambda show: show[0])
+  return Programme(
+    array('q', (show[0] for show in ordered)),
+    tuple(show[1] for show in ordered),
+    tuple(show[2] for show in ordered)
+  )
+
+
+def next_index(programme, now):
+  # Index of the first show after now, len(programme.times) if there is none
+  return bisect_right(programme.times, now)
+
+
+def due(programme, now, window):
+  # Index of the show that started up to window seconds ago (the one the rule fired for), or None
+  index = next_index(programme, now) - 1
+  if index >= 0 and now - programme.times[index] < window:
+    return index
+  return None
+
+
+def exhausted(programme, now):
+  return not programme.times or programme.times[-1] <= now
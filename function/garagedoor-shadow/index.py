@@ -1,32 +1,36 @@
 import os
-import boto3
-import json
-from botocore.exceptions import ClientError
 
-from aws_lambda_powertools import Logger, Tracer
+from aws_lambda_powertools import Logger
+from aws4home_runtime import clients, logpolicy, tracing
+
+import shadow
 
 logger = Logger()
-tracer = Tracer()
+tracer = tracing.get_tracer()
+
+thing_name = os.environ.get('THING_NAME', 'garagedoor')
+shadow_name = os.environ.get('SHADOW_NAME', 'garagedoor_1')
+# Only this function writes the shadow, one execution environment at a time, see shadow
+exclusive = os.environ.get('SHADOW_EXCLUSIVE', 'false').lower() == 'true'
 
-mqtt_topic = os.environ['MQTT_TOPIC']
+# Kept for the warm container, identical states from a noisy sensor don't reach IoT Core
+updater = None
 
-client = boto3.client('iot-data',verify = False)
 
 @tracer.capture_lambda_handler
-@logger.inject_lambda_context(log_event=True)
-def lambda_handler(event, context):
-    logger.debug(event)
-    
-    payload = {
-      "state":{
-        "reported":{
-          "garagedoor":event}
-      }
-    }
-
-    client.update_thing_shadow(
-      thingName='garagedoor',
-      shadowName='garagedoor_1',
-      payload=bytes(json.dumps(payload), 'utf-8')
-    )
-    
+@logpolicy.inject(logger)
+def handler(event, context):
+  global updater
+  if updater is None:
+    updater = shadow.ShadowUpdater(clients.get('iot-data'), thing_name, shadow_name, 'garagedoor', exclusive)
+
+  states = shadow.from_batch(event)
+  changes = updater.update(states)
+  if changes is None:
+    logger.debug("shadow up to date, %d event(s) dropped", len(states))
+  else:
+    logger.debug("reported %s (version %s) from %d event(s)", changes, updater.version, len(states))
+
+
+# Previous handler name
+lambda_handler = handler
@@ -0,0 +1,105 @@
+import json
+
+# Keeps the last reported state of a Thing Shadow for the lifetime of the execution environment and only
+# sends fields that changed. A burst of events (e.g. an SQS batch) is merged into a single write, later
+# events win. Writes carry the shadow version, so a write based on an outdated copy is rejected by
+# IoT Core; the shadow is then re-read and the delta recomputed.
+#
+# The kept state is only trusted to drop a write if no one else writes the shadow (exclusive, e.g. a
+# function with a reserved concurrency of 1). Otherwise another execution environment may have changed it
+# since: states the kept copy already has are still sent, as a versioned write, and a conflict re-syncs.
+
+MAX_CONFLICT_RETRIES = 2
+
+
+def merge(states):
+  # Last writer wins, field by field for dicts, whole value otherwise
+  merged = None
+  for state in states:
+    if isinstance(merged, dict) and isinstance(state, dict):
+      merged = dict(merged, **state)
+    else:
+      merged = dict(state) if isinstance(state, dict) else state
+  return merged
+
+
+def delta(reported, desired):
+  # Fields of desired that differ from reported, None if there is nothing to send
+  if reported is None:
+    return desired
+  if isinstance(reported, dict) and isinstance(desired, dict):
+    changed = {key: value for key, value in desired.items() if reported.get(key) != value}
+    return changed or None
+  return None if reported == desired else desired
+
+
+def from_batch(event):
+  # SQS batch -> message bodies ordered by the time they were sent, anything else is a single state
+  records = event.get('Records') if isinstance(event, dict) else None
+  if not records:
+    return [event]
+  records = sorted(records, key=lambda record: int(record.get('attributes', {}).get('SentTimestamp', 0)))
+  return [json.loads(record['body']) for record in records]
+
+
+class ShadowUpdater:
+
+  def __init__(self, iot, thing_name, shadow_name, key, exclusive=False):
+    self.iot = iot
+    self.thing_name = thing_name
+    self.shadow_name = shadow_name
+    self.key = key  # reported state lives under state.reported.<key>
+    self.reported = None
+    self.version = None
+    self.exclusive = exclusive
+
+  def update(self, states):
+    # Returns the delta that was written, None if the shadow was already up to date
+    desired = merge(states)
+    current = self.exclusive
+    for attempt in range(MAX_CONFLICT_RETRIES + 1):
+      changes = delta(self.reported, desired)
+      if changes is None:
+        if current:
+          return None
+        # Up to date as far as the kept copy knows, confirmed by the version of the write
+        changes = desired
+      try:
+        self._write(changes)
+      except self.iot.exceptions.ConflictException:
+        if attempt == MAX_CONFLICT_RETRIES:
+          raise
+        self.refresh()
+        current = True
+        continue
+      self.reported = merge([self.reported, desired])
+      return changes
+
+  def refresh(self):
+    try:
+      response = self.iot.get_thing_shadow(thingName=self.thing_name, shadowName=self.shadow_name)
+    except self.iot.exceptions.ResourceNotFoundException:
+      self.reported = None
+      self.version = None
+      return
+    document = json.loads(response['payload'].read())
+    self.reported = document.get('state', {}).get('reported', {}).get(self.key)
+    self.version = document.get('version')
+
+  def _write(self, changes):
+    document = {
+      "state": {
+        "reported": {
+          self.key: changes
+        }
+      }
+    }
+    if self.version is not None:
+      document['version'] = self.version
+
+    response = self.iot.update_thing_shadow(
+      thingName=self.thing_name,
+      shadowName=self.shadow_name,
+      payload=bytes(json.dumps(document), 'utf-8')
+    )
+    self.version = json.loads(response['payload'].read()).get('version', self.version)
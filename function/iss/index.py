@@ -1,197 +1,287 @@
 import os
-import boto3
 import json
-import pytz
-from datetime import date, datetime, timedelta
+from collections import namedtuple
+from datetime import datetime, timedelta
 from botocore.exceptions import ClientError
 
-from aws_lambda_powertools import Logger, Tracer
-import requests
+from aws_lambda_powertools import Logger, Metrics
+from aws4home_runtime import clients, dedupe, httpclient, instrument, logpolicy, publisher, resilience, schedules, stages, state as state_store, timeconv, timeline, tracing
 
 logger = Logger()
-tracer = Tracer()
+tracer = tracing.get_tracer()
+metrics = Metrics()
 
-hosted_zone_id = os.environ['HOSTED_ZONE_ID']
 iss_prefix = os.environ['ISS_PREFIX']
 iss_url = os.environ['ISS_URL']
-lat = os.environ['LATITUDE']
-lon = os.environ['LONGITUDE']
+iss_tle_url = os.environ.get('ISS_TLE_URL', 'https://celestrak.org/NORAD/elements/gp.php?CATNR=25544&FORMAT=TLE')
+min_elevation = float(os.environ.get('ISS_MIN_ELEVATION', '10'))
 tz_str = os.environ['TZ']
 mqtt_topic = os.environ['MQTT_TOPIC']
 
+Location = namedtuple('Location', ['name', 'latitude', 'longitude', 'topic', 'tz'])
+
+
+def load_locations():
+  # ISS_LOCATIONS: JSON list of {"name", "latitude", "longitude", "topic", "tz"}, topic and tz default to
+  # MQTT_TOPIC and TZ. Without it the single LATITUDE/LONGITUDE home.
+  configured = json.loads(os.environ.get('ISS_LOCATIONS') or '[]')
+  if not configured:
+    return [Location('home', os.environ['LATITUDE'], os.environ['LONGITUDE'], mqtt_topic, tz_str)]
+  return [
+    Location(location.get('name', f"location{index}"), str(location['latitude']), str(location['longitude']),
+             location.get('topic', mqtt_topic), location.get('tz', tz_str))
+    for index, location in enumerate(configured)
+  ]
+
+
+locations = load_locations()
+
+# targets: JSON list of [topic, duration] for the pass over(s) the rule fires for next
+state = state_store.from_environ(iss_prefix, ['duration', 'risetime', 'targets'])
+
+# A run from a minute before up to this many seconds after the stored risetime was fired for that pass over
+# (and publishes), any other run (e.g. fired by the retry rate) only reschedules
+DUE_WINDOW = 300
+
+# Seconds each stage of the handler may take
+STAGE_TIMEOUTS = {
+  'targets': 5,
+  'publish': 5,
+  'next_pass': 30,
+  'rule': 10,
+  'state': 10
+}
+
 
 @tracer.capture_lambda_handler
-@logger.inject_lambda_context(log_event=True)
+@logpolicy.inject(logger)
+@metrics.log_metrics
+@dedupe.report(metrics)
+@instrument.report(metrics)
+@publisher.batched(logger)
+@httpclient.deadline()
 def handler(event, context):
-  # Duration of current pass over was stored in R53 record ;)
-  # Message is being sent for ISS to light up
-  current_duration = read_duration_from_route53(hosted_zone_id)
-  publish_to_iot(mqtt_topic, "iss.gif", current_duration)
-  
-  tz=pytz.timezone(tz_str)
+  if schedules.is_scheduled_event(event):
+    # Fired by a materialized schedule at the beginning of a pass over, the event carries its duration
+    publish_to_iot(event.get('topic', mqtt_topic), event['pattern'], event['duration'])
+    return
+
+  tz = timeconv.zone(tz_str).tzinfo
   current_time = datetime.now(tz)
+
+  if timeline.enabled():
+    submit_to_timeline(current_time)
+    return
+
+  if schedules.enabled():
+    materialize_schedule(context, current_time)
+    return
+
+  # Topics and durations of current pass over(s) were stored by the previous run, messages are being sent for ISS
+  # to light up. Publishing and the prediction of the next pass over don't depend on each other and run
+  # concurrently, the rule and the state for the next pass over are written once it is known.
+  try:
+    stages.run([
+      stages.Stage('targets', lambda: read_targets_from_state(current_time), (), STAGE_TIMEOUTS['targets'], True),
+      stages.Stage('publish', publish_targets, ('targets',), STAGE_TIMEOUTS['publish'], True),
+      stages.Stage('next_pass', lambda: find_next_pass(current_time), timeout=STAGE_TIMEOUTS['next_pass']),
+      stages.Stage('rule', lambda next_pass: update_event_rule(next_pass[2]), ('next_pass',), STAGE_TIMEOUTS['rule']),
+      # After the targets of this run were read
+      stages.Stage('state', lambda targets, next_pass: write_next_targets_to_state(next_pass[0], next_pass[1]), ('targets', 'next_pass'), STAGE_TIMEOUTS['state'])
+    ], deadline=context.get_remaining_time_in_millis() / 1000 - 1, on_error=lambda stage, error: logger.error("stage %s: %s", stage, error))
+  except stages.StageError as error:
+    if error.stage == 'next_pass':
+      # Neither predicted nor fetched, keep the rule firing until upstream is back
+      update_event_rule(resilience.RETRY_EXPRESSION)
+    raise
+
+
+@tracer.capture_method
+def find_next_pass(current_time):
+  tz = current_time.tzinfo
   try:
-    response = requests.get(f"{iss_url}&lon={lon}&lat={lat}&tz={tz_str}").json()
-    logger.debug(f"response: {response}")
-
-    passes = response['passes']
-
-    # Find next pass over, that is at least an hour in the future. API does always return all passes for current day.
-    i = 0
-    # next_pass_index = -1
-    
-    if len(passes) == 0:
-      next_pass_begin = datetime.combine(current_time+timedelta(days=3), datetime.min.time())
-      next_pass_duration = 1
+    passes = get_passes(current_time)
+
+    # Find next pass over of any location, that is at least an hour in the future.
+    earliest_begin = int((current_time+timedelta(hours=1)).timestamp() * 1000)
+    upcoming = [
+      (pass_over, location)
+      for location, location_passes in zip(locations, passes)
+      for pass_over in location_passes if pass_over.begin >= earliest_begin
+    ]
+
+    if not upcoming:
+      next_pass_begin = datetime.combine(current_time+timedelta(days=3), datetime.min.time(), tzinfo=tz)
+      targets = []
     else:
-      for pass_over in passes:
-        pass_begin = tz.localize(datetime.strptime(pass_over['begin'], "%Y%m%d%H%M%S"))
-        logger.debug(f"for loop - pass_begin: {str(pass_begin)}")
-        
-        next_pass_index = i
-        if pass_begin < current_time+timedelta(hours=1):
-          logger.debug(f"for loop - next_pass_index: {str(next_pass_index)}")
-          pass_begin = datetime.combine(current_time+timedelta(days=3), datetime.min.time())
-        else:
+      upcoming.sort(key=lambda upcoming_pass: upcoming_pass[0].begin)
+      first_begin = upcoming[0][0].begin
+      next_pass_begin = datetime.fromtimestamp(first_begin / 1000, tz)
+      # The rule fires once, at the first pass over. Nearby homes see the same pass over seconds apart, maybe
+      # in another minute: every pass over that begins while the ones before it are still on is served by that
+      # run, lit up until its own end.
+      targets = []
+      group_end = first_begin
+      for pass_over, location in upcoming:
+        if pass_over.begin // 60000 != first_begin // 60000 and pass_over.begin >= group_end:
           break
-          
-        i += 1
-
-      #if next_pass_index == -1:
-      #  raise Exception(f'ERROR - handler - No passes found: {response}')
-    
-      next_pass_begin = tz.localize(datetime.strptime(passes[next_pass_index]['begin'], "%Y%m%d%H%M%S"))
-      next_pass_end = tz.localize(datetime.strptime(passes[next_pass_index]['end'], "%Y%m%d%H%M%S"))
-      next_pass_duration = (next_pass_end - next_pass_begin).seconds
-    
-    logger.debug(f"current time: {str(current_time)}")
-    logger.debug(f"next_pass_begin: {str(next_pass_begin)}")
-    logger.debug(f"next_pass_duration: {str(next_pass_duration)}")
+        targets.append([location.topic, (pass_over.end - first_begin) // 1000])
+        group_end = max(group_end, pass_over.end)
+
+    logger.debug("current time: %s", current_time)
+    logger.debug("next_pass_begin: %s", next_pass_begin)
+    logger.debug("next targets: %s", targets)
 
     # Cron trigger in EventBridge requires time in UTC
-    next_pass_utc = next_pass_begin.astimezone(pytz.utc)
-    cron_expression = 'cron(' + str(next_pass_utc.minute) + ' ' + str(next_pass_utc.hour) + ' ' + str(next_pass_utc.day) + ' ' + str(next_pass_utc.month) + ' ? ' + str(next_pass_utc.year) + ')'
+    cron_expression = timeconv.cron(next_pass_begin.timestamp())
+    logger.info("new cron(UTC): %s", cron_expression)
+
+  except Exception as e:
+    raise Exception('ERROR - handler - Debug by hand: ' + str(e))
+
+  return next_pass_begin, targets, cron_expression
 
-    logger.debug(f"next_pass_utc: {next_pass_utc.strftime('%Y-%m-%d %H:%M:%S')}")
-    logger.info(f"new cron(UTC): {cron_expression}")
 
+@tracer.capture_method
+def materialize_schedule(context, current_time):
+  # One schedule per upcoming pass over, instead of re-scheduling the rule one pass at a time
+  try:
+    passes = get_passes(current_time)
   except Exception as e:
     raise Exception('ERROR - handler - Debug by hand: ' + str(e))
 
-  update_event_rule(cron_expression)
+  earliest_begin = int(current_time.timestamp() * 1000) + 60000
+  entries = [
+    schedules.Entry(pass_over.begin / 1000, {'pattern': "iss.gif", 'duration': pass_over.duration // 1000, 'topic': location.topic})
+    for location, location_passes in zip(locations, passes)
+    for pass_over in location_passes if pass_over.begin >= earliest_begin
+  ]
+  with instrument.stage('schedule'):
+    result = schedules.reconcile(iss_prefix, entries, context.invoked_function_arn)
+  logger.info("schedule: %s", result)
 
-  write_next_duration_to_route53(hosted_zone_id, next_pass_begin, next_pass_duration)
+
+@tracer.capture_method
+def submit_to_timeline(current_time):
+  # Passes of every location on the shared timeline, it decides what's shown when
+  try:
+    passes = get_passes(current_time)
+  except Exception as e:
+    raise Exception('ERROR - handler - Debug by hand: ' + str(e))
+
+  events = [
+    timeline.Event(pass_over.begin // 1000, pass_over.duration // 1000, iss_prefix, location.topic, "iss.gif")
+    for location, location_passes in zip(locations, passes) for pass_over in location_passes
+  ]
+  with instrument.stage('rule'):
+    expression = timeline.update(iss_prefix, sorted(events), int(current_time.timestamp()), resilience.RETRY_EXPRESSION)
+  logger.info("timeline: %d pass(es), next slot: %s", len(events), expression)
+
+
+@tracer.capture_method
+def get_passes(current_time):
+  # Passes of every location (one list per location) are predicted locally from a cached TLE in one batch,
+  # the ISS_URL predictor is only a fallback. NumPy is only imported by runs that actually predict.
+  import predictor
+  try:
+    tle = predictor.load_tle(iss_tle_url, fetch_text)
+    with instrument.stage('predict'):
+      return predictor.predict_passes_for(tle, [(location.latitude, location.longitude) for location in locations],
+                                          current_time.timestamp(), min_elevation=min_elevation)
+  except Exception as e:
+    logger.warning("local pass prediction failed, falling back to %s: %s", iss_url, e)
+    return [get_passes_from_api(location) for location in locations]
+
+
+def get_passes_from_api(location):
+  # API does always return all passes for current day, so the response is good until midnight
+  from predictor import Pass
+
+  zone = timeconv.zone(location.tz)
+  tz = zone.tzinfo
+  now = datetime.now(tz)
+  midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), tzinfo=tz)
+  with instrument.stage('fetch'):
+    response = resilience.get(f"{iss_url}&lon={location.longitude}&lat={location.latitude}&tz={location.tz}", lambda page: page.json(),
+                              ttl=(midnight - now).total_seconds())
+  logger.debug("response: %s", response)
+
+  # begin/end are local YYYYmmddHHMMSS
+  walls = [compact_wall(pass_over[key]) for pass_over in response['passes'] for key in ('begin', 'end')]
+  times = [utc * 1000 for utc in zone.to_utc_many(walls)]
+  return [Pass(begin, end, end - begin, None) for begin, end in zip(times[::2], times[1::2])]
+
+
+def compact_wall(value):
+  return timeconv.wall(int(value[0:4]), int(value[4:6]), int(value[6:8]), int(value[8:10]), int(value[10:12]), int(value[12:14]))
+
+
+@instrument.timed('fetch')
+def fetch_text(url):
+  # Only called once the cached TLE is due, a conditional GET avoids re-downloading an unchanged one
+  return resilience.get(url, lambda page: page.text)
+
+
+def publish_targets(targets):
+  if targets is None:
+    # State couldn't be read, light up every location without a known duration
+    targets = [[location.topic, None] for location in locations]
+  for topic, duration in targets:
+    publish_to_iot(topic, "iss.gif", duration)
 
 
 @tracer.capture_method
 def publish_to_iot(topic, pattern, duration):
+  # Queued, sent with whatever else this invocation publishes, see publisher
+  publisher.publish(topic, pattern, duration)
 
-  try:
-    iot = boto3.client("iot-data",verify = False)
-    iot.publish(
-      topic=topic,
-      qos=0,
-      retain=False,
-      payload=json.dumps(
-        {
-          "pattern": pattern,
-          "duration": duration
-        }
-      )
-    )
-  except ClientError as client_error:
-    logger.error(client_error)
 
 @tracer.capture_method
+@instrument.timed('rule')
 def update_event_rule(cron_expression):
 
   try:
-    events = boto3.client("events")
-    events.put_rule(
+    events = clients.get("events")
+    dedupe.write_once(f"rule:{iss_prefix}", cron_expression, lambda: events.put_rule(
       Name=iss_prefix,
       ScheduleExpression=cron_expression,
       State='ENABLED',
       Description='Scheduled trigger for [OVERWRITTEN w/ time of the next ISS pass over specified location]',
-    )
+    ))
   except ClientError as client_error:
     logger.error(client_error)
 
 @tracer.capture_method
-def read_duration_from_route53(hosted_zone_id):
+@instrument.timed('state_read')
+def read_targets_from_state(current_time):
 
   try:
-    route53 = boto3.client("route53")
-
-    zone_response = route53.get_hosted_zone(
-      Id=hosted_zone_id
-      )
-    zone_name = zone_response['HostedZone']['Name']
-    record_name_duration = f"duration.{iss_prefix}.{zone_name}"
-
-    record = route53.list_resource_record_sets(
-      HostedZoneId=hosted_zone_id,
-      StartRecordName=record_name_duration,
-      StartRecordType='TXT',
-      MaxItems='1'
-    )
-
-    current_duration = record['ResourceRecordSets'][0]['ResourceRecords'][0]['Value']
-    current_duration_int = int(current_duration.strip('"'))
-    return current_duration_int
-
+    if not is_due(state.get('risetime'), current_time):
+      logger.info("no pass over due, rescheduling only")
+      return []
+    targets = state.get('targets')
+    if targets is None:
+      # Written before there were locations
+      return [[mqtt_topic, int(state.get('duration', 0))]]
+    return json.loads(targets)
   except ClientError as client_error:
     logger.error(client_error)
 
+def is_due(risetime, current_time):
+  # The rule fires at the beginning of the minute of the risetime
+  try:
+    seconds = (current_time - datetime.fromisoformat(risetime)).total_seconds()
+  except (TypeError, ValueError):
+    return False
+  return -60 <= seconds < DUE_WINDOW
+
 @tracer.capture_method
-def write_next_duration_to_route53(hosted_zone_id, risetime, duration):
-  duration_record = '"' + str(duration) + '"'
-  risetime_record = '"' + str(risetime) + '"'
+@instrument.timed('state_write')
+def write_next_targets_to_state(risetime, targets):
 
   try:
-    route53 = boto3.client("route53")
-
-    zone_response = route53.get_hosted_zone(
-      Id=hosted_zone_id
-      )
-    zone_name = zone_response['HostedZone']['Name']
-    record_name_duration = f"duration.{iss_prefix}.{zone_name}"
-    record_name_risetime = f"risetime.{iss_prefix}.{zone_name}"
-
-
-    route53.change_resource_record_sets(
-      HostedZoneId=hosted_zone_id,
-      ChangeBatch={
-        'Comment': 'string',
-        'Changes': [
-          {
-            'Action': 'UPSERT',
-            'ResourceRecordSet': {
-              'Name': record_name_duration,
-              'Type': 'TXT',
-              'TTL': 300,
-              'ResourceRecords': [
-                {
-                  'Value': duration_record
-                }
-              ]
-            }
-          },
-          {
-            'Action': 'UPSERT',
-            'ResourceRecordSet': {
-              'Name': record_name_risetime,
-              'Type': 'TXT',
-              'TTL': 300,
-              'ResourceRecords': [
-                {
-                  'Value': risetime_record
-                }
-              ]
-            }
-          }
-        ]
-      }
-  )
+    # duration (of the first location) is kept for readers of the plain value, e.g. the Route53 record
+    state.put(duration=str(targets[0][1] if targets else 1), risetime=str(risetime), targets=json.dumps(targets))
   except ClientError as client_error:
     logger.error(client_error)
 
@@ -0,0 +1,383 @@
+import math
+import os
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Local ISS pass prediction: near-earth SGP4 (Vallado, WGS-72) propagated over a time grid with NumPy,
+# topocentric elevation at the configured location and the usual "visible pass" conditions
+# (satellite sunlit, observer in twilight).
+
+Tle = namedtuple('Tle', ['line1', 'line2', 'epoch', 'bstar', 'inclo', 'nodeo', 'ecco', 'argpo', 'mo', 'no_kozai'])
+Pass = namedtuple('Pass', ['begin', 'end', 'duration', 'max_elevation'])  # begin/end/duration in milliseconds
+
+TLE_PATH = os.environ.get('ISS_TLE_FILE', '/tmp/iss.tle')
+TLE_MAX_AGE = 2 * 86400
+
+# WGS-72
+MU = 398600.8
+RE = 6378.135
+XKE = 60.0 / math.sqrt(RE**3 / MU)
+J2 = 0.001082616
+J3 = -0.00000253881
+J4 = -0.00000165597
+J3OJ2 = J3 / J2
+X2O3 = 2.0 / 3.0
+TWOPI = 2.0 * math.pi
+DEG2RAD = math.pi / 180.0
+
+# WGS-84 for the observer
+WGS84_A = 6378.137
+WGS84_E2 = 6.69437999014e-3
+
+
+def parse_tle(text):
+  lines = [line.strip() for line in text.strip().splitlines() if line.strip()]
+  line1 = next(line for line in lines if line.startswith('1 '))
+  line2 = next(line for line in lines if line.startswith('2 '))
+
+  year = int(line1[18:20])
+  year += 1900 if year >= 57 else 2000
+  day_of_year = float(line1[20:32])
+  epoch = datetime(year, 1, 1, tzinfo=timezone.utc).timestamp() + (day_of_year - 1.0) * 86400.0
+
+  bstar = _implied_decimal(line1[53:61])
+
+  return Tle(
+    line1=line1,
+    line2=line2,
+    epoch=epoch,
+    bstar=bstar,
+    inclo=float(line2[8:16]) * DEG2RAD,
+    nodeo=float(line2[17:25]) * DEG2RAD,
+    ecco=float('0.' + line2[26:33].strip()),
+    argpo=float(line2[34:42]) * DEG2RAD,
+    mo=float(line2[43:51]) * DEG2RAD,
+    no_kozai=float(line2[52:63]) * TWOPI / 1440.0
+  )
+
+
+def load_tle(url, fetch, path=TLE_PATH, max_age=TLE_MAX_AGE, now=None):
+  # TLE is kept in /tmp and only refreshed when older than max_age, a stale copy beats no copy
+  now = time.time() if now is None else now
+  cached = None
+  if os.path.exists(path):
+    with open(path) as tle_file:
+      cached = tle_file.read()
+    if now - os.path.getmtime(path) < max_age:
+      return parse_tle(cached)
+
+  try:
+    text = fetch(url)
+    tle = parse_tle(text)
+  except Exception:
+    if cached is None:
+      raise
+    return parse_tle(cached)
+
+  tmp_path = f"{path}.{os.getpid()}"
+  with open(tmp_path, 'w') as tle_file:
+    tle_file.write(f"{tle.line1}\n{tle.line2}\n")
+  os.replace(tmp_path, path)
+  return tle
+
+
+class Sgp4:
+
+  def __init__(self, tle):
+    self.tle = tle
+    self.bstar = tle.bstar
+    self.ecco = tle.ecco
+    self.inclo = tle.inclo
+    self.nodeo = tle.nodeo
+    self.argpo = tle.argpo
+    self.mo = tle.mo
+
+    ecco = tle.ecco
+    cosio = math.cos(tle.inclo)
+    sinio = math.sin(tle.inclo)
+    cosio2 = cosio * cosio
+    omeosq = 1.0 - ecco * ecco
+    rteosq = math.sqrt(omeosq)
+
+    # Un-Kozai the mean motion
+    ak = (XKE / tle.no_kozai)**X2O3
+    d1 = 0.75 * J2 * (3.0 * cosio2 - 1.0) / (rteosq * omeosq)
+    delta = d1 / (ak * ak)
+    adel = ak * (1.0 - delta * delta - delta * (1.0 / 3.0 + 134.0 * delta * delta / 81.0))
+    delta = d1 / (adel * adel)
+    no = tle.no_kozai / (1.0 + delta)
+    ao = (XKE / no)**X2O3
+    po = ao * omeosq
+    con42 = 1.0 - 5.0 * cosio2
+    con41 = -con42 - cosio2 - cosio2
+    posq = po * po
+    rp = ao * (1.0 - ecco)
+
+    if TWOPI / no >= 225.0:
+      raise ValueError('deep-space orbits are not supported')
+
+    self.isimp = rp < (220.0 / RE + 1.0)
+    sfour = 78.0 / RE + 1.0
+    qzms24 = ((120.0 - 78.0) / RE)**4
+    perige = (rp - 1.0) * RE
+    if perige < 156.0:
+      sfour = perige - 78.0
+      if perige < 98.0:
+        sfour = 20.0
+      qzms24 = ((120.0 - sfour) / RE)**4
+      sfour = sfour / RE + 1.0
+
+    pinvsq = 1.0 / posq
+    tsi = 1.0 / (ao - sfour)
+    eta = ao * ecco * tsi
+    etasq = eta * eta
+    eeta = ecco * eta
+    psisq = abs(1.0 - etasq)
+    coef = qzms24 * tsi**4
+    coef1 = coef / psisq**3.5
+    cc2 = coef1 * no * (ao * (1.0 + 1.5 * etasq + eeta * (4.0 + etasq))
+                        + 0.375 * J2 * tsi / psisq * con41 * (8.0 + 3.0 * etasq * (8.0 + etasq)))
+    cc1 = tle.bstar * cc2
+    cc3 = -2.0 * coef * tsi * J3OJ2 * no * sinio / ecco if ecco > 1.0e-4 else 0.0
+    x1mth2 = 1.0 - cosio2
+    cc4 = 2.0 * no * coef1 * ao * omeosq * (
+      eta * (2.0 + 0.5 * etasq) + ecco * (0.5 + 2.0 * etasq) - J2 * tsi / (ao * psisq) *
+      (-3.0 * con41 * (1.0 - 2.0 * eeta + etasq * (1.5 - 0.5 * eeta))
+       + 0.75 * x1mth2 * (2.0 * etasq - eeta * (1.0 + etasq)) * math.cos(2.0 * tle.argpo)))
+    cc5 = 2.0 * coef1 * ao * omeosq * (1.0 + 2.75 * (etasq + eeta) + eeta * etasq)
+    cosio4 = cosio2 * cosio2
+    temp1 = 1.5 * J2 * pinvsq * no
+    temp2 = 0.5 * temp1 * J2 * pinvsq
+    temp3 = -0.46875 * J4 * pinvsq * pinvsq * no
+    xhdot1 = -temp1 * cosio
+
+    self.no = no
+    self.ao = ao
+    self.eta = eta
+    self.con41 = con41
+    self.x1mth2 = x1mth2
+    self.x7thm1 = 7.0 * cosio2 - 1.0
+    self.cc1 = cc1
+    self.cc4 = cc4
+    self.cc5 = cc5
+    self.mdot = no + 0.5 * temp1 * rteosq * con41 + 0.0625 * temp2 * rteosq * (13.0 - 78.0 * cosio2 + 137.0 * cosio4)
+    self.argpdot = -0.5 * temp1 * con42 + 0.0625 * temp2 * (7.0 - 114.0 * cosio2 + 395.0 * cosio4) + temp3 * (3.0 - 36.0 * cosio2
+                                                                                                            + 49.0 * cosio4)
+    self.nodedot = xhdot1 + (0.5 * temp2 * (4.0 - 19.0 * cosio2) + 2.0 * temp3 * (3.0 - 7.0 * cosio2)) * cosio
+    self.omgcof = tle.bstar * cc3 * math.cos(tle.argpo)
+    self.xmcof = -X2O3 * coef * tle.bstar / eeta if ecco > 1.0e-4 else 0.0
+    self.nodecf = 3.5 * omeosq * xhdot1 * cc1
+    self.t2cof = 1.5 * cc1
+    denominator = 1.0 + cosio if abs(cosio + 1.0) > 1.5e-12 else 1.5e-12
+    self.xlcof = -0.25 * J3OJ2 * sinio * (3.0 + 5.0 * cosio) / denominator
+    self.aycof = -0.5 * J3OJ2 * sinio
+    self.delmo = (1.0 + eta * math.cos(tle.mo))**3
+    self.sinmao = math.sin(tle.mo)
+
+    if not self.isimp:
+      cc1sq = cc1 * cc1
+      self.d2 = 4.0 * ao * tsi * cc1sq
+      temp = self.d2 * tsi * cc1 / 3.0
+      self.d3 = (17.0 * ao + sfour) * temp
+      self.d4 = 0.5 * temp * ao * tsi * (221.0 * ao + 31.0 * sfour) * cc1
+      self.t3cof = self.d2 + 2.0 * cc1sq
+      self.t4cof = 0.25 * (3.0 * self.d3 + cc1 * (12.0 * self.d2 + 10.0 * cc1sq))
+      self.t5cof = 0.2 * (3.0 * self.d4 + 12.0 * cc1 * self.d3 + 6.0 * self.d2 * self.d2 + 15.0 * cc1sq * (2.0 * self.d2 + cc1sq))
+
+  def propagate(self, unix_times):
+    # TEME position in km for an array of unix times
+    t = (np.asarray(unix_times, dtype=float) - self.tle.epoch) / 60.0
+
+    xmdf = self.mo + self.mdot * t
+    argpdf = self.argpo + self.argpdot * t
+    nodedf = self.nodeo + self.nodedot * t
+    t2 = t * t
+    nodem = nodedf + self.nodecf * t2
+    tempa = 1.0 - self.cc1 * t
+    tempe = self.bstar * self.cc4 * t
+    templ = self.t2cof * t2
+    argpm = argpdf
+    mm = xmdf
+
+    if not self.isimp:
+      delomg = self.omgcof * t
+      delm = self.xmcof * ((1.0 + self.eta * np.cos(xmdf))**3 - self.delmo)
+      temp = delomg + delm
+      mm = xmdf + temp
+      argpm = argpdf - temp
+      t3 = t2 * t
+      t4 = t3 * t
+      tempa = tempa - self.d2 * t2 - self.d3 * t3 - self.d4 * t4
+      tempe = tempe + self.bstar * self.cc5 * (np.sin(mm) - self.sinmao)
+      templ = templ + self.t3cof * t3 + t4 * (self.t4cof + t * self.t5cof)
+
+    am = (XKE / self.no)**X2O3 * tempa * tempa
+    em = np.maximum(self.ecco - tempe, 1.0e-6)
+    mm = mm + self.no * templ
+    xlm = mm + argpm + nodem
+    nodem = np.fmod(nodem, TWOPI)
+    argpm = np.fmod(argpm, TWOPI)
+    xlm = np.fmod(xlm, TWOPI)
+    mm = np.fmod(xlm - argpm - nodem, TWOPI)
+
+    # Long period periodics
+    axnl = em * np.cos(argpm)
+    temp = 1.0 / (am * (1.0 - em * em))
+    aynl = em * np.sin(argpm) + temp * self.aycof
+    xl = mm + argpm + nodem + temp * self.xlcof * axnl
+
+    # Kepler's equation, fixed iteration count keeps it vectorized
+    u = np.fmod(xl - nodem, TWOPI)
+    eo1 = u
+    for _ in range(10):
+      sineo1 = np.sin(eo1)
+      coseo1 = np.cos(eo1)
+      tem5 = (u - aynl * coseo1 + axnl * sineo1 - eo1) / (1.0 - coseo1 * axnl - sineo1 * aynl)
+      eo1 = eo1 + np.clip(tem5, -0.95, 0.95)
+    sineo1 = np.sin(eo1)
+    coseo1 = np.cos(eo1)
+
+    # Short period periodics
+    ecose = axnl * coseo1 + aynl * sineo1
+    esine = axnl * sineo1 - aynl * coseo1
+    el2 = axnl * axnl + aynl * aynl
+    pl = am * (1.0 - el2)
+    rl = am * (1.0 - ecose)
+    betal = np.sqrt(1.0 - el2)
+    temp = esine / (1.0 + betal)
+    sinu = am / rl * (sineo1 - aynl - axnl * temp)
+    cosu = am / rl * (coseo1 - axnl + aynl * temp)
+    su = np.arctan2(sinu, cosu)
+    sin2u = (cosu + cosu) * sinu
+    cos2u = 1.0 - 2.0 * sinu * sinu
+    temp = 1.0 / pl
+    temp1 = 0.5 * J2 * temp
+    temp2 = temp1 * temp
+
+    cosip = math.cos(self.inclo)
+    sinip = math.sin(self.inclo)
+    mrt = rl * (1.0 - 1.5 * temp2 * betal * self.con41) + 0.5 * temp1 * self.x1mth2 * cos2u
+    su = su - 0.25 * temp2 * self.x7thm1 * sin2u
+    xnode = nodem + 1.5 * temp2 * cosip * sin2u
+    xinc = self.inclo + 1.5 * temp2 * cosip * sinip * cos2u
+
+    sinsu = np.sin(su)
+    cossu = np.cos(su)
+    snod = np.sin(xnode)
+    cnod = np.cos(xnode)
+    sini = np.sin(xinc)
+    cosi = np.cos(xinc)
+    xmx = -snod * cosi
+    xmy = cnod * cosi
+
+    return np.stack([
+      mrt * (xmx * sinsu + cnod * cossu),
+      mrt * (xmy * sinsu + snod * cossu),
+      mrt * (sini * sinsu)
+    ], axis=-1) * RE
+
+
+def gmst(unix_times):
+  tut1 = (np.asarray(unix_times, dtype=float) / 86400.0 + 2440587.5 - 2451545.0) / 36525.0
+  seconds = -6.2e-6 * tut1**3 + 0.093104 * tut1**2 + (876600.0 * 3600.0 + 8640184.812866) * tut1 + 67310.54841
+  return np.mod(seconds * DEG2RAD / 240.0, TWOPI)
+
+
+def teme_to_ecef(positions, theta):
+  cos_t = np.cos(theta)
+  sin_t = np.sin(theta)
+  x = positions[..., 0]
+  y = positions[..., 1]
+  return np.stack([cos_t * x + sin_t * y, -sin_t * x + cos_t * y, positions[..., 2]], axis=-1)
+
+
+def observer(lat, lon):
+  # ECEF position (km) and local "up" unit vector of a geodetic location at sea level
+  positions, ups = observers([(lat, lon)])
+  return positions[0], ups[0]
+
+
+def observers(locations):
+  # observer() for a list of (lat, lon), as (n, 3) arrays
+  phi = np.radians(np.array([float(lat) for lat, _ in locations]))
+  lam = np.radians(np.array([float(lon) for _, lon in locations]))
+  n = WGS84_A / np.sqrt(1.0 - WGS84_E2 * np.sin(phi)**2)
+  ups = np.stack([np.cos(phi) * np.cos(lam), np.cos(phi) * np.sin(lam), np.sin(phi)], axis=-1)
+  positions = np.stack([n * np.cos(phi) * np.cos(lam), n * np.cos(phi) * np.sin(lam), n * (1.0 - WGS84_E2) * np.sin(phi)], axis=-1)
+  return positions, ups
+
+
+def sun_direction(unix_times):
+  # Low precision solar position (Astronomical Almanac), unit vector in the equatorial frame of date
+  n = np.asarray(unix_times, dtype=float) / 86400.0 + 2440587.5 - 2451545.0
+  mean_longitude = (280.460 + 0.9856474 * n) * DEG2RAD
+  mean_anomaly = (357.528 + 0.9856003 * n) * DEG2RAD
+  ecliptic_longitude = mean_longitude + (1.915 * np.sin(mean_anomaly) + 0.020 * np.sin(2.0 * mean_anomaly)) * DEG2RAD
+  obliquity = (23.439 - 0.0000004 * n) * DEG2RAD
+  return np.stack([
+    np.cos(ecliptic_longitude),
+    np.cos(obliquity) * np.sin(ecliptic_longitude),
+    np.sin(obliquity) * np.sin(ecliptic_longitude)
+  ], axis=-1)
+
+
+def predict_passes(tle, lat, lon, start, days=3, step=10, min_elevation=10.0, visible_only=True, count=None):
+  return predict_passes_for(tle, [(lat, lon)], start, days, step, min_elevation, visible_only, count)[0]
+
+
+def predict_passes_for(tle, locations, start, days=3, step=10, min_elevation=10.0, visible_only=True, count=None):
+  # Passes for a list of (lat, lon), one list per location. Propagation, sun position and earth shadow only
+  # depend on time and are computed once, locations only add the (locations x times) elevation arrays.
+  # Grid aligned to whole steps, so repeated runs predict identical times (and write identical state)
+  times = (start // step) * step + np.arange(0, days * 86400, step, dtype=float)
+
+  sgp4 = Sgp4(tle)
+  teme = sgp4.propagate(times)
+  theta = gmst(times)
+  ecef = teme_to_ecef(teme, theta)
+
+  stations, ups = observers(locations)
+  rho = ecef[None, :, :] - stations[:, None, :]
+  elevation = np.degrees(np.arcsin(np.einsum('ltk,lk->lt', rho, ups) / np.linalg.norm(rho, axis=-1)))
+
+  above = elevation >= min_elevation
+  if visible_only:
+    sun = sun_direction(times)
+    sun_elevation = np.degrees(np.arcsin(ups @ teme_to_ecef(sun, theta).T))
+    # Cylindrical earth shadow
+    along = np.einsum('ij,ij->i', teme, sun)
+    perpendicular = np.linalg.norm(teme - along[:, None] * sun, axis=-1)
+    sunlit = (along > 0.0) | (perpendicular > RE)
+    above &= sunlit[None, :] & (sun_elevation < -6.0)
+
+  return [_runs(times, elevation[index], above[index], count) for index in range(len(locations))]
+
+
+def _runs(times, elevation, mask, count=None):
+  # Contiguous True runs of mask -> passes
+  edges = np.diff(mask.astype(np.int8), prepend=0, append=0)
+  starts = np.flatnonzero(edges == 1)
+  stops = np.flatnonzero(edges == -1) - 1
+
+  passes = []
+  for first, last in zip(starts, stops):
+    begin = int(round(times[first] * 1000))
+    end = int(round(times[last] * 1000))
+    passes.append(Pass(begin, end, end - begin, float(elevation[first:last + 1].max())))
+    if count is not None and len(passes) >= count:
+      break
+  return passes
+
+
+def _implied_decimal(field):
+  # TLE "implied decimal point" notation, e.g. " 12345-3" -> 0.12345e-3
+  field = field.strip()
+  if not field:
+    return 0.0
+  sign = -1.0 if field[0] == '-' else 1.0
+  field = field.lstrip('+-')
+  mantissa, exponent = field[:-2], field[-2:]
+  return sign * float(f"0.{mantissa.strip()}e{exponent}")
@@ -0,0 +1,199 @@
+import os
+import time
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
+from math import asin, atan2, cos, floor, pi, radians, sin
+
+from aws4home_runtime import timeconv
+
+# Moon events computed locally, no API: moonrise at a location and new/full moon. The events of a year or
+# more are tabled once per execution environment (and kept in /tmp) as two sorted arrays, the next event is
+# a binary search away like the Bond programme.
+#
+# Moon position from the low-precision series of Montenbruck & Pfleger (a few arcminutes, moonrise within
+# about a minute), lunar phases from Meeus, Astronomical Algorithms ch. 49 without the planetary terms (within
+# a minute or two). Event times are floored to the minute, as the cron expressions they end up in.
+
+DAY = 86400
+ARC = 206264.8062
+DELTA_T = 69    # TT - UTC, seconds
+# Altitude of the moon's centre at moonrise: parallax - refraction - semidiameter
+RISE_ALTITUDE = radians(0.125)
+# Altitude is sampled hourly, a rise and set within one hour (far north/south only) is missed
+SCAN_STEP = 3600
+# Moonrises are at least this far apart (about 23 h at 60 degrees latitude)
+RISE_GAP = 20 * 3600
+
+KINDS = ('moonrise', 'new', 'full')
+
+Table = namedtuple('Table', ['times', 'kinds'])    # times: array('q') unix seconds, kinds: array('b') index into KINDS
+
+_tables = {}
+
+
+def julian(utc):
+  return utc / DAY + 2440587.5
+
+
+def frac(x):
+  return x - floor(x)
+
+
+def moon_position(utc):
+  # -> (right ascension, declination) in radians, geocentric, of date
+  t = (julian(utc + DELTA_T) - 2451545.0) / 36525.0
+  l0 = frac(0.606433 + 1336.855225 * t)
+  l = 2 * pi * frac(0.374897 + 1325.552410 * t)
+  ls = 2 * pi * frac(0.993133 + 99.997361 * t)
+  d = 2 * pi * frac(0.827361 + 1236.853086 * t)
+  f = 2 * pi * frac(0.259086 + 1342.227825 * t)
+
+  dl = (22640 * sin(l) - 4586 * sin(l - 2 * d) + 2370 * sin(2 * d) + 769 * sin(2 * l) - 668 * sin(ls)
+        - 412 * sin(2 * f) - 212 * sin(2 * l - 2 * d) - 206 * sin(l + ls - 2 * d) + 192 * sin(l + 2 * d)
+        - 165 * sin(ls - 2 * d) - 125 * sin(d) - 110 * sin(l + ls) + 148 * sin(l - ls) - 55 * sin(2 * f - 2 * d))
+  s = f + (dl + 412 * sin(2 * f) + 541 * sin(ls)) / ARC
+  h = f - 2 * d
+  n = (-526 * sin(h) + 44 * sin(l + h) - 31 * sin(-l + h) - 23 * sin(ls + h) + 11 * sin(-ls + h)
+       - 25 * sin(-2 * l + f) + 21 * sin(-l + f))
+  longitude = 2 * pi * frac(l0 + dl / 1296000)
+  latitude = (18520 * sin(s) + n) / ARC
+
+  obliquity = radians(23.43929111 - 0.0130042 * t)
+  x = cos(latitude) * cos(longitude)
+  y = cos(obliquity) * cos(latitude) * sin(longitude) - sin(obliquity) * sin(latitude)
+  z = sin(obliquity) * cos(latitude) * sin(longitude) + cos(obliquity) * sin(latitude)
+  return atan2(y, x), asin(z)
+
+
+def moon_altitude(utc, latitude, longitude):
+  # latitude, longitude in radians (east positive)
+  ra, dec = moon_position(utc)
+  sidereal = radians(280.46061837 + 360.98564736629 * (julian(utc) - 2451545.0)) + longitude
+  return asin(sin(latitude) * sin(dec) + cos(latitude) * cos(dec) * cos(sidereal - ra))
+
+
+def moonrises(latitude, longitude, start, end):
+  # Times in [start, end) the moon rises at (latitude, longitude) in degrees
+  phi, lam = radians(float(latitude)), radians(float(longitude))
+  rises = []
+  utc = start
+  previous = moon_altitude(utc, phi, lam) - RISE_ALTITUDE
+  while utc < end:
+    utc += SCAN_STEP
+    current = moon_altitude(utc, phi, lam) - RISE_ALTITUDE
+    if previous < 0 <= current:
+      # Bisect the hour down to half a minute
+      low, high = utc - SCAN_STEP, utc
+      while high - low > 30:
+        middle = (low + high) // 2
+        if moon_altitude(middle, phi, lam) < RISE_ALTITUDE:
+          low = middle
+        else:
+          high = middle
+      if high < end:
+        rises.append(high)
+      # The next rise is almost a day later
+      utc = high + RISE_GAP
+      current = moon_altitude(utc, phi, lam) - RISE_ALTITUDE
+    previous = current
+  return rises
+
+
+def phases(start, end):
+  # -> [(time, 'new' | 'full')] in [start, end)
+  found = []
+  k = floor((1970 + start / (365.25 * DAY) - 2000) * 12.3685) - 1
+  while True:
+    for kind, offset in (('new', 0.0), ('full', 0.5)):
+      utc = phase_time(k + offset)
+      if utc >= end:
+        return found
+      if utc >= start:
+        found.append((utc, kind))
+    k += 1
+
+
+def phase_time(k):
+  # k: integer for a new moon, + 0.5 for the full moon after it (Meeus 49.1)
+  t = k / 1236.85
+  jde = 2451550.09766 + 29.530588861 * k + 0.00015437 * t * t - 0.000000150 * t ** 3 + 0.00000000073 * t ** 4
+  e = 1 - 0.002516 * t - 0.0000074 * t * t
+  m = radians(2.5534 + 29.10535670 * k - 0.0000014 * t * t)
+  mp = radians(201.5643 + 385.81693528 * k + 0.0107582 * t * t)
+  f = radians(160.7108 + 390.67050284 * k - 0.0016118 * t * t)
+  omega = radians(124.7746 - 1.56375588 * k + 0.0020672 * t * t)
+
+  if k == floor(k):
+    first = -0.40720 * sin(mp) + 0.17241 * e * sin(m) + 0.01608 * sin(2 * mp) + 0.01039 * sin(2 * f) + 0.00739 * e * sin(mp - m)
+  else:
+    first = -0.40614 * sin(mp) + 0.17302 * e * sin(m) + 0.01614 * sin(2 * mp) + 0.01043 * sin(2 * f) + 0.00734 * e * sin(mp - m)
+  jde += (first - 0.00514 * e * sin(mp + m) + 0.00208 * e * e * sin(2 * m) - 0.00111 * sin(mp - 2 * f)
+          - 0.00057 * sin(mp + 2 * f) + 0.00056 * e * sin(2 * mp + m) - 0.00042 * sin(3 * mp) + 0.00042 * e * sin(m + 2 * f)
+          + 0.00038 * e * sin(m - 2 * f) - 0.00024 * e * sin(2 * mp - m) - 0.00017 * sin(omega) - 0.00007 * sin(mp + 2 * m))
+  return round((jde - 2440587.5) * DAY) - DELTA_T
+
+
+def build(latitude, longitude, start, end, kinds=KINDS):
+  events = []
+  if 'moonrise' in kinds:
+    events += [(utc, 'moonrise') for utc in moonrises(latitude, longitude, start, end)]
+  events += [(utc, kind) for utc, kind in phases(start, end) if kind in kinds]
+  events.sort()
+  return Table(
+    array('q', (utc - utc % 60 for utc, _ in events)),
+    array('b', (KINDS.index(kind) for _, kind in events))
+  )
+
+
+def table(latitude, longitude, kinds, now, years=1, directory='/tmp'):
+  # Table from the start of now's month over `years` years and a month, from memory, /tmp or built
+  today = time.gmtime(now)
+  start = timeconv.wall(today.tm_year, today.tm_mon, 1)
+  end = timeconv.wall(today.tm_year + years, today.tm_mon, 1) + 31 * DAY
+  key = f"{float(latitude):.4f}_{float(longitude):.4f}_{'-'.join(sorted(kinds))}_{today.tm_year}-{today.tm_mon:02d}_{years}"
+  cached = _tables.get(key)
+  if cached is not None:
+    return cached
+
+  path = os.path.join(directory, f"ephemeris_{key}.bin")
+  try:
+    cached = load(path)
+  except (OSError, ValueError, EOFError):
+    cached = build(latitude, longitude, start, end, kinds)
+    save(path, cached)
+  _tables[key] = cached
+  return cached
+
+
+def save(path, events):
+  # Count, times, kinds. Written aside and renamed, concurrent readers see the old file or the new one
+  partial = f"{path}.{os.getpid()}"
+  with open(partial, 'wb') as out:
+    array('q', [len(events.times)]).tofile(out)
+    events.times.tofile(out)
+    events.kinds.tofile(out)
+  os.replace(partial, path)
+
+
+def load(path):
+  with open(path, 'rb') as source:
+    count = array('q')
+    count.fromfile(source, 1)
+    times, kinds = array('q'), array('b')
+    times.fromfile(source, count[0])
+    kinds.fromfile(source, count[0])
+  return Table(times, kinds)
+
+
+def next_index(events, now):
+  # Index of the first event after now, len(events.times) if there is none
+  return bisect_right(events.times, now)
+
+
+def due(events, now, window):
+  # Index of the event that started up to window seconds ago (the one the rule fired for), or None
+  index = next_index(events, now) - 1
+  if index >= 0 and now - events.times[index] < window:
+    return index
+  return None
@@ -1,37 +1,113 @@
 import os
-import boto3
-import json
+import time
 from botocore.exceptions import ClientError
 
-from aws_lambda_powertools import Logger, Tracer
+from aws_lambda_powertools import Logger, Metrics
+from aws4home_runtime import clients, dedupe, instrument, logpolicy, publisher, resilience, schedules, timeconv, timeline, tracing
+
+import ephemeris
 
 logger = Logger()
-tracer = Tracer()
+tracer = tracing.get_tracer()
+metrics = Metrics()
 
+lunar_prefix = os.environ.get('LUNAR_PREFIX', 'lunar-lander')
+# Moon events to light up for, any of ephemeris.KINDS
+lunar_events = [kind.strip() for kind in os.environ.get('LUNAR_EVENTS', 'moonrise').split(',') if kind.strip()]
+lunar_duration = int(os.environ.get('LUNAR_DURATION', '600'))
+lunar_schedule_days = int(os.environ.get('LUNAR_SCHEDULE_DAYS', '30'))
+ephemeris_years = int(os.environ.get('LUNAR_EPHEMERIS_YEARS', '1'))
+ephemeris_dir = os.environ.get('LUNAR_EPHEMERIS_DIR', '/tmp')
+latitude = os.environ.get('LUNAR_LATITUDE', '0')
+longitude = os.environ.get('LUNAR_LONGITUDE', '0')
 mqtt_topic = os.environ['MQTT_TOPIC']
 
+if not lunar_events or set(lunar_events) - set(ephemeris.KINDS):
+  raise ValueError(f"LUNAR_EVENTS must be a list of {', '.join(ephemeris.KINDS)}, not {lunar_events}")
+
+# A run up to this many seconds after an event was fired for it (and publishes), any other run only reschedules
+DUE_WINDOW = 300
+
 
 @tracer.capture_lambda_handler
-@logger.inject_lambda_context(log_event=True)
+@logpolicy.inject(logger)
+@metrics.log_metrics
+@dedupe.report(metrics)
+@instrument.report(metrics)
+@publisher.batched(logger)
 def handler(event, context):
+  if schedules.is_scheduled_event(event):
+    publish_to_iot(mqtt_topic, event['pattern'], event['duration'])
+    return
+
+  try:
+    current_time_unix = int(time.time())
+
+    with instrument.stage('ephemeris'):
+      events = load_events(current_time_unix)
+      first = ephemeris.next_index(events, current_time_unix)
+
+    if timeline.enabled():
+      upcoming = [
+        timeline.Event(events.times[index], lunar_duration, lunar_prefix, mqtt_topic, "lunar-lander")
+        for index in range(first, ephemeris.next_index(events, current_time_unix + timeline.HORIZON))
+      ]
+      with instrument.stage('rule'):
+        expression = timeline.update(lunar_prefix, upcoming, current_time_unix, resilience.RETRY_EXPRESSION)
+      logger.info("timeline: %d moon event(s), next slot: %s", len(upcoming), expression)
+      return
+
+    if schedules.enabled():
+      horizon = current_time_unix + lunar_schedule_days * timeconv.DAY
+      entries = [
+        schedules.Entry(events.times[index], {'pattern': "lunar-lander", 'duration': lunar_duration})
+        for index in range(first, len(events.times)) if events.times[index] < horizon
+      ]
+      with instrument.stage('schedule'):
+        result = schedules.reconcile(lunar_prefix, entries, context.invoked_function_arn)
+      logger.info("schedule: %s", result)
+      return
+
+    fired = ephemeris.due(events, current_time_unix, DUE_WINDOW)
+    if fired is not None:
+      logger.info("moon event: %s", ephemeris.KINDS[events.kinds[fired]])
+      publish_to_iot(mqtt_topic, "lunar-lander", lunar_duration)
 
-  publish_to_iot(mqtt_topic, "lunar-lander", 600)
+    if first < len(events.times):
+      cron_expression = timeconv.cron(events.times[first])
+      logger.debug("next moon event: %s new cron expression: %s", ephemeris.KINDS[events.kinds[first]], cron_expression)
+      update_event_rule(cron_expression)
+      return
+
+    logger.warning("no upcoming moon event, next run: %s", resilience.RETRY_EXPRESSION)
+    update_event_rule(resilience.RETRY_EXPRESSION)
+
+  except Exception as e:
+    raise Exception('ERROR - handler - Debug by hand: ' + str(e))
+
+
+@tracer.capture_method
+def load_events(now):
+  return ephemeris.table(latitude, longitude, lunar_events, now, years=ephemeris_years, directory=ephemeris_dir)
 
 
 @tracer.capture_method
 def publish_to_iot(topic, pattern, duration):
+  # Queued, sent with whatever else this invocation publishes, see publisher
+  publisher.publish(topic, pattern, duration)
+
+
+@tracer.capture_method
+@instrument.timed('rule')
+def update_event_rule(cron_expression):
 
   try:
-    iot = boto3.client("iot-data",verify = False)
-    iot.publish(
-      topic=topic,
-      qos=0,
-      payload=json.dumps(
-        {
-          "pattern": pattern,
-          "duration": duration
-        }
-      ),
-    )
+    events = clients.get("events")
+    dedupe.write_once(f"rule:{lunar_prefix}", cron_expression, lambda: events.put_rule(
+      Name=lunar_prefix,
+      ScheduleExpression=cron_expression,
+      State='ENABLED',
+      Description='Scheduled trigger for [OVERWRITTEN w/ time of the next moon event]',
+    ))
   except ClientError as client_error:
     logger.error(client_error)
@@ -0,0 +1,72 @@
+import importlib.util
+import json
+import os
+import sys
+
+from aws4home_runtime import schedules
+
+# One function for every feature (config Consolidated): each event is handed to the handler of the feature
+# it is meant for, and all features share one execution environment, i.e. warm AWS clients, HTTP session,
+# caches and /tmp. A feature is imported on its first event.
+#
+# AWS4HOME_ROUTES maps rule, queue and schedule prefix names to feature directories, e.g. {"iss": "iss",
+# "garagedoor_shadow": "garagedoor-shadow"}. Events that carry none of them (e.g. sensor states sent by an
+# IoT rule) go to AWS4HOME_DEFAULT_ROUTE.
+
+FUNCTION_ROOT = os.environ.get('AWS4HOME_FUNCTION_ROOT', os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+ROUTES = json.loads(os.environ.get('AWS4HOME_ROUTES') or '{}')
+DEFAULT_ROUTE = os.environ.get('AWS4HOME_DEFAULT_ROUTE')
+
+_handlers = {}
+
+
+def handler(event, context):
+  return feature_handler(route(event))(event, context)
+
+
+def route(event):
+  # -> route name, a key of ROUTES
+  name = None
+  if schedules.is_scheduled_event(event):
+    name = event.get('prefix')
+  elif isinstance(event, dict) and event.get('Records'):
+    # SQS: arn:aws:sqs:<region>:<account>:<queue name>
+    name = event['Records'][0].get('eventSourceARN', '').rsplit(':', 1)[-1]
+  elif isinstance(event, dict) and event.get('resources'):
+    # EventBridge rule: arn:aws:events:<region>:<account>:rule/<rule name>
+    name = event['resources'][0].rsplit('/', 1)[-1]
+
+  if name not in ROUTES:
+    if DEFAULT_ROUTE is None:
+      raise ValueError(f"no route for {name or 'event'}")
+    name = DEFAULT_ROUTE
+  return name
+
+
+def feature_handler(name):
+  loaded = _handlers.get(name)
+  if loaded is None:
+    loaded = _handlers[name] = load(name, ROUTES[name])
+  return loaded
+
+
+def load(name, feature):
+  directory = os.path.join(FUNCTION_ROOT, feature)
+  # Sibling modules (listing, predictor, shadow, ...) have distinct names across features
+  if directory not in sys.path:
+    sys.path.append(directory)
+
+  # Logger and Metrics of the feature take the route name as service, as in a function of its own
+  service_name = os.environ.get('POWERTOOLS_SERVICE_NAME')
+  os.environ['POWERTOOLS_SERVICE_NAME'] = name
+  try:
+    spec = importlib.util.spec_from_file_location(f"aws4home_feature_{feature.replace('-', '_')}", os.path.join(directory, 'index.py'))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+  finally:
+    if service_name is None:
+      os.environ.pop('POWERTOOLS_SERVICE_NAME', None)
+    else:
+      os.environ['POWERTOOLS_SERVICE_NAME'] = service_name
+  return module.handler
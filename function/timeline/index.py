@@ -0,0 +1,42 @@
+import time
+
+from aws_lambda_powertools import Logger, Metrics
+from aws4home_runtime import dedupe, instrument, logpolicy, publisher, resilience, timeline, tracing
+
+logger = Logger()
+tracer = tracing.get_tracer()
+metrics = Metrics()
+
+# Fired by the timeline rule at the start of a slot (config Timeline): publishes every slot starting in this
+# minute, across topics, and points the rule at the next one. The features keep the events up to date.
+
+# A slot that started up to this many seconds ago is still published, e.g. for a late or retried invocation
+DUE_WINDOW = 300
+
+
+@tracer.capture_lambda_handler
+@logpolicy.inject(logger)
+@metrics.log_metrics
+@dedupe.report(metrics)
+@instrument.report(metrics)
+@publisher.batched(logger)
+def handler(event, context):
+  current_time_unix = int(time.time())
+  minute_end = current_time_unix - current_time_unix % 60 + 60
+
+  with instrument.stage('timeline'):
+    current = timeline.build(timeline.load())
+  logger.debug("%d slot(s) on the timeline", len(current.slots))
+
+  # Rules fire at the beginning of the minute, slots may start anywhere in it
+  for slot in timeline.window(current, current_time_unix - DUE_WINDOW, minute_end):
+    if slot.start >= current_time_unix - DUE_WINDOW:
+      # Once per slot, the previous run may have been fired for it already
+      published = dedupe.write_once(f"slot:{slot.event.topic}", [slot.start, slot.event.pattern], lambda: publisher.publish(
+        slot.event.topic, slot.event.pattern, slot.end - max(slot.start, current_time_unix)))
+      if published:
+        logger.info("slot: %s %s on %s until %s", slot.event.source, slot.event.pattern, slot.event.topic, slot.end)
+
+  with instrument.stage('rule'):
+    expression = timeline.reschedule(current, current_time_unix, resilience.RETRY_EXPRESSION)
+  logger.debug("next slot: %s", expression)
@@ -0,0 +1,76 @@
+import os
+import threading
+
+from aws4home_runtime import instrument, stages
+
+# Clients are built once per execution environment and reused by every warm invocation.
+# Tests (or local runs) can swap in stand-ins with override() before calling a handler.
+# boto3 is imported on first use, so invocations that never talk to AWS don't pay for it.
+
+_lock = threading.Lock()
+_session = None
+_clients = {}
+_overrides = {}
+
+_config_kwargs = {
+  'max_pool_connections': int(os.environ.get('AWS4HOME_MAX_POOL_CONNECTIONS', '10')),
+  'tcp_keepalive': True,
+  'connect_timeout': 5,
+  'read_timeout': 10,
+  'retries': {
+    'max_attempts': 3,
+    'mode': 'standard'
+  }
+}
+
+# Per-service client arguments, iot-data has always been called w/o certificate verification
+_client_kwargs = {
+  'iot-data': {
+    'verify': False
+  }
+}
+
+
+def get(service_name):
+  if service_name in _overrides:
+    return _overrides[service_name]
+
+  client = _clients.get(service_name)
+  if client is None:
+    with _lock:
+      client = _clients.get(service_name)
+      if client is None:
+        from botocore.config import Config
+
+        client = _get_session().client(service_name, config=Config(**_config_kwargs), **_client_kwargs.get(service_name, {}))
+        # Retries and response sizes of every call count towards the caller's stage
+        client.meta.events.register('after-call', instrument.after_call)
+        # No calls from a stage that timed out, e.g. resumed in a later invocation
+        client.meta.events.register('before-call', _check_stage)
+        _clients[service_name] = client
+  return client
+
+
+def override(service_name, stand_in):
+  _overrides[service_name] = stand_in
+
+
+def reset():
+  global _session
+  with _lock:
+    _overrides.clear()
+    _clients.clear()
+    _session = None
+
+
+def _check_stage(**kwargs):
+  stages.check()
+
+
+def _get_session():
+  global _session
+  if _session is None:
+    import boto3.session
+
+    _session = boto3.session.Session()
+  return _session
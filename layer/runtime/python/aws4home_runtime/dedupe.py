@@ -0,0 +1,101 @@
+import functools
+import hashlib
+import json
+import os
+import time
+
+# Skips writes whose value is identical to the last successful write of the same key, e.g. a put_rule
+# with an unchanged cron expression. Fingerprints are kept in memory and in /tmp for the lifetime of the
+# execution environment, and expire after MAX_AGE so a rule changed behind our back (e.g. by a deploy)
+# is eventually rewritten.
+
+FINGERPRINT_PATH = os.environ.get('AWS4HOME_FINGERPRINT_FILE', '/tmp/aws4home-fingerprints.json')
+MAX_AGE = int(os.environ.get('AWS4HOME_FINGERPRINT_MAX_AGE', '21600'))
+
+stats = {
+  'written': 0,
+  'skipped': 0
+}
+
+_fingerprints = None
+
+
+def fingerprint(value):
+  return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def unchanged(key, value, now=None):
+  now = time.time() if now is None else now
+  recorded = _load().get(key)
+  return recorded is not None and recorded[0] == fingerprint(value) and now - recorded[1] < MAX_AGE
+
+
+def record(key, value, now=None):
+  _load()[key] = [fingerprint(value), time.time() if now is None else now]
+  _save()
+
+
+def write_once(key, value, write):
+  # Calls write() unless value was already written for key, returns whether it wrote
+  if unchanged(key, value):
+    stats['skipped'] += 1
+    return False
+  write()
+  record(key, value)
+  stats['written'] += 1
+  return True
+
+
+def count(written=0, skipped=0):
+  stats['written'] += written
+  stats['skipped'] += skipped
+
+
+def report(metrics):
+  # Handler decorator: adds this invocation's write/skip counts to the Powertools metrics
+  def decorator(handler):
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+      try:
+        return handler(event, context)
+      finally:
+        from aws_lambda_powertools.metrics import MetricUnit
+
+        metrics.add_metric(name="Writes", unit=MetricUnit.Count, value=stats['written'])
+        metrics.add_metric(name="SkippedWrites", unit=MetricUnit.Count, value=stats['skipped'])
+        stats['written'] = 0
+        stats['skipped'] = 0
+
+    return wrapper
+
+  return decorator
+
+
+def reset():
+  global _fingerprints
+  _fingerprints = {}
+  try:
+    os.remove(FINGERPRINT_PATH)
+  except FileNotFoundError:
+    pass
+  stats['written'] = 0
+  stats['skipped'] = 0
+
+
+def _load():
+  global _fingerprints
+  if _fingerprints is None:
+    try:
+      with open(FINGERPRINT_PATH) as fingerprint_file:
+        _fingerprints = json.load(fingerprint_file)
+    except (FileNotFoundError, ValueError):
+      _fingerprints = {}
+  return _fingerprints
+
+
+def _save():
+  tmp_path = f"{FINGERPRINT_PATH}.{os.getpid()}"
+  with open(tmp_path, 'w') as fingerprint_file:
+    json.dump(_fingerprints, fingerprint_file)
+  os.replace(tmp_path, FINGERPRINT_PATH)
@@ -0,0 +1,103 @@
+import hashlib
+import os
+import pickle
+import time
+
+from aws4home_runtime import httpclient, instrument
+
+# Conditional-GET cache for upstream pages, keyed by URL. The parsed result is stored next to the
+# validators (ETag/Last-Modified), so a fresh entry or a 304 skips both the download and the parsing.
+# Entries live in memory for warm invocations and in /tmp for the lifetime of the execution environment.
+
+CACHE_DIR = os.environ.get('AWS4HOME_HTTP_CACHE_DIR', '/tmp/aws4home-http')
+
+stats = {
+  'hit': 0,
+  'not_modified': 0,
+  'miss': 0
+}
+
+_entries = {}
+
+
+def get(url, parse, ttl=0, fetch=None, headers=None):
+  # parse(response) -> value, fetch(url, headers=...) -> response (defaults to httpclient.get)
+  now = time.time()
+  entry = _entries.get(url) or _read(url)
+
+  if entry is not None and now - entry['fetched_at'] < ttl:
+    stats['hit'] += 1
+    _entries[url] = entry
+    return entry['value']
+
+  request_headers = dict(headers or {})
+  if entry is not None:
+    if entry.get('etag'):
+      request_headers['If-None-Match'] = entry['etag']
+    if entry.get('last_modified'):
+      request_headers['If-Modified-Since'] = entry['last_modified']
+
+  response = (fetch or httpclient.get)(url, headers=request_headers)
+  # A streamed response holds its pooled connection until it is read to the end or closed: closed on every
+  # path, 304s and errors aren't read at all
+  try:
+    # As announced by upstream, a streamed body can't be measured without reading it
+    instrument.add(bytes=int(response.headers.get('Content-Length') or 0))
+
+    if response.status_code == 304 and entry is not None:
+      stats['not_modified'] += 1
+      entry['fetched_at'] = now
+    else:
+      response.raise_for_status()
+      stats['miss'] += 1
+      entry = {
+        'url': url,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'fetched_at': now,
+        'value': parse(response)
+      }
+  finally:
+    response.close()
+
+  _entries[url] = entry
+  _write(url, entry)
+  return entry['value']
+
+
+def peek(url):
+  # Cached entry of url however old it is, None if there is none
+  entry = _entries.get(url) or _read(url)
+  if entry is not None:
+    _entries[url] = entry
+  return entry
+
+
+def invalidate(url=None):
+  for cached_url in ([url] if url else list(_entries)):
+    _entries.pop(cached_url, None)
+    try:
+      os.remove(_path(cached_url))
+    except FileNotFoundError:
+      pass
+
+
+def _path(url):
+  return os.path.join(CACHE_DIR, hashlib.sha256(url.encode('utf-8')).hexdigest() + '.pickle')
+
+
+def _read(url):
+  try:
+    with open(_path(url), 'rb') as cache_file:
+      entry = pickle.load(cache_file)
+  except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+    return None
+  return entry if entry.get('url') == url else None
+
+
+def _write(url, entry):
+  os.makedirs(CACHE_DIR, exist_ok=True)
+  tmp_path = f"{_path(url)}.{os.getpid()}"
+  with open(tmp_path, 'wb') as cache_file:
+    pickle.dump(entry, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+  os.replace(tmp_path, _path(url))
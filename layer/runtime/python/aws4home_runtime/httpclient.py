@@ -0,0 +1,122 @@
+import functools
+import os
+import random
+import threading
+import time
+
+from aws4home_runtime import instrument
+
+# One requests.Session per execution environment (connections are kept alive between warm invocations)
+# with connect/read timeouts on every request. Idempotent requests are retried on connection errors,
+# timeouts and 429/5xx with jittered exponential backoff. No request, retry or backoff runs past the
+# deadline set by the deadline() handler decorator, i.e. the remaining Lambda time minus a margin.
+
+CONNECT_TIMEOUT = float(os.environ.get('AWS4HOME_HTTP_CONNECT_TIMEOUT', '3.05'))
+READ_TIMEOUT = float(os.environ.get('AWS4HOME_HTTP_READ_TIMEOUT', '10'))
+MAX_ATTEMPTS = int(os.environ.get('AWS4HOME_HTTP_MAX_ATTEMPTS', '3'))
+BACKOFF_BASE = 0.25
+BACKOFF_CAP = 4.0
+
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_lock = threading.Lock()
+_session = None
+_deadline = None
+
+
+class DeadlineExceeded(Exception):
+  pass
+
+
+def deadline(margin=1.0):
+  # Handler decorator: requests made during the invocation end `margin` seconds before Lambda would time out
+  def decorator(handler):
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+      global _deadline
+      _deadline = time.monotonic() + context.get_remaining_time_in_millis() / 1000 - margin
+      try:
+        return handler(event, context)
+      finally:
+        _deadline = None
+
+    return wrapper
+
+  return decorator
+
+
+def get(url, headers=None, stream=False):
+  return request('GET', url, headers=headers, stream=stream)
+
+
+def request(method, url, headers=None, stream=False, **kwargs):
+  import requests
+
+  attempts = MAX_ATTEMPTS if method.upper() in IDEMPOTENT_METHODS else 1
+  for attempt in range(attempts):
+    last_attempt = attempt == attempts - 1
+    remaining = _remaining()
+    try:
+      response = session().request(
+        method, url,
+        headers=headers,
+        stream=stream,
+        timeout=(min(CONNECT_TIMEOUT, remaining), min(READ_TIMEOUT, remaining)),
+        **kwargs
+      )
+    except (requests.ConnectionError, requests.Timeout):
+      if last_attempt or not _backoff(attempt):
+        raise
+      continue
+
+    if response.status_code not in RETRY_STATUSES or last_attempt or not _backoff(attempt, response.headers.get('Retry-After')):
+      return response
+    response.close()
+
+
+def session():
+  global _session
+  if _session is None:
+    with _lock:
+      if _session is None:
+        import requests
+
+        new_session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=int(os.environ.get('AWS4HOME_MAX_POOL_CONNECTIONS', '10')))
+        new_session.mount('https://', adapter)
+        new_session.mount('http://', adapter)
+        _session = new_session
+  return _session
+
+
+def reset():
+  global _session, _deadline
+  with _lock:
+    if _session is not None:
+      _session.close()
+    _session = None
+    _deadline = None
+
+
+def _remaining():
+  if _deadline is None:
+    return float('inf')
+  remaining = _deadline - time.monotonic()
+  if remaining <= 0:
+    raise DeadlineExceeded('no time left for the request')
+  return remaining
+
+
+def _backoff(attempt, retry_after=None):
+  # Full jitter, Retry-After (seconds) as a lower bound. Returns False if the wait is longer than BACKOFF_CAP
+  # or would pass the deadline.
+  delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2**attempt))
+  if retry_after is not None and retry_after.isdigit():
+    delay = max(delay, float(retry_after))
+  if delay > BACKOFF_CAP or (_deadline is not None and time.monotonic() + delay >= _deadline):
+    return False
+  instrument.add(retries=1)
+  time.sleep(delay)
+  return True
@@ -0,0 +1,148 @@
+import contextlib
+import contextvars
+import functools
+import json
+import math
+import os
+import sys
+import threading
+import time
+
+# Per-stage latency, payload size and retry counts of a handler (fetch, parse, publish, ...), summed per
+# invocation and written once as metrics (EMF via Powertools) by report(). Stages may nest, e.g. parse
+# runs inside fetch. AWS calls made inside a stage add their retry attempts and response size to it.
+#
+# Local mode: with AWS4HOME_STAGE_FILE set every invocation is also appended to that file as a JSON line,
+#   python -m aws4home_runtime.instrument /tmp/aws4home-stages.jsonl
+# prints p50/p95/p99 per stage.
+
+STAGE_FILE = os.environ.get('AWS4HOME_STAGE_FILE')
+
+_lock = threading.Lock()
+_totals = {}
+_current = contextvars.ContextVar('aws4home_stage', default=None)
+
+
+class Stage:
+
+  __slots__ = ('name', 'bytes', 'retries')
+
+  def __init__(self, name):
+    self.name = name
+    self.bytes = 0
+    self.retries = 0
+
+  def add(self, bytes=0, retries=0):
+    self.bytes += bytes
+    self.retries += retries
+
+
+@contextlib.contextmanager
+def stage(name):
+  current = Stage(name)
+  token = _current.set(current)
+  started = time.monotonic()
+  try:
+    yield current
+  finally:
+    elapsed = (time.monotonic() - started) * 1000
+    _current.reset(token)
+    with _lock:
+      totals = _totals.setdefault(name, {'ms': 0.0, 'count': 0, 'bytes': 0, 'retries': 0})
+      totals['ms'] += elapsed
+      totals['count'] += 1
+      totals['bytes'] += current.bytes
+      totals['retries'] += current.retries
+
+
+def timed(name):
+  def decorator(function):
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+      with stage(name):
+        return function(*args, **kwargs)
+
+    return wrapper
+
+  return decorator
+
+
+def add(bytes=0, retries=0):
+  # Attributed to the innermost stage of the calling thread, a no-op outside of a stage
+  current = _current.get()
+  if current is not None:
+    current.add(bytes, retries)
+
+
+def after_call(http_response=None, parsed=None, **kwargs):
+  # botocore 'after-call' hook, see clients.get(). Only looks at headers, the body may be a stream.
+  retries = (parsed or {}).get('ResponseMetadata', {}).get('RetryAttempts', 0)
+  headers = getattr(http_response, 'headers', None) or {}
+  add(int(headers.get('content-length') or 0), retries)
+
+
+def snapshot():
+  with _lock:
+    return {name: dict(totals) for name, totals in _totals.items()}
+
+
+def reset():
+  with _lock:
+    _totals.clear()
+
+
+def report(metrics):
+  # Handler decorator: adds this invocation's stage totals to the Powertools metrics
+  def decorator(handler):
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+      try:
+        return handler(event, context)
+      finally:
+        from aws_lambda_powertools.metrics import MetricUnit
+
+        totals = snapshot()
+        reset()
+        for name, stage_totals in totals.items():
+          metrics.add_metric(name=f"{name}.duration", unit=MetricUnit.Milliseconds, value=round(stage_totals['ms'], 2))
+          metrics.add_metric(name=f"{name}.retries", unit=MetricUnit.Count, value=stage_totals['retries'])
+          if stage_totals['bytes']:
+            metrics.add_metric(name=f"{name}.bytes", unit=MetricUnit.Bytes, value=stage_totals['bytes'])
+        if STAGE_FILE:
+          with open(STAGE_FILE, 'a') as stage_file:
+            stage_file.write(json.dumps(totals, sort_keys=True) + '\n')
+
+    return wrapper
+
+  return decorator
+
+
+def percentile(values, q):
+  # Nearest rank
+  ordered = sorted(values)
+  return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def table(invocations):
+  # invocations: stage totals as written by report(), one dict per invocation
+  samples = {}
+  for totals in invocations:
+    for name, stage_totals in totals.items():
+      samples.setdefault(name, []).append(stage_totals)
+
+  lines = [f"{'stage':<16} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'bytes p50':>10} {'retries':>8}"]
+  for name, stage_samples in sorted(samples.items()):
+    durations = [sample['ms'] for sample in stage_samples]
+    lines.append(
+      f"{name:<16} {len(durations):>5} {percentile(durations, 50):>9.1f} {percentile(durations, 95):>9.1f} "
+      f"{percentile(durations, 99):>9.1f} {percentile([sample['bytes'] for sample in stage_samples], 50):>10} "
+      f"{sum(sample['retries'] for sample in stage_samples):>8}"
+    )
+  return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+  with open(sys.argv[1] if len(sys.argv) > 1 else STAGE_FILE or '/tmp/aws4home-stages.jsonl') as stage_file:
+    print(table(json.loads(line) for line in stage_file if line.strip()))
@@ -0,0 +1,63 @@
+import functools
+import json
+import logging
+import os
+import random
+
+# How much the handlers log, set per function by the stack (config LogLevel, LogDebugSampleRate, LogEvent,
+# LogEventMaxBytes):
+#   LOG_LEVEL                        level of ordinary invocations
+#   AWS4HOME_LOG_DEBUG_SAMPLE_RATE   share of invocations logged at DEBUG, decided per invocation
+#   AWS4HOME_LOG_EVENT               log the incoming event (at INFO)
+#   AWS4HOME_LOG_EVENT_MAX_BYTES     events are cut to this size
+# Messages pass their values as %-style arguments, logger.debug("targets: %s", targets), so nothing is
+# formatted for a disabled level. lazy() defers computing a value as well.
+
+SAMPLE_RATE = float(os.environ.get('AWS4HOME_LOG_DEBUG_SAMPLE_RATE', '0'))
+LOG_EVENT = os.environ.get('AWS4HOME_LOG_EVENT', 'true').lower() == 'true'
+EVENT_MAX_BYTES = int(os.environ.get('AWS4HOME_LOG_EVENT_MAX_BYTES', '2048'))
+
+
+class lazy:
+
+  __slots__ = ('function',)
+
+  def __init__(self, function):
+    self.function = function
+
+  def __str__(self):
+    return str(self.function())
+
+  __repr__ = __str__
+
+
+def truncate(event, max_bytes=None):
+  max_bytes = EVENT_MAX_BYTES if max_bytes is None else max_bytes
+  text = json.dumps(event, default=str, separators=(',', ':'))
+  encoded = text.encode('utf-8')
+  if len(encoded) <= max_bytes:
+    return text
+  return encoded[:max_bytes].decode('utf-8', 'ignore') + f"...({len(encoded)} bytes)"
+
+
+def inject(logger):
+  # Handler decorator in place of logger.inject_lambda_context(log_event=True)
+  def decorator(handler):
+    base_level = logger.log_level
+
+    def logged(event, context):
+      if LOG_EVENT and logger.log_level <= logging.INFO:
+        logger.info("event: %s", lazy(lambda: truncate(event)))
+      return handler(event, context)
+
+    injected = logger.inject_lambda_context(log_event=False)(logged)
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+      sampled = SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE
+      logger.setLevel(logging.DEBUG if sampled else base_level)
+      return injected(event, context)
+
+    return wrapper
+
+  return decorator
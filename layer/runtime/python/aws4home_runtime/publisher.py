@@ -0,0 +1,153 @@
+import functools
+import json
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from aws4home_runtime import clients, instrument, stages
+
+# Pattern messages ({pattern, duration}) for the displays. publish() only queues, messages are sent WINDOW
+# seconds after the first one was queued, or when the handler returns (batched()), whichever comes first.
+# Within that window a message for the same topic and pattern is merged into the queued one (the longer
+# duration wins), the rest is sent concurrently over the pooled iot-data client, whose HTTPS connections
+# stay open across warm invocations. A flush waits for one that is still sending (e.g. started by the
+# window's timer), so once batched() returns nothing is in flight when the environment is frozen.
+
+WINDOW = float(os.environ.get('AWS4HOME_PUBLISH_WINDOW', '0.05'))
+MAX_WORKERS = int(os.environ.get('AWS4HOME_PUBLISH_WORKERS', '8'))
+
+Message = namedtuple('Message', ['topic', 'pattern', 'duration'])
+
+stats = {
+  'queued': 0,
+  'coalesced': 0,
+  'published': 0,
+  'failed': 0
+}
+
+_lock = threading.Lock()
+# Held for the whole of a flush, sends included
+_sending = threading.Lock()
+_pending = {}
+_timer = None
+_errors = []
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='publish')
+
+
+def publish(topic, pattern, duration):
+  global _timer
+  # Nothing is queued late by a stage that timed out, it would be sent by a later invocation
+  stages.check()
+  key = (topic, pattern)
+  with _lock:
+    stats['queued'] += 1
+    queued = _pending.get(key)
+    if queued is not None:
+      stats['coalesced'] += 1
+      _pending[key] = queued._replace(duration=merge_duration(queued.duration, duration))
+      return
+    _pending[key] = Message(topic, pattern, duration)
+    if _timer is None and WINDOW > 0:
+      _timer = threading.Timer(WINDOW, flush)
+      _timer.daemon = True
+      _timer.start()
+  if WINDOW <= 0:
+    flush()
+
+
+def merge_duration(queued, duration):
+  # None is "unknown", any known duration is preferred
+  if queued is None or duration is None:
+    return duration if queued is None else queued
+  return max(queued, duration)
+
+
+def flush():
+  # Sends everything queued, returns the number of messages sent. Failures are kept for errors().
+  with _sending:
+    return _flush()
+
+
+def _flush():
+  global _timer
+  with _lock:
+    if _timer is not None:
+      _timer.cancel()
+      _timer = None
+    messages = list(_pending.values())
+    _pending.clear()
+  if not messages:
+    return 0
+
+  with instrument.stage('publish'):
+    if len(messages) == 1:
+      results = [_send(messages[0])]
+    else:
+      results = list(_executor.map(_send, messages))
+
+  failed = [error for error in results if error is not None]
+  with _lock:
+    stats['published'] += len(messages) - len(failed)
+    stats['failed'] += len(failed)
+    _errors.extend(failed)
+  return len(messages) - len(failed)
+
+
+def errors():
+  # Failures since the last call
+  with _lock:
+    failed = list(_errors)
+    _errors.clear()
+  return failed
+
+
+def batched(logger=None):
+  # Handler decorator: whatever the invocation queued is sent before it returns, failures are logged
+  def decorator(handler):
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+      try:
+        return handler(event, context)
+      finally:
+        flush()
+        for error in errors():
+          if logger is not None:
+            logger.error(error)
+
+    return wrapper
+
+  return decorator
+
+
+def reset():
+  global _timer
+  with _lock:
+    if _timer is not None:
+      _timer.cancel()
+      _timer = None
+    _pending.clear()
+    _errors.clear()
+  stats.update(queued=0, coalesced=0, published=0, failed=0)
+
+
+def _send(message):
+  from botocore.exceptions import BotoCoreError, ClientError
+
+  try:
+    clients.get("iot-data").publish(
+      topic=message.topic,
+      qos=0,
+      retain=False,
+      payload=json.dumps(
+        {
+          "pattern": message.pattern,
+          "duration": message.duration
+        }
+      )
+    )
+  except (BotoCoreError, ClientError) as error:
+    # e.g. no connection or a read timeout, reported like a rejected message
+    return error
+  return None
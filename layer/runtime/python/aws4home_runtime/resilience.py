@@ -0,0 +1,134 @@
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from urllib.parse import urlsplit
+
+from aws4home_runtime import http_cache
+
+# Upstream pages the schedules are computed from (TLE, ISS predictor, Bond listing), fetched through
+# http_cache with two fallbacks:
+# - Last good value: if upstream fails, or hasn't answered within BUDGET seconds, the last parsed value
+#   (memory or /tmp) is served. A slow refresh carries on in the background and updates the cache for a
+#   later run.
+# - Circuit breaker per host: after FAILURE_THRESHOLD failures in a row upstream isn't called for
+#   RESET_TIMEOUT seconds (open), then a single request is let through (half-open) that closes or re-opens it.
+# Without a last good value errors are raised as before. Handlers that can't compute the next run at all
+# put RETRY_EXPRESSION on their rule, so the chain of rules doesn't end.
+
+BUDGET = float(os.environ.get('AWS4HOME_UPSTREAM_BUDGET', '5'))
+FAILURE_THRESHOLD = int(os.environ.get('AWS4HOME_BREAKER_FAILURES', '3'))
+RESET_TIMEOUT = float(os.environ.get('AWS4HOME_BREAKER_RESET', '900'))
+RETRY_EXPRESSION = os.environ.get('AWS4HOME_RETRY_EXPRESSION', 'rate(30 minutes)')
+
+stats = {
+  'stale': 0,
+  'rejected': 0
+}
+
+_lock = threading.Lock()
+_breakers = {}
+_refreshing = {}
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='refresh')
+
+
+class CircuitOpen(Exception):
+  pass
+
+
+class CircuitBreaker:
+
+  def __init__(self, name, failure_threshold=None, reset_timeout=None, clock=time.time):
+    self.name = name
+    self.failure_threshold = FAILURE_THRESHOLD if failure_threshold is None else failure_threshold
+    self.reset_timeout = RESET_TIMEOUT if reset_timeout is None else reset_timeout
+    self.clock = clock
+    self.state = 'closed'
+    self.failures = 0
+    self.opened_at = None
+    self._lock = threading.Lock()
+
+  def allow(self):
+    with self._lock:
+      if self.state == 'closed':
+        return True
+      if self.state == 'open' and self.clock() - self.opened_at >= self.reset_timeout:
+        # The probe, everyone else is rejected until it succeeded or failed
+        self.state = 'half-open'
+        return True
+      return False
+
+  def success(self):
+    with self._lock:
+      self.state = 'closed'
+      self.failures = 0
+
+  def failure(self):
+    with self._lock:
+      self.failures += 1
+      if self.state == 'half-open' or self.failures >= self.failure_threshold:
+        self.state = 'open'
+        self.opened_at = self.clock()
+
+
+def breaker(name):
+  with _lock:
+    if name not in _breakers:
+      _breakers[name] = CircuitBreaker(name)
+    return _breakers[name]
+
+
+def get(url, parse, ttl=0, fetch=None, budget=None):
+  # http_cache.get() with the fallbacks above
+  budget = BUDGET if budget is None else budget
+  entry = http_cache.peek(url)
+  if entry is not None and time.time() - entry['fetched_at'] < ttl:
+    return http_cache.get(url, parse, ttl=ttl, fetch=fetch)
+
+  upstream = breaker(urlsplit(url).netloc)
+  with _lock:
+    refresh = _refreshing.get(url)
+    if refresh is None:
+      if not upstream.allow():
+        stats['rejected'] += 1
+        if entry is None:
+          raise CircuitOpen(f"{upstream.name} failed {upstream.failures} time(s), not called before {upstream.opened_at + upstream.reset_timeout:.0f}")
+        return _stale(entry)
+      # In this invocation's instrument stage
+      refresh = _refreshing[url] = _executor.submit(contextvars.copy_context().run, _refresh, url, parse, fetch, upstream)
+
+  try:
+    return refresh.result(timeout=budget if entry is not None else None)
+  except TimeoutError:
+    return _stale(entry)
+  except Exception:
+    if entry is None:
+      raise
+    return _stale(entry)
+
+
+def reset():
+  with _lock:
+    _breakers.clear()
+    _refreshing.clear()
+  stats.update(stale=0, rejected=0)
+
+
+def _refresh(url, parse, fetch, upstream):
+  try:
+    value = http_cache.get(url, parse, fetch=fetch)
+  except Exception:
+    upstream.failure()
+    raise
+  else:
+    upstream.success()
+    return value
+  finally:
+    with _lock:
+      _refreshing.pop(url, None)
+
+
+def _stale(entry):
+  stats['stale'] += 1
+  return entry['value']
@@ -0,0 +1,93 @@
+import hashlib
+import json
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from aws4home_runtime import clients, dedupe, timeconv
+
+# Materializes a list of upcoming events as one-time EventBridge Scheduler schedules in SCHEDULE_GROUP.
+# Schedule names carry the time and a hash of the payload, so an unchanged event keeps its schedule and
+# reconciling against the previous set is a plain set difference on names.
+
+SOURCE = 'aws4home.schedule'
+
+Entry = namedtuple('Entry', ['at', 'payload'])  # at: unix seconds (UTC), payload: dict sent to the target
+
+schedule_group = os.environ.get('SCHEDULE_GROUP')
+schedule_role_arn = os.environ.get('SCHEDULE_ROLE_ARN')
+
+
+def enabled():
+  return bool(schedule_group)
+
+
+def is_scheduled_event(event):
+  return isinstance(event, dict) and event.get('source') == SOURCE
+
+
+def at_expression(at):
+  return timeconv.at(at)
+
+
+def schedule_name(prefix, entry):
+  digest = hashlib.sha1(json.dumps(entry.payload, sort_keys=True).encode('utf-8')).hexdigest()[:8]
+  return f"{prefix}-{datetime.fromtimestamp(int(entry.at), timezone.utc).strftime('%Y%m%dT%H%M%S')}-{digest}"
+
+
+def list_names(prefix, group=None):
+  scheduler = clients.get("scheduler")
+  names = set()
+  for page in scheduler.get_paginator('list_schedules').paginate(GroupName=group or schedule_group, NamePrefix=f"{prefix}-"):
+    names.update(schedule['Name'] for schedule in page['Schedules'])
+  return names
+
+
+def reconcile(prefix, entries, target_arn, group=None, role_arn=None, max_workers=8):
+  group = group or schedule_group
+  role_arn = role_arn or schedule_role_arn
+  scheduler = clients.get("scheduler")
+
+  desired = {schedule_name(prefix, entry): entry for entry in entries}
+  existing = list_names(prefix, group)
+
+  to_create = [name for name in desired if name not in existing]
+  to_delete = [name for name in existing if name not in desired]
+
+  def create(name):
+    entry = desired[name]
+    scheduler.create_schedule(
+      Name=name,
+      GroupName=group,
+      ScheduleExpression=at_expression(entry.at),
+      ScheduleExpressionTimezone='UTC',
+      FlexibleTimeWindow={
+        'Mode': 'OFF'
+      },
+      ActionAfterCompletion='DELETE',
+      State='ENABLED',
+      Target={
+        'Arn': target_arn,
+        'RoleArn': role_arn,
+        'Input': json.dumps(dict(entry.payload, source=SOURCE, prefix=prefix))
+      }
+    )
+
+  def delete(name):
+    try:
+      scheduler.delete_schedule(Name=name, GroupName=group)
+    except scheduler.exceptions.ResourceNotFoundException:
+      # Already fired and cleaned up by ActionAfterCompletion
+      pass
+
+  with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    list(executor.map(delete, to_delete))
+    list(executor.map(create, to_create))
+
+  dedupe.count(written=len(to_create) + len(to_delete), skipped=len(desired) - len(to_create))
+  return {
+    'created': len(to_create),
+    'deleted': len(to_delete),
+    'unchanged': len(desired) - len(to_create)
+  }
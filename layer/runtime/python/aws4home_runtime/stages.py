@@ -0,0 +1,115 @@
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Runs a handler's I/O steps as a small dependency graph on a thread pool. A stage starts as soon as the
+# stages it depends on are done and is called with their results, in the order of its deps.
+# Every stage has its own timeout; an optional stage that fails or times out yields None instead of
+# failing the run.
+#
+# A timed out stage can't be interrupted and its thread may be frozen with the execution environment and
+# resume in a later invocation. Its stage is marked abandoned instead: check() raises StageAbandoned in it,
+# and AWS calls (see clients) and publishing check before every request, so it has no side effects late.
+
+Stage = namedtuple('Stage', ['name', 'function', 'deps', 'timeout', 'optional'], defaults=((), None, False))
+
+
+class StageError(Exception):
+
+  def __init__(self, stage, cause):
+    super().__init__(f"stage '{stage}' failed: {cause}")
+    self.stage = stage
+    self.cause = cause
+
+
+class StageTimeout(Exception):
+  pass
+
+
+class StageAbandoned(Exception):
+  pass
+
+
+_local = threading.local()
+
+
+def check():
+  # Raises StageAbandoned in the thread of a stage that timed out or whose run is over
+  stage = getattr(_local, 'stage', None)
+  if stage is not None and stage[1].is_set():
+    raise StageAbandoned(f"stage '{stage[0]}' was abandoned")
+
+
+def _call(name, abandoned, function, *args):
+  _local.stage = (name, abandoned)
+  try:
+    return function(*args)
+  finally:
+    _local.stage = None
+
+
+def run(stages, max_workers=4, deadline=None, on_error=None):
+  # deadline: seconds from now the whole graph has to finish in (e.g. remaining Lambda time)
+  by_name = {stage.name: stage for stage in stages}
+  for stage in stages:
+    missing = [dep for dep in stage.deps if dep not in by_name]
+    if missing:
+      raise ValueError(f"stage '{stage.name}' depends on unknown {missing}")
+
+  started_at = time.monotonic()
+  run_deadline = started_at + deadline if deadline is not None else None
+
+  results = {}
+  pending = list(stages)
+  running = {}
+  executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='stage')
+
+  def settle(stage, error):
+    if not stage.optional:
+      raise StageError(stage.name, error) from error
+    if on_error is not None:
+      on_error(stage.name, error)
+    results[stage.name] = None
+
+  try:
+    while pending or running:
+      for stage in [stage for stage in pending if all(dep in results for dep in stage.deps)]:
+        pending.remove(stage)
+        abandoned = threading.Event()
+        future = executor.submit(_call, stage.name, abandoned, stage.function, *[results[dep] for dep in stage.deps])
+        stage_deadline = time.monotonic() + stage.timeout if stage.timeout is not None else None
+        if run_deadline is not None:
+          stage_deadline = min(stage_deadline or run_deadline, run_deadline)
+        running[future] = (stage, stage_deadline, abandoned)
+
+      if not running:
+        raise ValueError(f"dependency cycle between {[stage.name for stage in pending]}")
+
+      deadlines = [stage_deadline for _, stage_deadline, _ in running.values() if stage_deadline is not None]
+      wait_for = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+      done, _ = wait(running, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+      for future in done:
+        stage, _, _ = running.pop(future)
+        error = future.exception()
+        if error is None:
+          results[stage.name] = future.result()
+        else:
+          settle(stage, error)
+
+      now = time.monotonic()
+      for future, (stage, stage_deadline, abandoned) in list(running.items()):
+        if stage_deadline is not None and now >= stage_deadline:
+          running.pop(future)
+          future.cancel()
+          abandoned.set()
+          settle(stage, StageTimeout(f"{stage.name} exceeded {stage.timeout}s"))
+  finally:
+    # A timed out stage can't be interrupted, don't let it hold up the invocation. Whatever still runs once
+    # the run is over (e.g. after a required stage failed) is abandoned as well.
+    for _, _, abandoned in running.values():
+      abandoned.set()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+  return results
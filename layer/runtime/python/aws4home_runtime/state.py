@@ -0,0 +1,204 @@
+import json
+import os
+import threading
+import time
+
+from aws4home_runtime import clients, dedupe
+
+# Small key/value state that survives between invocations (e.g. duration of the upcoming ISS pass).
+# Reads go through an in-memory cache per execution environment, writes go to the backend and
+# optionally to a Route53 TXT mirror.
+
+_zone_names = {}
+
+
+class FileBackend:
+
+  def __init__(self, path):
+    self.path = path
+
+  def load(self):
+    try:
+      with open(self.path) as state_file:
+        return json.load(state_file)
+    except (FileNotFoundError, ValueError):
+      return {}
+
+  def save(self, values):
+    tmp_path = f"{self.path}.{os.getpid()}"
+    with open(tmp_path, 'w') as state_file:
+      json.dump(values, state_file)
+    os.replace(tmp_path, self.path)
+
+
+class SsmBackend:
+
+  def __init__(self, parameter_name):
+    self.parameter_name = parameter_name
+
+  def load(self):
+    ssm = clients.get("ssm")
+    try:
+      response = ssm.get_parameter(Name=self.parameter_name)
+    except ssm.exceptions.ParameterNotFound:
+      return {}
+    return json.loads(response['Parameter']['Value'])
+
+  def save(self, values):
+    clients.get("ssm").put_parameter(
+      Name=self.parameter_name,
+      Value=json.dumps(values, sort_keys=True),
+      Type='String',
+      Overwrite=True
+    )
+
+
+class Route53Backend:
+  # Each key is a TXT record "<key>.<prefix>.<zone>", values are stored as quoted, escaped TXT strings
+
+  def __init__(self, hosted_zone_id, prefix, keys):
+    self.hosted_zone_id = hosted_zone_id
+    self.prefix = prefix
+    self.keys = keys
+
+  def record_name(self, key):
+    return f"{key}.{self.prefix}.{zone_name(self.hosted_zone_id)}"
+
+  def load(self):
+    route53 = clients.get("route53")
+    values = {}
+    for key in self.keys:
+      record = route53.list_resource_record_sets(
+        HostedZoneId=self.hosted_zone_id,
+        StartRecordName=self.record_name(key),
+        StartRecordType='TXT',
+        MaxItems='1'
+      )
+      record_sets = record['ResourceRecordSets']
+      if record_sets and record_sets[0]['Name'] == self.record_name(key):
+        values[key] = txt_value(record_sets[0]['ResourceRecords'][0]['Value'])
+    return values
+
+  def save(self, values):
+    clients.get("route53").change_resource_record_sets(
+      HostedZoneId=self.hosted_zone_id,
+      ChangeBatch={
+        'Comment': f"{self.prefix} state",
+        'Changes': [
+          {
+            'Action': 'UPSERT',
+            'ResourceRecordSet': {
+              'Name': self.record_name(key),
+              'Type': 'TXT',
+              'TTL': 300,
+              'ResourceRecords': [
+                {
+                  'Value': txt_record(values[key])
+                }
+              ]
+            }
+          } for key in self.keys if key in values
+        ]
+      }
+    )
+
+
+class StateStore:
+
+  def __init__(self, backend, mirror=None, ttl=900):
+    self.backend = backend
+    self.mirror = mirror
+    self.ttl = ttl
+    self._values = None
+    self._loaded_at = 0.0
+    # Stages of a handler share the store, a slow load must not overwrite what a put cached meanwhile
+    self._lock = threading.RLock()
+
+  def get(self, key, default=None):
+    with self._lock:
+      return self._load().get(key, default)
+
+  def put(self, **values):
+    # Returns whether anything was written, identical values are not written again
+    with self._lock:
+      merged = dict(self._load())
+      merged.update(values)
+      if merged == self._values:
+        dedupe.count(skipped=1)
+        return False
+
+      self.backend.save(merged)
+      dedupe.count(written=1)
+      self._values = merged
+      self._loaded_at = time.monotonic()
+      if self.mirror is not None:
+        self.mirror.save(merged)
+      return True
+
+  def invalidate(self):
+    with self._lock:
+      self._values = None
+
+  def _load(self):
+    if self._values is None or time.monotonic() - self._loaded_at > self.ttl:
+      self._values = self.backend.load()
+      self._loaded_at = time.monotonic()
+    return self._values
+
+
+def txt_record(value):
+  # TXT strings are at most 255 characters, longer values are split into several strings of one record
+  value = str(value)
+  chunks = [value[start:start + 255] for start in range(0, len(value), 255)] or ['']
+  return ' '.join('"' + chunk.replace('\\', '\\\\').replace('"', '\\"') + '"' for chunk in chunks)
+
+
+def txt_value(record):
+  # Inverse of txt_record()
+  strings = []
+  current = []
+  quoted = escaped = False
+  for char in record:
+    if escaped:
+      current.append(char)
+      escaped = False
+    elif char == '\\':
+      escaped = True
+    elif char == '"':
+      if quoted:
+        strings.append(''.join(current))
+        current = []
+      quoted = not quoted
+    elif quoted:
+      current.append(char)
+  return ''.join(strings)
+
+
+def zone_name(hosted_zone_id):
+  # The zone name never changes for the lifetime of an execution environment
+  name = _zone_names.get(hosted_zone_id)
+  if name is None:
+    name = clients.get("route53").get_hosted_zone(Id=hosted_zone_id)['HostedZone']['Name']
+    _zone_names[hosted_zone_id] = name
+  return name
+
+
+def from_environ(prefix, keys):
+  # STATE_BACKEND: ssm (default), file or route53, STATE_ROUTE53_MIRROR: true to keep TXT records up to date
+  backend_name = os.environ.get('STATE_BACKEND', 'ssm')
+  hosted_zone_id = os.environ.get('HOSTED_ZONE_ID')
+
+  if backend_name == 'ssm':
+    backend = SsmBackend(os.environ.get('STATE_PARAMETER', f"/{prefix}/state"))
+  elif backend_name == 'file':
+    backend = FileBackend(os.environ.get('STATE_FILE', f"/tmp/{prefix}-state.json"))
+  elif backend_name == 'route53':
+    backend = Route53Backend(hosted_zone_id, prefix, keys)
+  else:
+    raise ValueError(f"unknown STATE_BACKEND: {backend_name}")
+
+  mirror = None
+  if backend_name != 'route53' and os.environ.get('STATE_ROUTE53_MIRROR', 'false').lower() == 'true':
+    mirror = Route53Backend(hosted_zone_id, prefix, keys)
+
+  return StateStore(backend, mirror=mirror, ttl=int(os.environ.get('STATE_CACHE_TTL', '900')))
@@ -0,0 +1,105 @@
+import functools
+import time
+from bisect import bisect_right
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+# Local time -> UTC and EventBridge expressions. Every zone precomputes its UTC offset transitions (DST)
+# once per execution environment, converting a local time is then a binary search instead of a zoneinfo
+# lookup. Local times are "wall" seconds: the local date and time counted like a UTC timestamp, see wall().
+#
+# Ambiguous times (clocks going back) resolve to the first occurrence unless fold=1, times that don't exist
+# (clocks going forward) are read with the offset before the transition, i.e. pushed forward by the gap.
+# Both as datetime.replace(tzinfo=ZoneInfo(...), fold=fold).timestamp() does.
+
+DAY = 86400
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+SCAN_STEP = DAY
+
+
+def wall(year, month, day, hour=0, minute=0, second=0):
+  return (date(year, month, day).toordinal() - EPOCH_ORDINAL) * DAY + hour * 3600 + minute * 60 + second
+
+
+def cron(utc):
+  t = time.gmtime(int(utc))
+  return f"cron({t.tm_min} {t.tm_hour} {t.tm_mday} {t.tm_mon} ? {t.tm_year})"
+
+
+def at(utc):
+  return f"at({time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(int(utc)))})"
+
+
+@functools.lru_cache(maxsize=None)
+def zone(name):
+  return Zone(name)
+
+
+class Zone:
+
+  def __init__(self, name, start=None, end=None):
+    # Transitions are tabled from a month back to two years ahead (sampled daily, no zone changes its
+    # offset twice a day), anything outside goes through zoneinfo
+    now = int(time.time())
+    self.name = name
+    self.tzinfo = ZoneInfo(name)
+    self.start = now - 31 * DAY if start is None else start
+    self.end = now + 2 * 366 * DAY if end is None else end
+    # offsets[i] applies from transitions[i - 1] (UTC, inclusive) until transitions[i]
+    self.transitions = []
+    self.offsets = [self._offset(self.start)]
+
+    previous = self.start
+    for utc in range(self.start + SCAN_STEP, self.end + SCAN_STEP, SCAN_STEP):
+      offset = self._offset(utc)
+      if offset != self.offsets[-1]:
+        self.transitions.append(self._transition(previous, utc, self.offsets[-1]))
+        self.offsets.append(offset)
+      previous = utc
+
+  def offset(self, utc):
+    if not self.start <= utc < self.end:
+      return self._offset(utc)
+    return self.offsets[bisect_right(self.transitions, utc)]
+
+  def to_utc(self, wall, fold=0):
+    if not self.start + DAY <= wall < self.end - DAY:
+      local = datetime(1970, 1, 1) + timedelta(seconds=wall)
+      return int(local.replace(tzinfo=self.tzinfo, fold=fold).timestamp())
+
+    transitions = self.transitions
+    offsets = self.offsets
+    # Transitions are months apart, wall - offset lands next to the interval of the right offset
+    index = bisect_right(transitions, wall - offsets[0])
+    candidates = []
+    for interval in (index - 1, index, index + 1):
+      if 0 <= interval < len(offsets):
+        utc = wall - offsets[interval]
+        if (interval == 0 or transitions[interval - 1] <= utc) and (interval == len(transitions) or utc < transitions[interval]):
+          candidates.append(utc)
+
+    if candidates:
+      return candidates[-1] if fold and len(candidates) > 1 else candidates[0]
+
+    # In the gap of a transition
+    for interval in (index - 1, index, index + 1):
+      if 0 <= interval < len(transitions) and transitions[interval] + offsets[interval] <= wall < transitions[interval] + offsets[interval + 1]:
+        return wall - offsets[interval + 1 if fold else interval]
+    raise ValueError(f"{wall} not convertible in {self.name}")
+
+  def to_utc_many(self, walls, fold=0):
+    to_utc = self.to_utc
+    return [to_utc(wall, fold) for wall in walls]
+
+  def _offset(self, utc):
+    return int(datetime.fromtimestamp(utc, timezone.utc).astimezone(self.tzinfo).utcoffset().total_seconds())
+
+  def _transition(self, low, high, offset):
+    # First second in (low, high] with an offset other than `offset`
+    while high - low > 1:
+      middle = (low + high) // 2
+      if self._offset(middle) == offset:
+        low = middle
+      else:
+        high = middle
+    return high
@@ -0,0 +1,170 @@
+import heapq
+import json
+import os
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+from aws4home_runtime import clients, dedupe, state, timeconv
+
+# One timeline for every display (config Timeline): the features submit their upcoming events (ISS passes,
+# Bond shows, moon events) instead of re-scheduling a rule each, and a single rule fires at the start of the
+# next slot, see function/timeline.
+#
+# Events of all sources are merged in start order (heap merge of the per-source lists) and swept per topic
+# with a heap of the events running at that moment: the one with the highest priority (TIMELINE_PRIORITIES,
+# by source) holds the display. With TIMELINE_PREEMPT an event that starts during one of lower priority
+# interrupts it, without it the running event is shown to its end first. An interrupted or waiting event
+# gets the display back for whatever remains of it. Equal priorities: the earlier start keeps the display.
+#
+# The result is a list of non-overlapping slots per topic, kept like the Bond programme as sorted arrays:
+# the next slot and the slots in a time window are binary searches.
+
+TIMELINE_PREFIX = os.environ.get('TIMELINE_PREFIX')
+PRIORITIES = json.loads(os.environ.get('TIMELINE_PRIORITIES') or '{}')
+PREEMPT = os.environ.get('TIMELINE_PREEMPT', 'true').lower() == 'true'
+HORIZON = int(os.environ.get('TIMELINE_HORIZON_DAYS', '7')) * timeconv.DAY
+BACKEND = os.environ.get('TIMELINE_BACKEND', 'ssm')
+FILE_DIR = os.environ.get('TIMELINE_FILE_DIR', '/tmp')
+SOURCES = [source for source in os.environ.get('TIMELINE_SOURCES', '').split(',') if source]
+
+Event = namedtuple('Event', ['start', 'duration', 'source', 'topic', 'pattern'])    # start: unix seconds, duration: seconds
+Slot = namedtuple('Slot', ['start', 'end', 'event'])
+Timeline = namedtuple('Timeline', ['starts', 'ends', 'slots', 'longest'])
+
+
+def enabled():
+  return bool(TIMELINE_PREFIX)
+
+
+def merge(*sources):
+  # Each source sorted by start -> one iterator sorted by start, O(n log k) for k sources
+  return heapq.merge(*sources, key=lambda event: event.start)
+
+
+def resolve(events, priorities=None, preempt=None):
+  # events sorted by start -> slots sorted by start, non-overlapping per topic
+  priorities = PRIORITIES if priorities is None else priorities
+  preempt = PREEMPT if preempt is None else preempt
+  topics = {}
+  for event in events:
+    if event.duration > 0:
+      topics.setdefault(event.topic, []).append(event)
+  return sorted((slot for topic_events in topics.values() for slot in _sweep(topic_events, priorities, preempt)), key=lambda slot: slot.start)
+
+
+def build(events, priorities=None, preempt=None):
+  slots = resolve(events, priorities, preempt)
+  return Timeline(
+    array('q', (slot.start for slot in slots)),
+    array('q', (slot.end for slot in slots)),
+    tuple(slots),
+    max((slot.end - slot.start for slot in slots), default=0)
+  )
+
+
+def next_slot(timeline, now):
+  # Index of the first slot that starts after now, len(timeline.slots) if there is none
+  return bisect_right(timeline.starts, now)
+
+
+def window(timeline, start, end):
+  # Slots overlapping [start, end). No slot is longer than timeline.longest, so the ones that started before
+  # start and still run are within that distance.
+  first = bisect_left(timeline.starts, start - timeline.longest)
+  last = bisect_left(timeline.starts, end)
+  return [timeline.slots[index] for index in range(first, last) if timeline.ends[index] > start]
+
+
+def submit(source, events, now):
+  # Stores the upcoming events of a source (within HORIZON), returns whether they changed
+  horizon = now + HORIZON
+  encoded = [[int(event.start), int(event.duration), event.topic, event.pattern] for event in events if now < event.start + event.duration and event.start < horizon]
+  return state.StateStore(_backend(source)).put(events=encoded)
+
+
+def load(sources=None):
+  # -> events of all sources, merged
+  loaded = []
+  for source, values in _load_all(sources or SOURCES).items():
+    loaded.append(sorted((Event(start, duration, source, topic, pattern) for start, duration, topic, pattern in values.get('events', [])), key=lambda event: event.start))
+  return merge(*loaded)
+
+
+def update(source, events, now, retry_expression):
+  # What a feature does instead of re-scheduling its own rule: submit, then re-point the timeline rule
+  submit(source, events, now)
+  return reschedule(build(load()), now, retry_expression)
+
+
+def reschedule(timeline, now, retry_expression):
+  # Points the timeline rule at the first slot after the current minute
+  minute_end = now - now % 60 + 60
+  index = bisect_left(timeline.starts, minute_end)
+  expression = timeconv.cron(timeline.starts[index]) if index < len(timeline.starts) else retry_expression
+  events = clients.get("events")
+  dedupe.write_once(f"rule:{TIMELINE_PREFIX}", expression, lambda: events.put_rule(
+    Name=TIMELINE_PREFIX,
+    ScheduleExpression=expression,
+    State='ENABLED',
+    Description='Scheduled trigger for [OVERWRITTEN w/ start of the next slot on the timeline]',
+  ))
+  return expression
+
+
+def _sweep(events, priorities, preempt):
+  # events of one topic, sorted by start
+  slots = []
+  running = []    # heap of (-priority, start, sequence, event)
+  holder = None
+  held_since = None
+  position = 0
+  boundaries = sorted({event.start for event in events} | {event.start + event.duration for event in events})
+  for moment in boundaries:
+    while position < len(events) and events[position].start <= moment:
+      event = events[position]
+      heapq.heappush(running, (-priorities.get(event.source, 0), event.start, position, event))
+      position += 1
+    while running and running[0][3].start + running[0][3].duration <= moment:
+      heapq.heappop(running)
+
+    if holder is not None and holder.start + holder.duration > moment and not preempt:
+      chosen = holder
+    elif running:
+      chosen = running[0][3]
+      if holder is not None and chosen is not holder and holder.start + holder.duration > moment and -running[0][0] == priorities.get(holder.source, 0):
+        # Equal priority doesn't interrupt
+        chosen = holder
+    else:
+      chosen = None
+
+    if chosen is not holder:
+      if holder is not None and held_since < moment:
+        slots.append(Slot(held_since, moment, holder))
+      holder, held_since = chosen, moment
+  return slots
+
+
+def _backend(source):
+  if BACKEND == 'file':
+    return state.FileBackend(os.path.join(FILE_DIR, f"{TIMELINE_PREFIX}-{source}.json"))
+  return state.SsmBackend(_parameter_name(source))
+
+
+def _parameter_name(source):
+  return f"/{TIMELINE_PREFIX}/{source}"
+
+
+def _load_all(sources):
+  if BACKEND == 'file':
+    return {source: _backend(source).load() for source in sources}
+
+  ssm = clients.get("ssm")
+  loaded = {source: {} for source in sources}
+  names = {_parameter_name(source): source for source in sources}
+  name_list = list(names)
+  # GetParameters takes up to 10 names
+  for offset in range(0, len(name_list), 10):
+    for parameter in ssm.get_parameters(Names=name_list[offset:offset + 10])['Parameters']:
+      loaded[names[parameter['Name']]] = json.loads(parameter['Value'])
+  return loaded
@@ -0,0 +1,36 @@
+import os
+
+# Powertools' Tracer imports the X-Ray SDK on construction (~400 ms on a cold start), even when tracing
+# is disabled. With tracing off the handlers get a stand-in with the same decorators instead.
+
+
+class NoopTracer:
+
+  def capture_lambda_handler(self, lambda_handler=None, **kwargs):
+    if lambda_handler is None:
+      return lambda function: function
+    return lambda_handler
+
+  def capture_method(self, method=None, **kwargs):
+    if method is None:
+      return lambda function: function
+    return method
+
+  def put_annotation(self, key, value):
+    pass
+
+  def put_metadata(self, key, value, namespace=None):
+    pass
+
+
+def enabled():
+  return os.environ.get('POWERTOOLS_TRACE_DISABLED', 'false').lower() not in ('1', 'true')
+
+
+def get_tracer(**kwargs):
+  if not enabled():
+    return NoopTracer()
+
+  from aws_lambda_powertools import Tracer
+
+  return Tracer(**kwargs)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# Tailscale as a Lambda extension, installed as /opt/extensions/tailscale (see setup.sh).
+#
+# Registration with the Extensions API and bringing up the tunnel run in parallel; the first /event/next
+# (which ends the extension's init phase) waits for the tunnel, at most TS_UP_TIMEOUT seconds.
+# tailscaled keeps its state in TS_STATE, so a restart within the execution environment reuses the node
+# key instead of authenticating again (an arn:aws:ssm:... parameter ARN works as well).
+# Invocations only cost a blocking /event/next on a kept-alive connection.
+import http.client
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+EXTENSION_NAME = os.path.basename(sys.argv[0])
+RUNTIME_API = os.environ.get('AWS_LAMBDA_RUNTIME_API', '127.0.0.1:9001')
+
+BIN_DIR = os.environ.get('TS_BIN_DIR', '/opt/bin')
+SOCKET = os.environ.get('TS_SOCKET', '/tmp/tailscale.sock')
+STATE = os.environ.get('TS_STATE', '/tmp/tailscale/tailscaled.state')
+HOSTNAME = os.environ.get('TS_HOSTNAME', 'fn')
+UP_TIMEOUT = float(os.environ.get('TS_UP_TIMEOUT', '10'))
+
+
+def log(message):
+  print(f"[{EXTENSION_NAME}] {message}", flush=True)
+
+
+class ExtensionsApi:
+
+  def __init__(self, address):
+    host, port = address.split(':')
+    # No timeout, /event/next blocks until the next invoke
+    self.connection = http.client.HTTPConnection(host, int(port), timeout=None)
+    self.extension_id = None
+
+  def call(self, method, path, body=None, headers=None):
+    self.connection.request(method, f"/2020-01-01/extension{path}", body=body, headers=headers or {})
+    response = self.connection.getresponse()
+    payload = response.read()
+    if response.status >= 300:
+      raise RuntimeError(f"{method} {path}: {response.status} {payload[:200]!r}")
+    return response, payload
+
+  def register(self):
+    response, _ = self.call('POST', '/register', json.dumps({'events': ['INVOKE', 'SHUTDOWN']}), {'Lambda-Extension-Name': EXTENSION_NAME})
+    self.extension_id = response.getheader('Lambda-Extension-Identifier')
+
+  def next_event(self):
+    _, payload = self.call('GET', '/event/next', headers={'Lambda-Extension-Identifier': self.extension_id})
+    return json.loads(payload)
+
+  def init_error(self, error_type, message):
+    self.call('POST', '/init/error', json.dumps({'errorMessage': message, 'errorType': error_type}), {
+      'Lambda-Extension-Identifier': self.extension_id,
+      'Lambda-Extension-Function-Error-Type': error_type
+    })
+
+
+class Tunnel:
+
+  def __init__(self):
+    self.process = None
+    self.ready = threading.Event()
+    self.error = None
+
+  def start(self):
+    threading.Thread(target=self._up, name='tailscale-up', daemon=True).start()
+
+  def _up(self):
+    try:
+      if os.path.dirname(STATE) and not STATE.startswith('arn:'):
+        os.makedirs(os.path.dirname(STATE), exist_ok=True)
+      self.process = subprocess.Popen([
+        f"{BIN_DIR}/tailscaled",
+        '--tun=userspace-networking',
+        '--socks5-server=localhost:1055',
+        f"--socket={SOCKET}",
+        f"--state={STATE}"
+      ])
+      self._wait_for_socket()
+      # Blocks until the node is connected; with a persisted node key the auth key isn't used again
+      subprocess.run([
+        f"{BIN_DIR}/tailscale", f"--socket={SOCKET}", 'up',
+        f"--authkey={os.environ.get('TS_KEY', '')}",
+        f"--hostname={HOSTNAME}",
+        f"--timeout={int(UP_TIMEOUT)}s"
+      ], check=True)
+    except Exception as error:
+      self.error = error
+    finally:
+      self.ready.set()
+
+  def _wait_for_socket(self):
+    # tailscaled creates the socket within milliseconds, connect attempts back off from 1 ms
+    delay = 0.001
+    deadline = time.monotonic() + UP_TIMEOUT
+    while True:
+      if self.process.poll() is not None:
+        raise RuntimeError(f"tailscaled exited with {self.process.returncode}")
+      try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+          probe.connect(SOCKET)
+        return
+      except OSError:
+        if time.monotonic() > deadline:
+          raise RuntimeError(f"no tailscaled socket at {SOCKET} after {UP_TIMEOUT}s")
+        time.sleep(delay)
+        delay = min(delay * 2, 0.05)
+
+  def alive(self):
+    return self.process is not None and self.process.poll() is None
+
+  def stop(self):
+    if self.alive():
+      self.process.terminate()
+      try:
+        self.process.wait(timeout=1)
+      except subprocess.TimeoutExpired:
+        self.process.kill()
+
+
+def main():
+  tunnel = Tunnel()
+  tunnel.start()
+
+  api = ExtensionsApi(RUNTIME_API)
+  api.register()
+  log(f"registered as {api.extension_id}")
+
+  signal.signal(signal.SIGTERM, lambda signum, frame: (tunnel.stop(), sys.exit(0)))
+
+  if not tunnel.ready.wait(UP_TIMEOUT):
+    log(f"tunnel not up after {UP_TIMEOUT}s, continuing")
+  elif tunnel.error is not None:
+    if not tunnel.alive():
+      api.init_error('Extension.TailscaleFailed', str(tunnel.error))
+      sys.exit(1)
+    log(f"tailscale up failed: {tunnel.error}")
+  else:
+    log("tunnel up")
+
+  while True:
+    event = api.next_event()
+    if event.get('eventType') == 'SHUTDOWN':
+      log(f"shutdown: {event.get('shutdownReason')}")
+      tunnel.stop()
+      return
+    if not tunnel.alive():
+      # Restarts from the persisted state, no new login
+      log("tailscaled is gone, restarting")
+      tunnel = Tunnel()
+      tunnel.start()
+
+
+if __name__ == '__main__':
+  main()
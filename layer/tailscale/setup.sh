@@ -6,8 +6,9 @@ yum -y install tailscale
 
 mkdir /tmp/{bin,extensions}
 
-cp /usr/bin/curl /tmp/bin/
 cp /usr/bin/tailscale /tmp/bin/
 cp /usr/sbin/tailscaled /tmp/bin/
 
-cp ./extension1.sh /tmp/extensions/
\ No newline at end of file
+# Extension name is the file name
+cp ./extension.py /tmp/extensions/tailscale
+chmod +x /tmp/extensions/tailscale
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# Measures the init phase of every Lambda function: time to import its handler module and peak RSS,
+# each sample in a fresh interpreter with the function's layer set on the path.
+#
+#   python scripts/bench_cold_start.py                 # layers resolved from the current environment
+#   python scripts/bench_cold_start.py --install       # pip install each layer into .bench/ and isolate from site-packages
+#   python scripts/bench_cold_start.py --importtime    # also list the slowest imports per function
+#   python scripts/bench_cold_start.py --json bench.json
+#   POWERTOOLS_TRACE_DISABLED=false python scripts/bench_cold_start.py   # with X-Ray tracing enabled
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(ROOT, '.bench')
+
+# Mirrors the layers of each function in Aws4HomeStack. 'sdk' stands for what the Lambda runtime ships (boto3).
+FUNCTIONS = {
+  'iss': {
+    'path': 'function/iss',
+    'layers': ['sdk', 'powertools', 'numpy', 'requests', 'runtime'],
+    'env': {
+      'ISS_PREFIX': 'iss',
+      'ISS_URL': 'http://localhost/iss-pass.json?',
+      'LATITUDE': '0.0',
+      'LONGITUDE': '0.0',
+      'TZ': 'Europe/Berlin',
+      'MQTT_TOPIC': 'topic/name'
+    }
+  },
+  'bond': {
+    'path': 'function/bond',
+    'layers': ['sdk', 'powertools', 'bs4', 'requests', 'runtime'],
+    'env': {
+      'BOND_PREFIX': 'bond',
+      'BOND_URL': 'http://localhost/007_im_tv.htm',
+      'TZ': 'Europe/Berlin',
+      'MQTT_TOPIC': 'topic/name'
+    }
+  },
+  'lunar-lander': {
+    'path': 'function/lunar-lander',
+    'layers': ['sdk', 'powertools', 'runtime'],
+    'env': {
+      'MQTT_TOPIC': 'topic/name'
+    }
+  },
+  'garagedoor-shadow': {
+    'path': 'function/garagedoor-shadow',
+    'layers': ['sdk', 'powertools', 'runtime'],
+    'env': {
+      'MQTT_TOPIC': 'topic/name'
+    }
+  }
+}
+
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import index
+elapsed = time.perf_counter() - start
+print(json.dumps({
+  'import_ms': elapsed * 1000,
+  'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+  'modules': len(sys.modules)
+}))
+"""
+
+
+def layer_requirements(layer):
+  if layer == 'sdk':
+    return ['boto3']
+  if layer == 'powertools':
+    with open(os.path.join(ROOT, 'requirements.txt')) as requirements:
+      return [line.strip() for line in requirements if line.startswith('aws_lambda_powertools')]
+  return ['-r', os.path.join(ROOT, 'layer', layer, 'requirements.txt')]
+
+
+def layer_path(layer, install):
+  if layer == 'runtime':
+    return os.path.join(ROOT, 'layer', 'runtime', 'python')
+  if not install:
+    return None
+
+  target = os.path.join(BENCH_DIR, 'layers', layer, 'python')
+  if not os.path.isdir(target):
+    subprocess.run([sys.executable, '-m', 'pip', 'install', '--quiet', '--target', target] + layer_requirements(layer), check=True)
+  return target
+
+
+def sample(name, spec, install, importtime):
+  function_dir = os.path.join(ROOT, spec['path'])
+  paths = [function_dir] + [path for path in (layer_path(layer, install) for layer in spec['layers']) if path]
+
+  env = dict(os.environ, **spec['env'])
+  env.update({
+    'PYTHONPATH': os.pathsep.join(paths),
+    'PYTHONDONTWRITEBYTECODE': '1',
+    'AWS_DEFAULT_REGION': env.get('AWS_DEFAULT_REGION', 'eu-central-1'),
+    'POWERTOOLS_TRACE_DISABLED': env.get('POWERTOOLS_TRACE_DISABLED', 'true'),
+    'POWERTOOLS_SERVICE_NAME': name
+  })
+
+  command = [sys.executable]
+  if install:
+    # Only stdlib and the layers, like /opt/python in Lambda
+    command.append('-S')
+  if importtime:
+    command += ['-X', 'importtime']
+  command += ['-c', PROBE]
+
+  result = subprocess.run(command, cwd=function_dir, env=env, capture_output=True, text=True)
+  if result.returncode != 0:
+    raise RuntimeError(f"{name}: {result.stderr.strip().splitlines()[-1]}")
+  return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def slowest_imports(stderr, count=10):
+  # "import time: self [us] | cumulative | imported package", nested imports are indented
+  rows = []
+  for line in stderr.splitlines():
+    if not line.startswith('import time:') or 'cumulative' in line:
+      continue
+    _, cumulative, module = line[len('import time:'):].split('|')
+    # Depth 1: modules imported directly by the handler module
+    if len(module[1:]) - len(module[1:].lstrip(' ')) == 2:
+      rows.append((int(cumulative), module.strip()))
+  return sorted(rows, reverse=True)[:count]
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Init-phase import time and RSS per Lambda function')
+  parser.add_argument('functions', nargs='*', default=list(FUNCTIONS))
+  parser.add_argument('--runs', type=int, default=5)
+  parser.add_argument('--install', action='store_true', help='install layer requirements into .bench/ and ignore site-packages')
+  parser.add_argument('--importtime', action='store_true', help='show the slowest imports of each handler module')
+  parser.add_argument('--json', help='write results to this file')
+  args = parser.parse_args()
+
+  results = {}
+  print(f"{'function':<20} {'import ms (p50)':>16} {'min':>8} {'max':>8} {'RSS MB':>8} {'modules':>8}")
+  for name in args.functions:
+    samples = []
+    importtime_stderr = ''
+    for run in range(args.runs):
+      probe, stderr = sample(name, FUNCTIONS[name], args.install, args.importtime and run == 0)
+      samples.append(probe)
+      if run == 0:
+        importtime_stderr = stderr
+
+    import_ms = [probe['import_ms'] for probe in samples]
+    results[name] = {
+      'import_ms_p50': round(statistics.median(import_ms), 2),
+      'import_ms_min': round(min(import_ms), 2),
+      'import_ms_max': round(max(import_ms), 2),
+      'max_rss_mb': round(max(probe['max_rss_kb'] for probe in samples) / 1024, 1),
+      'modules': samples[-1]['modules'],
+      'layers': FUNCTIONS[name]['layers']
+    }
+    result = results[name]
+    print(f"{name:<20} {result['import_ms_p50']:>16} {result['import_ms_min']:>8} {result['import_ms_max']:>8} "
+          f"{result['max_rss_mb']:>8} {result['modules']:>8}")
+
+    if args.importtime:
+      for cumulative, module in slowest_imports(importtime_stderr):
+        print(f"{'':<20} {cumulative / 1000:>10.1f} ms  {module}")
+
+  if args.json:
+    with open(args.json, 'w') as output:
+      json.dump(results, output, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# Init and per-invoke overhead of the Tailscale extension (layer/tailscale/extension.py) against a local
+# stand-in of the Lambda Extensions API. tailscaled/tailscale are replaced by stand-ins that open the
+# socket and take --up-delay seconds to "connect".
+#
+#   python scripts/bench_extension.py
+#   python scripts/bench_extension.py --invokes 200 --up-delay 0.5
+import argparse
+import json
+import os
+import queue
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXTENSION = os.path.join(ROOT, 'layer', 'tailscale', 'extension.py')
+
+TAILSCALED = """#!{python}
+import signal, socket, sys, time
+path = next(arg.split('=', 1)[1] for arg in sys.argv if arg.startswith('--socket='))
+server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+server.bind(path)
+server.listen()
+signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
+while True:
+  server.accept()[0].close()
+"""
+
+TAILSCALE = """#!{python}
+import time
+time.sleep({up_delay})
+"""
+
+
+class ExtensionsApi(BaseHTTPRequestHandler):
+  events = queue.Queue()
+  next_calls = queue.Queue()
+  registered_at = None
+
+  def do_POST(self):
+    self.rfile.read(int(self.headers.get('Content-Length') or 0))
+    if self.path.endswith('/register'):
+      ExtensionsApi.registered_at = time.monotonic()
+    self.reply({}, {'Lambda-Extension-Identifier': 'bench'})
+
+  def do_GET(self):
+    ExtensionsApi.next_calls.put(time.monotonic())
+    self.reply(ExtensionsApi.events.get())
+
+  def reply(self, body, headers=None):
+    payload = json.dumps(body).encode()
+    self.send_response(200)
+    for name, value in (headers or {}).items():
+      self.send_header(name, value)
+    self.send_header('Content-Length', str(len(payload)))
+    self.end_headers()
+    self.wfile.write(payload)
+
+  def log_message(self, *args):
+    pass
+
+
+def write_executable(path, content):
+  with open(path, 'w') as executable:
+    executable.write(content)
+  os.chmod(path, 0o755)
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Tailscale extension init and per-invoke overhead')
+  parser.add_argument('--invokes', type=int, default=100)
+  parser.add_argument('--up-delay', type=float, default=0.3, help='seconds the tailscale stand-in takes to connect')
+  args = parser.parse_args()
+
+  server = ThreadingHTTPServer(('127.0.0.1', 0), ExtensionsApi)
+  server.daemon_threads = True
+  threading.Thread(target=server.serve_forever, daemon=True).start()
+
+  with tempfile.TemporaryDirectory() as workdir:
+    write_executable(os.path.join(workdir, 'tailscaled'), TAILSCALED.format(python=sys.executable))
+    write_executable(os.path.join(workdir, 'tailscale'), TAILSCALE.format(python=sys.executable, up_delay=args.up_delay))
+    env = dict(
+      os.environ,
+      AWS_LAMBDA_RUNTIME_API=f"127.0.0.1:{server.server_address[1]}",
+      TS_BIN_DIR=workdir,
+      TS_SOCKET=os.path.join(workdir, 'tailscale.sock'),
+      TS_STATE=os.path.join(workdir, 'state', 'tailscaled.state'),
+      TS_KEY='bench'
+    )
+
+    started = time.monotonic()
+    extension = subprocess.Popen([sys.executable, EXTENSION], env=env, stdout=subprocess.DEVNULL)
+    init = ExtensionsApi.next_calls.get(timeout=30) - started
+    register = ExtensionsApi.registered_at - started
+
+    overheads = []
+    for _ in range(args.invokes):
+      delivered = time.monotonic()
+      ExtensionsApi.events.put({'eventType': 'INVOKE', 'requestId': 'bench'})
+      overheads.append((ExtensionsApi.next_calls.get(timeout=10) - delivered) * 1000)
+
+    delivered = time.monotonic()
+    ExtensionsApi.events.put({'eventType': 'SHUTDOWN', 'shutdownReason': 'spindown'})
+    extension.wait(timeout=10)
+    shutdown = time.monotonic() - delivered
+
+  server.shutdown()
+  overheads.sort()
+  print(f"init (start -> first /event/next)  {init * 1000:8.1f} ms  (register after {register * 1000:.1f} ms, tunnel stand-in {args.up_delay * 1000:.0f} ms)")
+  print(f"per invoke p50                      {statistics.median(overheads):8.2f} ms")
+  print(f"per invoke p95                      {overheads[int(len(overheads) * 0.95) - 1]:8.2f} ms")
+  print(f"shutdown                            {shutdown * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+  main()
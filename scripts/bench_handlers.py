@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# Replays every Lambda handler end to end without network or AWS (see tests/harness.py): upstream pages
+# come from the recorded fixtures in tests/unit/fixtures, iot-data, events and route53 are in-memory stand-ins.
+# Reports wall time, peak allocations and AWS calls per invocation.
+#
+#   python scripts/bench_handlers.py                      # all handlers
+#   python scripts/bench_handlers.py bond --invocations 50
+#   python scripts/bench_handlers.py --check              # exit 1 if a threshold of tests/harness.py is exceeded
+#   python scripts/bench_handlers.py --record             # re-record the fixtures from upstream first
+#   python scripts/bench_handlers.py --json bench.json
+import argparse
+import json
+import os
+import statistics
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'layer', 'runtime', 'python')]
+
+from tests import harness    # noqa: E402
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Offline replay of the Lambda handlers')
+  parser.add_argument('functions', nargs='*', default=list(harness.FUNCTIONS))
+  parser.add_argument('--invocations', type=int, default=20)
+  parser.add_argument('--check', action='store_true', help='fail if a regression threshold is exceeded')
+  parser.add_argument('--record', action='store_true', help='record the fixtures from upstream before replaying')
+  parser.add_argument('--json', help='write results to this file')
+  args = parser.parse_args()
+
+  if args.record:
+    harness.record()
+
+  results = {}
+  violations = []
+  print(f"{'function':<20} {'init ms':>8} {'cold ms':>8} {'warm p50':>9} {'warm p95':>9} {'cold KiB':>9} {'warm KiB':>9}")
+  for name in args.functions:
+    result = harness.replay(name, invocations=args.invocations)
+    warm = sorted(result.warm_ms) or [0.0]
+    results[name] = {
+      'init_ms': round(result.init_ms, 2),
+      'cold_ms': round(result.cold_ms, 2),
+      'warm_ms_p50': round(statistics.median(warm), 2),
+      'warm_ms_p95': round(warm[max(0, int(len(warm) * 0.95) - 1)], 2),
+      'cold_peak_kib': round(result.cold_peak_kib),
+      'warm_peak_kib': round(result.warm_peak_kib),
+      'cold_calls': dict(result.cold_calls),
+      'warm_calls': dict(result.warm_calls),
+      'upstream': result.upstream
+    }
+    row = results[name]
+    print(f"{name:<20} {row['init_ms']:>8} {row['cold_ms']:>8} {row['warm_ms_p50']:>9} {row['warm_ms_p95']:>9} "
+          f"{row['cold_peak_kib']:>9} {row['warm_peak_kib']:>9}")
+    for phase in ('cold', 'warm'):
+      calls = ', '.join(f"{api} {count}" for api, count in sorted(row[f"{phase}_calls"].items())) or '-'
+      print(f"{'':<20} {phase} AWS calls: {calls}")
+    violations += harness.check(result)
+
+  if args.json:
+    with open(args.json, 'w') as output:
+      json.dump(results, output, indent=2, sort_keys=True)
+
+  for violation in violations:
+    print(f"REGRESSION {violation}")
+  if args.check and violations:
+    sys.exit(1)
+
+
+if __name__ == '__main__':
+  main()
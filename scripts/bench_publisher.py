@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# Pattern messages against a local stand-in of the iot-data publish endpoint (POST /topics/<topic>), no AWS:
+#   per-message   a new iot-data client for every message
+#   pooled        one client, one publish per message
+#   publisher     aws4home_runtime.publisher: queued, merged per topic and pattern, flushed concurrently
+# Reports messages per second and the latency from publishing a message until the broker received it.
+#
+#   python scripts/bench_publisher.py
+#   python scripts/bench_publisher.py --messages 500 --topics 50 --delay-ms 20
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'layer', 'runtime', 'python'))
+
+from aws4home_runtime import clients, publisher    # noqa: E402
+
+PATTERNS = ('iss.gif', 'bond', 'lunar-lander')
+
+
+class Broker(ThreadingHTTPServer):
+  daemon_threads = True
+
+  def __init__(self, delay):
+    super().__init__(('127.0.0.1', 0), BrokerHandler)
+    self.delay = delay
+    self.lock = threading.Lock()
+    self.received = []
+
+  @property
+  def url(self):
+    return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class BrokerHandler(BaseHTTPRequestHandler):
+  protocol_version = 'HTTP/1.1'
+  # Headers and body in one segment, or keep-alive clients wait for the delayed ACK
+  wbufsize = 65536
+
+  def do_POST(self):
+    body = self.rfile.read(int(self.headers.get('content-length') or 0))
+    if self.server.delay:
+      time.sleep(self.server.delay)
+    topic = unquote(urlsplit(self.path).path[len('/topics/'):])
+    with self.server.lock:
+      self.server.received.append(((topic, json.loads(body)['pattern']), time.perf_counter()))
+    self.send_response(200)
+    self.send_header('Content-Type', 'application/json')
+    self.send_header('Content-Length', '2')
+    self.end_headers()
+    self.wfile.write(b'{}')
+
+  def log_message(self, *args):
+    pass
+
+
+def new_client(url):
+  import boto3.session
+  from botocore.config import Config
+
+  return boto3.session.Session().client('iot-data', endpoint_url=url, config=Config(max_pool_connections=10, tcp_keepalive=True))
+
+
+def send(client, topic, pattern, duration):
+  client.publish(topic=topic, qos=0, retain=False, payload=json.dumps({'pattern': pattern, 'duration': duration}))
+
+
+def run(mode, broker, messages):
+  broker.received.clear()
+  sent = []
+  started = time.perf_counter()
+  if mode == 'per-message':
+    for topic, pattern, duration in messages:
+      sent.append(((topic, pattern), time.perf_counter()))
+      send(new_client(broker.url), topic, pattern, duration)
+  elif mode == 'pooled':
+    client = new_client(broker.url)
+    for topic, pattern, duration in messages:
+      sent.append(((topic, pattern), time.perf_counter()))
+      send(client, topic, pattern, duration)
+  else:
+    clients.override('iot-data', new_client(broker.url))
+    publisher.reset()
+    for topic, pattern, duration in messages:
+      sent.append(((topic, pattern), time.perf_counter()))
+      publisher.publish(topic, pattern, duration)
+    publisher.flush()
+  elapsed = time.perf_counter() - started
+
+  # Latency of a message: until the first delivery of its topic and pattern after it was published
+  latencies = []
+  for key, at in sent:
+    received = min(when for delivered, when in broker.received if delivered == key and when >= at)
+    latencies.append((received - at) * 1000)
+  latencies.sort()
+  return {
+    'delivered': len(broker.received),
+    'messages_per_s': round(len(messages) / elapsed),
+    'latency_ms_p50': round(statistics.median(latencies), 2),
+    'latency_ms_p95': round(latencies[max(0, int(len(latencies) * 0.95) - 1)], 2)
+  }
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Publish throughput and latency against a local broker stand-in')
+  parser.add_argument('--messages', type=int, default=200)
+  parser.add_argument('--topics', type=int, default=20)
+  parser.add_argument('--delay-ms', type=float, default=5, help='broker time per message')
+  parser.add_argument('--window', type=float, default=publisher.WINDOW, help='publisher window, seconds')
+  args = parser.parse_args()
+
+  for name, value in (('AWS_ACCESS_KEY_ID', 'bench'), ('AWS_SECRET_ACCESS_KEY', 'bench'), ('AWS_DEFAULT_REGION', 'eu-central-1')):
+    os.environ.setdefault(name, value)
+  publisher.WINDOW = args.window
+  messages = [(f"display/{index % args.topics}", PATTERNS[index % len(PATTERNS)], 60 + index) for index in range(args.messages)]
+
+  broker = Broker(args.delay_ms / 1000)
+  threading.Thread(target=broker.serve_forever, daemon=True).start()
+  try:
+    print(f"{'mode':<12} {'delivered':>9} {'msg/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for mode in ('per-message', 'pooled', 'publisher'):
+      row = run(mode, broker, messages)
+      print(f"{mode:<12} {row['delivered']:>9} {row['messages_per_s']:>8} {row['latency_ms_p50']:>8} {row['latency_ms_p95']:>8}")
+  finally:
+    broker.shutdown()
+    clients.reset()
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# Size and import time of each function's dependency layer (see aws4home/bundling.py), for review of
+# changes to layer/*/requirements.txt.
+#
+#   python scripts/layer_report.py                  # markdown table
+#   python scripts/layer_report.py --json layers.json
+#
+# Size is measured on the Lambda build (arm64, from .bundle-cache, built if missing). Import time is
+# measured on an equivalent build for this host in .bench/, once with the precompiled .pyc files and once
+# compiling from source, which is what every cold start pays for a layer without them (/opt is read-only).
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(ROOT, '.bench', 'deps')
+
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import aws_cdk.aws_lambda as lambda_    # noqa: E402
+
+from aws4home import bundling    # noqa: E402
+
+RUNTIME = lambda_.Runtime.PYTHON_3_12
+ARCHITECTURE = lambda_.Architecture.ARM_64
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+for module in sys.argv[1:]:
+  __import__(module)
+print(json.dumps({'import_ms': (time.perf_counter() - start) * 1000}))
+"""
+
+
+def lambda_layer(name):
+  requirements = bundling.requirements_paths(name)
+  target = os.path.join(bundling.CACHE_DIR, bundling.cache_key(requirements, RUNTIME, ARCHITECTURE))
+  report_path = os.path.join(target, 'report.json')
+  if not os.path.exists(report_path):
+    return bundling.build_layer(requirements, target, RUNTIME, ARCHITECTURE)
+  with open(report_path) as report_file:
+    return json.load(report_file)
+
+
+def host_layer(name):
+  requirements = bundling.requirements_paths(name)
+  key = bundling.cache_key(requirements, RUNTIME, ARCHITECTURE)
+  target = os.path.join(BENCH_DIR, f"{name}-{key[:12]}")
+  if not os.path.exists(os.path.join(target, 'report.json')):
+    bundling.build_layer(requirements, target)
+  return os.path.join(target, 'python')
+
+
+def import_ms(python_dir, modules, runs, precompiled):
+  env = dict(os.environ, PYTHONPATH=python_dir, PYTHONDONTWRITEBYTECODE='1')
+  samples = []
+  for _ in range(runs):
+    with tempfile.TemporaryDirectory() as empty:
+      command = [sys.executable, '-S']
+      if not precompiled:
+        # .pyc files are looked up in an empty directory, every module is compiled from source
+        command += ['-X', f"pycache_prefix={empty}"]
+      result = subprocess.run(command + ['-c', PROBE] + modules, env=env, capture_output=True, text=True, check=True)
+    samples.append(json.loads(result.stdout)['import_ms'])
+  return round(statistics.median(samples), 1)
+
+
+def megabytes(size):
+  return round(size / 1024 / 1024, 1)
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Dependency layer size and import time per Lambda function')
+  parser.add_argument('functions', nargs='*', default=list(bundling.DEPENDENCY_LAYERS))
+  parser.add_argument('--runs', type=int, default=5)
+  parser.add_argument('--json', help='write results to this file')
+  args = parser.parse_args()
+
+  results = {}
+  for name in args.functions:
+    report = lambda_layer(name)
+    python_dir = host_layer(name)
+    modules = bundling.DEPENDENCY_LAYERS[name]
+    results[name] = {
+      'packages': modules,
+      'unpacked_mb': megabytes(report['bytes']),
+      'files': report['files'],
+      'stripped_mb': megabytes(report['stripped_bytes']),
+      'precompiled': report['precompiled'],
+      'import_ms_pyc': import_ms(python_dir, modules, args.runs, True),
+      'import_ms_source': import_ms(python_dir, modules, args.runs, False),
+      'largest': [[package, megabytes(size)] for package, size in report['largest']]
+    }
+
+  print('| function | packages | unpacked MB | files | stripped MB | precompiled | import ms (.pyc) | import ms (source) | largest (MB) |')
+  print('|---|---|---:|---:|---:|---|---:|---:|---|')
+  for name, result in results.items():
+    largest = ', '.join(f"{package} {size}" for package, size in result['largest'][:3])
+    print(f"| {name} | {', '.join(result['packages'])} | {result['unpacked_mb']} | {result['files']} | {result['stripped_mb']} | "
+          f"{'yes' if result['precompiled'] else 'no'} | {result['import_ms_pyc']} | {result['import_ms_source']} | {largest} |")
+
+  if args.json:
+    with open(args.json, 'w') as output:
+      json.dump(results, output, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Lambda functions get the shared runtime from a layer (/opt/python), tests import it from the repo
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'layer', 'runtime', 'python'))
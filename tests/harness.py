@@ -0,0 +1,491 @@
+import collections
+import contextlib
+import hashlib
+import importlib
+import io
+import json
+import os
+import re
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import types
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from botocore.exceptions import ClientError
+
+# Offline record/replay of the Lambda handlers: upstream pages are served from recorded fixtures by a local
+# HTTP server, iot-data, events and route53 are in-memory stand-ins. replay() runs a handler end to end and
+# reports wall time, allocations and AWS calls per invocation, check() compares them with THRESHOLDS.
+# Driven by tests/unit/test_handlers.py and scripts/bench_handlers.py (which also records the fixtures).
+#
+# Fixtures are replayed relative to the day they were recorded on (see recorded.json): dates in them are
+# shifted by whole days to the replay day, so a TLE or a TV listing keeps having upcoming passes and shows.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, 'tests', 'unit', 'fixtures')
+RECORDED = os.path.join(FIXTURES, 'recorded.json')
+
+# Fixture -> upstream it is recorded from
+RECORDINGS = {
+    'iss.tle': 'https://celestrak.org/NORAD/elements/gp.php?CATNR=25544&FORMAT=TLE',
+    'iss.json': 'https://www.astroviewer.net/iss/ws/predictor.php?name=home&lon=13.40&lat=52.52&tz=Europe/Berlin',
+    'bond.html': 'http://www.jamesbondfilme.de/007_im_tv.htm'
+}
+
+SCHEDULED_EVENT = {
+    'version': '0',
+    'source': 'aws.events',
+    'detail-type': 'Scheduled Event',
+    'detail': {}
+}
+
+GARAGEDOOR_BATCH = {
+    'Records': [
+        {'body': json.dumps({'door': 'opening'}), 'attributes': {'SentTimestamp': '1700000000000'}},
+        {'body': json.dumps({'door': 'open', 'light': 'on'}), 'attributes': {'SentTimestamp': '1700000001000'}},
+        {'body': json.dumps({'door': 'open'}), 'attributes': {'SentTimestamp': '1700000002000'}}
+    ]
+}
+
+# {base_url} is the fixture server
+FUNCTIONS = {
+    'iss': {
+        'path': 'function/iss',
+        'event': SCHEDULED_EVENT,
+        'env': {
+            'ISS_PREFIX': 'iss',
+            'ISS_URL': '{base_url}/iss.json?name=home',
+            'ISS_TLE_URL': '{base_url}/iss.tle',
+            'LATITUDE': '52.52',
+            'LONGITUDE': '13.40',
+            'TZ': 'Europe/Berlin',
+            'MQTT_TOPIC': 'topic/name',
+            'STATE_BACKEND': 'route53',
+            'HOSTED_ZONE_ID': 'Z0REPLAY'
+        }
+    },
+    'bond': {
+        'path': 'function/bond',
+        'event': SCHEDULED_EVENT,
+        'env': {
+            'BOND_PREFIX': 'bond',
+            'BOND_URL': '{base_url}/bond.html',
+            'TZ': 'Europe/Berlin',
+            'MQTT_TOPIC': 'topic/name'
+        }
+    },
+    'lunar-lander': {
+        'path': 'function/lunar-lander',
+        'event': SCHEDULED_EVENT,
+        'env': {
+            'LUNAR_PREFIX': 'lunar-lander',
+            'LUNAR_LATITUDE': '52.52',
+            'LUNAR_LONGITUDE': '13.405',
+            'MQTT_TOPIC': 'topic/name'
+        }
+    },
+    'router': {
+        # Consolidated deployment, replayed with the Bond rule's event
+        'path': 'function/router',
+        'event': dict(SCHEDULED_EVENT, resources=['arn:aws:events:eu-central-1:000000000000:rule/bond']),
+        'env': {
+            'AWS4HOME_ROUTES': json.dumps({'iss': 'iss', 'bond': 'bond', 'lunar': 'lunar-lander', 'garagedoor': 'garagedoor-shadow'}),
+            'AWS4HOME_DEFAULT_ROUTE': 'garagedoor',
+            'BOND_PREFIX': 'bond',
+            'BOND_URL': '{base_url}/bond.html',
+            'TZ': 'Europe/Berlin',
+            'MQTT_TOPIC': 'topic/name'
+        }
+    },
+    'garagedoor-shadow': {
+        'path': 'function/garagedoor-shadow',
+        'event': GARAGEDOOR_BATCH,
+        'env': {
+            'THING_NAME': 'garagedoor',
+            'SHADOW_NAME': 'garagedoor_1'
+        }
+    }
+}
+
+# Per function: p50 wall time of warm invocations (ms), peak allocation of the cold invocation (KiB) and the
+# AWS calls of the cold and of every warm invocation. Timings are generous, calls are exact upper bounds.
+THRESHOLDS = {
+    'iss': {
+        'warm_ms': 250,
+        'cold_peak_kib': 24576,
+        'cold_calls': {'iot-data.publish': 1, 'events.put_rule': 1, 'route53.get_hosted_zone': 1,
+                       'route53.list_resource_record_sets': 3, 'route53.change_resource_record_sets': 1},
+        'warm_calls': {'iot-data.publish': 1}
+    },
+    'bond': {
+        'warm_ms': 50,
+        'cold_peak_kib': 1024,
+        # Publishes only when fired at a show
+        'cold_calls': {'iot-data.publish': 1, 'events.put_rule': 1},
+        'warm_calls': {'iot-data.publish': 1}
+    },
+    'lunar-lander': {
+        'warm_ms': 20,
+        'cold_peak_kib': 256,
+        # Publishes only when fired at a moon event
+        'cold_calls': {'iot-data.publish': 1, 'events.put_rule': 1},
+        'warm_calls': {'iot-data.publish': 1}
+    },
+    'router': {
+        'warm_ms': 50,
+        # The cold invocation imports the feature, what that allocates varies by about 1 MiB with the hash seed
+        'cold_peak_kib': 2048,
+        'cold_calls': {'iot-data.publish': 1, 'events.put_rule': 1},
+        'warm_calls': {'iot-data.publish': 1}
+    },
+    'garagedoor-shadow': {
+        'warm_ms': 20,
+        'cold_peak_kib': 256,
+        'cold_calls': {'iot-data.update_thing_shadow': 1},
+        # Not exclusive: a repeated state is still confirmed with a versioned write
+        'warm_calls': {'iot-data.update_thing_shadow': 1}
+    }
+}
+
+Result = collections.namedtuple('Result', ['function', 'init_ms', 'cold_ms', 'warm_ms', 'cold_peak_kib', 'warm_peak_kib',
+                                           'cold_calls', 'warm_calls', 'upstream'])
+
+
+# Fixtures
+
+def record(names=None, timeout=30):
+    import requests
+
+    recorded = recorded_dates()
+    for name in names or RECORDINGS:
+        response = requests.get(RECORDINGS[name], timeout=timeout)
+        response.raise_for_status()
+        with open(os.path.join(FIXTURES, name), 'wb') as fixture:
+            fixture.write(response.content)
+        recorded[name] = date.today().isoformat()
+    with open(RECORDED, 'w') as recorded_file:
+        json.dump(recorded, recorded_file, indent=2, sort_keys=True)
+        recorded_file.write('\n')
+
+
+def recorded_dates():
+    with open(RECORDED) as recorded_file:
+        return json.load(recorded_file)
+
+
+def fixture(name, today=None):
+    with open(os.path.join(FIXTURES, name), 'rb') as fixture_file:
+        content = fixture_file.read()
+    days = ((today or date.today()) - date.fromisoformat(recorded_dates()[name])).days
+    return shift(name, content, days)
+
+
+def shift(name, content, days):
+    if not days:
+        return content
+    if name.endswith('.tle'):
+        return shift_tle(content, days)
+    if name.endswith('.json'):
+        # astroviewer: "begin"/"end" as local YYYYmmddHHMMSS
+        return re.sub(rb'"(\d{14})"', lambda match: b'"' + _shift(match.group(1), '%Y%m%d%H%M%S', days) + b'"', content)
+    if name.endswith('.html'):
+        return re.sub(rb'\d{2}\.\d{2}\.\d{4}', lambda match: _shift(match.group(0), '%d.%m.%Y', days), content)
+    return content
+
+
+def shift_tle(content, days):
+    lines = content.decode('ascii').splitlines()
+    for index, line in enumerate(lines):
+        if line.startswith('1 '):
+            epoch = datetime.strptime(line[18:20], '%y') + timedelta(days=float(line[20:32]) - 1 + days)
+            day_of_year = (epoch - datetime(epoch.year, 1, 1)).total_seconds() / 86400 + 1
+            line = f"{line[:18]}{epoch:%y}{day_of_year:012.8f}{line[32:68]}"
+            lines[index] = line + str(sum(int(char) if char.isdigit() else char == '-' for char in line) % 10)
+    return ('\n'.join(lines) + '\n').encode('ascii')
+
+
+def _shift(value, format, days):
+    return (datetime.strptime(value.decode('ascii'), format) + timedelta(days=days)).strftime(format).encode('ascii')
+
+
+class FixtureServer(BaseHTTPRequestHandler):
+    # GET /<fixture>, query strings are ignored. Sends an ETag and answers If-None-Match with 304.
+    requests = collections.Counter()
+
+    def do_GET(self):
+        name = self.path.split('?')[0].lstrip('/')
+        FixtureServer.requests[name] += 1
+        try:
+            content = fixture(name)
+        except (FileNotFoundError, KeyError):
+            self.send_error(404)
+            return
+        etag = '"' + hashlib.sha1(content).hexdigest() + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+@contextlib.contextmanager
+def fixture_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureServer)
+    server.daemon_threads = True
+    server.block_on_close = False
+    FixtureServer.requests.clear()
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+# AWS stand-ins
+
+class StandIn:
+    # Counts every call, operations a subclass doesn't implement answer {}
+
+    def __init__(self, service):
+        self.service = service
+        self.calls = collections.Counter()
+
+    def __getattr__(self, operation):
+        if operation.startswith('_'):
+            raise AttributeError(operation)
+
+        def call(**kwargs):
+            self.calls[operation] += 1
+            implementation = getattr(type(self), f"op_{operation}", None)
+            return implementation(self, **kwargs) if implementation else {}
+
+        return call
+
+
+class IotData(StandIn):
+
+    def __init__(self):
+        super().__init__('iot-data')
+        self.published = []
+        self.shadows = {}
+        self.exceptions = types.SimpleNamespace(
+            ConflictException=type('ConflictException', (ClientError,), {}),
+            ResourceNotFoundException=type('ResourceNotFoundException', (ClientError,), {})
+        )
+
+    def op_publish(self, topic, payload, **kwargs):
+        self.published.append((topic, json.loads(payload)))
+        return {}
+
+    def op_get_thing_shadow(self, thingName, shadowName=None):
+        document = self.shadows.get((thingName, shadowName))
+        if document is None:
+            raise self.exceptions.ResourceNotFoundException({'Error': {'Code': 'ResourceNotFoundException'}}, 'GetThingShadow')
+        return {'payload': io.BytesIO(json.dumps(document).encode('utf-8'))}
+
+    def op_update_thing_shadow(self, thingName, payload, shadowName=None):
+        update = json.loads(payload)
+        document = self.shadows.setdefault((thingName, shadowName), {'state': {'reported': {}}, 'version': 0})
+        if 'version' in update and update['version'] != document['version']:
+            raise self.exceptions.ConflictException({'Error': {'Code': 'ConflictException'}}, 'UpdateThingShadow')
+        for key, value in update['state'].get('reported', {}).items():
+            document['state']['reported'].setdefault(key, {}).update(value)
+        document['version'] += 1
+        return {'payload': io.BytesIO(json.dumps({'version': document['version']}).encode('utf-8'))}
+
+
+class Events(StandIn):
+
+    def __init__(self):
+        super().__init__('events')
+        self.rules = {}
+
+    def op_put_rule(self, Name, ScheduleExpression, **kwargs):
+        self.rules[Name] = ScheduleExpression
+        return {'RuleArn': f"arn:aws:events:eu-central-1:000000000000:rule/{Name}"}
+
+
+class Route53(StandIn):
+
+    def __init__(self, zone_name='example.com.'):
+        super().__init__('route53')
+        self.zone_name = zone_name
+        self.records = {}
+
+    def op_get_hosted_zone(self, Id):
+        return {'HostedZone': {'Id': Id, 'Name': self.zone_name}}
+
+    def op_list_resource_record_sets(self, HostedZoneId, StartRecordName, StartRecordType=None, MaxItems=None):
+        # Only exact matches, the state backend ignores whatever record follows a missing one
+        record_set = self.records.get(StartRecordName)
+        return {'ResourceRecordSets': [record_set] if record_set else []}
+
+    def op_change_resource_record_sets(self, HostedZoneId, ChangeBatch):
+        for change in ChangeBatch['Changes']:
+            record_set = change['ResourceRecordSet']
+            if change['Action'] == 'DELETE':
+                self.records.pop(record_set['Name'], None)
+            else:
+                self.records[record_set['Name']] = record_set
+        return {'ChangeInfo': {'Status': 'PENDING'}}
+
+
+def stand_ins():
+    return {'iot-data': IotData(), 'events': Events(), 'route53': Route53()}
+
+
+class Context:
+    function_name = 'replay'
+    function_version = '$LATEST'
+    memory_limit_in_mb = 128
+    invoked_function_arn = 'arn:aws:lambda:eu-central-1:000000000000:function:replay'
+    aws_request_id = 'replay'
+
+    def __init__(self, timeout=60):
+        self.deadline = time.monotonic() + timeout
+
+    def get_remaining_time_in_millis(self):
+        return int((self.deadline - time.monotonic()) * 1000)
+
+
+# Replay
+
+@contextlib.contextmanager
+def environment(function, base_url):
+    # A fresh "execution environment": function env, empty /tmp, runtime module state reset, stand-ins
+    from aws4home_runtime import clients, dedupe, http_cache, httpclient, instrument, publisher, resilience, state
+
+    spec = FUNCTIONS[function]
+    function_dir = os.path.join(ROOT, spec['path'])
+    env = {
+        'AWS_DEFAULT_REGION': 'eu-central-1',
+        'POWERTOOLS_SERVICE_NAME': function,
+        'POWERTOOLS_METRICS_NAMESPACE': 'aws4home',
+        'POWERTOOLS_TRACE_DISABLED': 'true',
+        'POWERTOOLS_LOG_LEVEL': 'ERROR',
+        'LOG_LEVEL': 'ERROR'
+    }
+    env.update({key: value.replace('{base_url}', base_url) for key, value in spec['env'].items()})
+
+    saved_env = {key: os.environ.get(key) for key in list(env) + ['ISS_TLE_FILE', 'STATE_FILE', 'LUNAR_EPHEMERIS_DIR']}
+    saved_paths = (http_cache.CACHE_DIR, dedupe.FINGERPRINT_PATH)
+    with tempfile.TemporaryDirectory(prefix='aws4home-replay-') as tmp:
+        env['ISS_TLE_FILE'] = os.path.join(tmp, 'iss.tle')
+        env['STATE_FILE'] = os.path.join(tmp, 'state.json')
+        env['LUNAR_EPHEMERIS_DIR'] = tmp
+        os.environ.update(env)
+        http_cache.CACHE_DIR = os.path.join(tmp, 'http')
+        dedupe.FINGERPRINT_PATH = os.path.join(tmp, 'fingerprints.json')
+        for reset in (clients.reset, http_cache.invalidate, dedupe.reset, instrument.reset, httpclient.reset, publisher.reset, resilience.reset, state._zone_names.clear):
+            reset()
+        services = stand_ins()
+        for name, stand_in in services.items():
+            clients.override(name, stand_in)
+
+        # index and its siblings (listing, predictor, ...) of other functions share module names, the router
+        # imports features as aws4home_feature_<name> and puts their directories on the path
+        saved_path = list(sys.path)
+        forget_functions()
+        sys.path.insert(0, function_dir)
+        try:
+            yield services
+        finally:
+            sys.path[:] = saved_path
+            forget_functions()
+            clients.reset()
+            http_cache.CACHE_DIR, dedupe.FINGERPRINT_PATH = saved_paths
+            dedupe.reset()
+            for key, value in saved_env.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+
+
+def forget_functions():
+    function_root = os.path.join(ROOT, 'function')
+    for directory in os.listdir(function_root):
+        for file in os.listdir(os.path.join(function_root, directory)):
+            if file.endswith('.py'):
+                sys.modules.pop(file[:-3], None)
+    for module in [module for module in sys.modules if module.startswith('aws4home_feature_')]:
+        sys.modules.pop(module)
+
+
+def calls(services):
+    return collections.Counter({
+        f"{service.service}.{operation}": count
+        for service in services.values() for operation, count in service.calls.items()
+    })
+
+
+def invoke(handler, event, services):
+    before = calls(services)
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        handler(event, Context())
+        elapsed = (time.perf_counter() - started) * 1000
+    return elapsed, calls(services) - before
+
+
+def replay(function, invocations=5, event=None):
+    event = FUNCTIONS[function]['event'] if event is None else event
+
+    with fixture_server() as base_url:
+        # Timings, without the overhead of tracing allocations
+        with environment(function, base_url) as services:
+            started = time.perf_counter()
+            index = importlib.import_module('index')
+            init_ms = (time.perf_counter() - started) * 1000
+            cold_ms, cold_calls = invoke(index.handler, event, services)
+            warm = [invoke(index.handler, event, services) for _ in range(invocations - 1)]
+        upstream = dict(FixtureServer.requests)
+
+        # Peak allocations of a cold and a warm invocation, in a fresh environment
+        with environment(function, base_url) as services:
+            index = importlib.import_module('index')
+            peaks = []
+            tracemalloc.start()
+            try:
+                for _ in range(2):
+                    tracemalloc.reset_peak()
+                    invoke(index.handler, event, services)
+                    peaks.append(tracemalloc.get_traced_memory()[1] / 1024)
+            finally:
+                tracemalloc.stop()
+
+    warm_calls = collections.Counter()
+    for _, invocation_calls in warm:
+        # Worst warm invocation per API
+        warm_calls |= invocation_calls
+    return Result(function, init_ms, cold_ms, [elapsed for elapsed, _ in warm], peaks[0], peaks[1], cold_calls, warm_calls, upstream)
+
+
+def check(result, thresholds=None, timing=True):
+    # -> list of threshold violations, empty if none
+    thresholds = thresholds or THRESHOLDS[result.function]
+    violations = []
+    if timing and result.warm_ms and statistics.median(result.warm_ms) > thresholds['warm_ms']:
+        violations.append(f"{result.function}: warm p50 {statistics.median(result.warm_ms):.1f} ms > {thresholds['warm_ms']} ms")
+    if result.cold_peak_kib > thresholds['cold_peak_kib']:
+        violations.append(f"{result.function}: cold peak {result.cold_peak_kib:.0f} KiB > {thresholds['cold_peak_kib']} KiB")
+    for phase in ('cold_calls', 'warm_calls'):
+        for api, count in sorted(getattr(result, phase).items()):
+            if count > thresholds[phase].get(api, 0):
+                violations.append(f"{result.function}: {count} {api} call(s) {phase.split('_')[0]} > {thresholds[phase].get(api, 0)}")
+    return violations
@@ -1,5 +1,8 @@
+import json
+
 import aws_cdk as core
 import aws_cdk.assertions as assertions
+import pytest
 
 from aws4home.aws4home_stack import Aws4HomeStack
 
@@ -13,3 +16,30 @@ def test_sqs_queue_created():
 #     template.has_resource_properties("AWS::SQS::Queue", {
 #         "VisibilityTimeout": 300
 #     })
+
+
+def synth(**overrides):
+    with open("config/config.example.json") as json_file:
+        params = json.load(json_file)
+    params.update({
+        "Layers": {"Powertools": "arn:aws:lambda:eu-central-1:017000801446:layer:AWSLambdaPowertoolsPythonV2-Arm64:69"},
+        "LunarPrefix": "lunar-lander",
+        "GaragedoorShadowPrefix": "garagedoor-shadow"
+    }, **overrides)
+    app = core.App(context={"aws:cdk:bundling-stacks": []})
+    stack = Aws4HomeStack(app, "aws4home", env=core.Environment(account="000000000000", region="eu-central-1"), params=params)
+    return assertions.Template.from_stack(stack)
+
+
+def test_materialized_schedules_reach_every_feature():
+    functions = synth(MaterializeSchedules=True).find_resources("AWS::Lambda::Function")
+    environments = [function["Properties"].get("Environment", {}).get("Variables", {}) for function in functions.values()]
+    for prefix_variable in ("ISS_PREFIX", "BOND_PREFIX", "LUNAR_PREFIX"):
+        variables = next(variables for variables in environments if prefix_variable in variables)
+        assert "SCHEDULE_GROUP" in variables and "SCHEDULE_ROLE_ARN" in variables
+
+
+@pytest.mark.parametrize("backend, parameters", [("ssm", 1), ("file", 0), ("route53", 0)])
+def test_iss_state_parameter_only_for_the_ssm_backend(backend, parameters):
+    parameters_found = synth(IssStateBackend=backend).find_resources("AWS::SSM::Parameter", {"Properties": {"Name": "/iss/state"}})
+    assert len(parameters_found) == parameters
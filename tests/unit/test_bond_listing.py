@@ -0,0 +1,52 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "function", "bond"))
+
+import listing    # noqa: E402
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "bond.html")
+
+
+def read_fixture():
+    with open(FIXTURE, "rb") as fixture:
+        return fixture.read()
+
+
+def chunked(content, size):
+    for start in range(0, len(content), size):
+        yield content[start:start + size]
+
+
+def test_stream_and_soup_parsers_agree():
+    content = read_fixture()
+    streamed = list(listing.stream_rows(chunked(content, 64)))
+    souped = list(listing.soup_rows(content))
+
+    assert streamed == souped
+    assert len(streamed) == 4
+    assert streamed[0] == listing.Row("17.10.2026", "20.15\xa0Uhr", "Kabel 1", "Goldfinger")
+    assert streamed[1].title == "Im Geheimdienst Ihrer Majest\xe4t"
+    assert streamed[3].title == "Casino Royale & Ein Quantum Trost"
+
+
+def test_stream_stops_after_listing_table():
+    content = read_fixture()
+    consumed = []
+
+    def chunks():
+        for chunk in chunked(content, 64):
+            consumed.append(chunk)
+            yield chunk
+
+    rows = list(listing.stream_rows(chunks()))
+    assert len(rows) == 4
+    assert sum(len(chunk) for chunk in consumed) < len(content)
+
+
+def test_stream_raises_without_listing_table():
+    try:
+        list(listing.stream_rows([b"<html><table><tr><td>x</td></tr></table></html>"]))
+    except IndexError:
+        return
+    raise AssertionError("missing table not detected")
@@ -0,0 +1,36 @@
+import os
+import pickle
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "function", "bond"))
+
+import programme    # noqa: E402
+
+SHOWS = [(300, "ZDF", "Goldfinger"), (100, "ARD", "Dr. No"), (200, "Kabel 1", "Skyfall")]
+
+
+def test_from_shows_sorts_parallel_arrays():
+    program = programme.from_shows(SHOWS)
+    assert list(program.times) == [100, 200, 300]
+    assert program.titles == ("Dr. No", "Skyfall", "Goldfinger")
+    assert program.channels == ("ARD", "Kabel 1", "ZDF")
+
+
+def test_next_index_skips_shows_at_or_before_now():
+    program = programme.from_shows(SHOWS)
+    assert programme.next_index(program, 0) == 0
+    assert programme.next_index(program, 200) == 2
+    assert programme.next_index(program, 250) == 2
+    assert programme.next_index(program, 300) == 3
+
+
+def test_exhausted():
+    program = programme.from_shows(SHOWS)
+    assert not programme.exhausted(program, 299)
+    assert programme.exhausted(program, 300)
+    assert programme.exhausted(programme.from_shows([]), 0)
+
+
+def test_pickles_for_the_http_cache():
+    program = programme.from_shows(SHOWS)
+    assert pickle.loads(pickle.dumps(program)) == program
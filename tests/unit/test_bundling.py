@@ -0,0 +1,52 @@
+import aws_cdk.aws_lambda as lambda_
+
+from aws4home import bundling
+
+
+def write_requirements(path, content):
+    path.mkdir()
+    (path / "requirements.txt").write_text(content)
+    return str(path / "requirements.txt")
+
+
+def test_cache_key_follows_requirements_runtime_and_architecture(tmp_path):
+    first = write_requirements(tmp_path / "first", "requests\n")
+    same = write_requirements(tmp_path / "same", "requests\n")
+    other = write_requirements(tmp_path / "other", "requests==2.31.0\n")
+    runtime, arm = lambda_.Runtime.PYTHON_3_12, lambda_.Architecture.ARM_64
+
+    assert bundling.cache_key([first], runtime, arm) == bundling.cache_key([same], runtime, arm)
+    assert bundling.cache_key([first], runtime, arm) != bundling.cache_key([other], runtime, arm)
+    assert bundling.cache_key([first], runtime, arm) != bundling.cache_key([first, other], runtime, arm)
+    assert bundling.cache_key([first], runtime, arm) != bundling.cache_key([first], runtime, lambda_.Architecture.X86_64)
+    assert bundling.cache_key([first], runtime, arm) != bundling.cache_key([first], lambda_.Runtime.PYTHON_3_11, arm)
+
+
+def test_strip_drops_tests_scripts_and_install_metadata_but_keeps_licenses(tmp_path):
+    python_dir = tmp_path / "python"
+    for path in ["pkg/__init__.py", "pkg/tests/test_pkg.py", "bin/pkg", "pkg-1.0.dist-info/METADATA",
+                 "pkg-1.0.dist-info/RECORD", "pkg-1.0.dist-info/licenses/LICENSE", "old-1.0.dist-info/LICENSE.txt",
+                 "old-1.0.dist-info/INSTALLER"]:
+        (python_dir / path).parent.mkdir(parents=True, exist_ok=True)
+        (python_dir / path).write_text("x" * 10)
+
+    assert bundling.strip(str(python_dir)) == 40
+    remaining = sorted(str(path.relative_to(python_dir)) for path in python_dir.rglob("*") if path.is_file())
+    assert remaining == ["old-1.0.dist-info/LICENSE.txt", "pkg-1.0.dist-info/METADATA",
+                         "pkg-1.0.dist-info/licenses/LICENSE", "pkg/__init__.py"]
+
+
+def test_local_pip_fills_the_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(bundling, "CACHE_DIR", str(tmp_path / "cache"))
+    requirements = write_requirements(tmp_path / "layer", "")
+    output = tmp_path / "output"
+    output.mkdir()
+    cached = str(tmp_path / "cache" / "key")
+    local = bundling.LocalPip([requirements], lambda_.Runtime.PYTHON_3_12, lambda_.Architecture.ARM_64, cached)
+
+    assert local.try_bundle(str(output), image=lambda_.Runtime.PYTHON_3_12.bundling_image)
+    assert (output / "python").is_dir()
+    assert (tmp_path / "cache" / "key" / "report.json").is_file()
+
+    monkeypatch.setenv("AWS4HOME_BUNDLING", "docker")
+    assert not local.try_bundle(str(output), image=lambda_.Runtime.PYTHON_3_12.bundling_image)
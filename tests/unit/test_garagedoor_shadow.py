@@ -0,0 +1,104 @@
+import io
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "function", "garagedoor-shadow"))
+
+import shadow    # noqa: E402
+
+
+class ConflictException(Exception):
+    pass
+
+
+class ResourceNotFoundException(Exception):
+    pass
+
+
+class IotStandIn:
+    # Versioned shadow document, rejects writes carrying an outdated version like IoT Core does
+
+    class exceptions:
+        ConflictException = ConflictException
+        ResourceNotFoundException = ResourceNotFoundException
+
+    def __init__(self):
+        self.reported = {}
+        self.version = 0
+        self.writes = []
+
+    def get_thing_shadow(self, **kwargs):
+        if not self.version:
+            raise ResourceNotFoundException()
+        return {"payload": io.BytesIO(json.dumps({"state": {"reported": self.reported}, "version": self.version}).encode())}
+
+    def update_thing_shadow(self, **kwargs):
+        document = json.loads(kwargs["payload"])
+        if "version" in document and document["version"] != self.version:
+            raise ConflictException()
+        self.writes.append(document)
+        for key, value in document["state"]["reported"].items():
+            self.reported[key] = dict(self.reported.get(key, {}), **value) if isinstance(value, dict) else value
+        self.version += 1
+        return {"payload": io.BytesIO(json.dumps({"version": self.version}).encode())}
+
+
+def test_burst_is_merged_into_one_write_last_writer_wins():
+    iot = IotStandIn()
+    updater = shadow.ShadowUpdater(iot, "garagedoor", "garagedoor_1", "garagedoor")
+
+    updater.update([{"door": "opening", "light": "on"}, {"door": "open"}])
+
+    assert len(iot.writes) == 1
+    assert iot.reported == {"garagedoor": {"door": "open", "light": "on"}}
+    assert updater.version == 1
+
+
+def test_only_changed_fields_are_sent_and_repeats_are_dropped():
+    iot = IotStandIn()
+    updater = shadow.ShadowUpdater(iot, "garagedoor", "garagedoor_1", "garagedoor", exclusive=True)
+    updater.update([{"door": "open", "light": "on"}])
+
+    assert updater.update([{"door": "open", "light": "on"}]) is None
+    assert updater.update([{"door": "closed", "light": "on"}]) == {"door": "closed"}
+    assert iot.writes[-1] == {"state": {"reported": {"garagedoor": {"door": "closed"}}}, "version": 1}
+    assert len(iot.writes) == 2
+
+
+def test_conflicting_version_refreshes_and_retries():
+    iot = IotStandIn()
+    updater = shadow.ShadowUpdater(iot, "garagedoor", "garagedoor_1", "garagedoor")
+    updater.update([{"door": "open"}])
+
+    # Written by someone else in the meantime
+    iot.reported["garagedoor"] = {"door": "closed"}
+    iot.version += 1
+
+    assert updater.update([{"door": "closed", "light": "off"}]) == {"light": "off"}
+    assert iot.reported == {"garagedoor": {"door": "closed", "light": "off"}}
+    assert updater.version == 3
+
+
+def test_repeat_against_a_stale_copy_is_written():
+    iot = IotStandIn()
+    updater = shadow.ShadowUpdater(iot, "garagedoor", "garagedoor_1", "garagedoor")
+    updater.update([{"door": "open"}])
+
+    # Another execution environment closed the door
+    iot.reported["garagedoor"] = {"door": "closed"}
+    iot.version += 1
+
+    assert updater.update([{"door": "open"}]) == {"door": "open"}
+    assert iot.reported == {"garagedoor": {"door": "open"}}
+    assert updater.version == 3
+
+
+def test_sqs_batch_is_ordered_by_sent_timestamp():
+    event = {"Records": [
+        {"body": json.dumps({"door": "closed"}), "attributes": {"SentTimestamp": "2000"}},
+        {"body": json.dumps({"door": "open"}), "attributes": {"SentTimestamp": "1000"}}
+    ]}
+
+    assert shadow.merge(shadow.from_batch(event)) == {"door": "closed"}
+    assert shadow.from_batch({"door": "open"}) == [{"door": "open"}]
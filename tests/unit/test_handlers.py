@@ -0,0 +1,147 @@
+import time
+import types
+
+import pytest
+
+from aws4home_runtime import timeconv, timeline
+from tests import harness
+
+
+@pytest.mark.parametrize("function", list(harness.FUNCTIONS))
+def test_replay_stays_within_thresholds(function):
+    result = harness.replay(function, invocations=3)
+    # Wall time is left to scripts/bench_handlers.py --check, shared CI runners are too noisy for it
+    assert harness.check(result, timing=False) == []
+
+
+def test_bond_warm_invocations_reuse_the_cached_programme():
+    result = harness.replay("bond", invocations=3)
+    assert result.upstream == {"bond.html": 1}
+    assert result.cold_calls["events.put_rule"] == 1
+    assert result.warm_calls["events.put_rule"] == 0
+
+
+def test_garagedoor_batch_is_written_once(monkeypatch):
+    with harness.fixture_server() as base_url:
+        with harness.environment("garagedoor-shadow", base_url) as services:
+            import index
+
+            index.handler(harness.GARAGEDOOR_BATCH, harness.Context())
+            index.handler(harness.GARAGEDOOR_BATCH, harness.Context())
+            # A repeat is dropped only if the function is the shadow's only writer
+            monkeypatch.setattr(index.updater, "exclusive", True)
+            index.handler(harness.GARAGEDOOR_BATCH, harness.Context())
+    shadow = services["iot-data"].shadows[("garagedoor", "garagedoor_1")]
+    assert shadow == {"state": {"reported": {"garagedoor": {"door": "open", "light": "on"}}}, "version": 2}
+
+
+def test_fixtures_are_shifted_to_the_replay_day():
+    today = harness.date.fromisoformat(harness.recorded_dates()["bond.html"]) + harness.timedelta(days=3)
+    shifted = harness.fixture("bond.html", today=today)
+    assert b"20.10.2026" in shifted and b"17.10.2026" not in shifted
+
+    tle = harness.shift_tle(harness.fixture("iss.tle", today=harness.date(2024, 10, 16)), 365).decode().splitlines()
+    # 2024 is a leap year
+    assert tle[1][18:32] == "25289.51782528"
+
+
+def test_lunar_lander_publishes_at_a_moon_event_and_reschedules(monkeypatch):
+    with harness.fixture_server() as base_url:
+        with harness.environment("lunar-lander", base_url) as services:
+            import ephemeris
+            import index
+
+            events = index.load_events(int(time.time()))
+            moonrise = events.times[ephemeris.next_index(events, int(time.time()))]
+            monkeypatch.setattr(index.time, "time", lambda: moonrise + 5)
+            index.handler(harness.SCHEDULED_EVENT, harness.Context())
+
+    assert services["iot-data"].calls == {"publish": 1}
+    assert services["events"].rules["lunar-lander"] == timeconv.cron(events.times[ephemeris.next_index(events, moonrise)])
+
+
+def test_timeline_publishes_the_slot_a_feature_submitted(monkeypatch, tmp_path):
+    for name, value in (("TIMELINE_PREFIX", "timeline"), ("BACKEND", "file"), ("FILE_DIR", str(tmp_path)), ("SOURCES", ["lunar-lander"])):
+        monkeypatch.setattr(timeline, name, value)
+    with harness.fixture_server() as base_url:
+        with harness.environment("lunar-lander", base_url) as services:
+            import ephemeris
+            import index
+
+            now = int(time.time())
+            events = index.load_events(now)
+            moonrise = events.times[ephemeris.next_index(events, now)]
+            index.handler(harness.SCHEDULED_EVENT, harness.Context())
+            # Submitted instead of published or scheduled on the feature's own rule
+            assert services["iot-data"].calls == {}
+            assert "lunar-lander" not in services["events"].rules
+            assert services["events"].rules["timeline"] == timeconv.cron(moonrise)
+
+            harness.forget_functions()
+            monkeypatch.syspath_prepend(harness.os.path.join(harness.ROOT, "function", "timeline"))
+            import index
+
+            monkeypatch.setattr(index.time, "time", lambda: moonrise + 5)
+            index.handler(harness.SCHEDULED_EVENT, harness.Context())
+            index.handler(harness.SCHEDULED_EVENT, harness.Context())
+
+    assert services["iot-data"].calls == {"publish": 1}
+    assert services["events"].rules["timeline"] == timeconv.cron(events.times[ephemeris.next_index(events, moonrise)])
+
+
+def test_iss_serves_every_home_of_a_pass_over_straddling_a_minute(monkeypatch):
+    with harness.fixture_server() as base_url:
+        with harness.environment("iss", base_url):
+            import index
+            from predictor import Pass
+
+            now = 1729080000
+            begins = {"berlin": 1729086070, "hamburg": 1729086130, "munich": 1729086140}
+            monkeypatch.setattr(index, "locations", [index.Location(name, "0", "0", f"home/{name}", "UTC") for name in begins])
+            monkeypatch.setattr(index, "get_passes", lambda current_time: [
+                # This pass over and the next orbit's
+                [Pass(begin * 1000, (begin + 400) * 1000, 400000, None), Pass((begin + 5580) * 1000, (begin + 5980) * 1000, 400000, None)]
+                for begin in begins.values()
+            ])
+            next_pass_begin, targets, cron_expression = index.find_next_pass(harness.datetime.fromtimestamp(now, timeconv.zone("UTC").tzinfo))
+
+    assert cron_expression == timeconv.cron(1729086070)
+    assert targets == [["home/berlin", 400], ["home/hamburg", 460], ["home/munich", 470]]
+
+
+def test_bond_publishes_only_when_fired_at_a_show(monkeypatch):
+    with harness.fixture_server() as base_url:
+        with harness.environment("bond", base_url) as services:
+            import index
+
+            now = int(time.time())
+            times = index.resilience.get(index.bond_url, index.parse_program, fetch=index.fetch_page).times
+            show = next(later for earlier, later in zip(times, times[1:]) if later > now and later - earlier > index.DUE_WINDOW)
+
+            # Fired by the retry rate, no show starting. Only the handler's clock, the fixture server shifts the
+            # listing by the day it runs on
+            monkeypatch.setattr(index, "time", types.SimpleNamespace(time=lambda: show - 60))
+            index.handler(harness.SCHEDULED_EVENT, harness.Context())
+            assert services["iot-data"].calls == {}
+
+            monkeypatch.setattr(index, "time", types.SimpleNamespace(time=lambda: show + 5))
+            index.handler(harness.SCHEDULED_EVENT, harness.Context())
+
+    assert services["iot-data"].calls == {"publish": 1}
+
+
+def test_iss_publishes_only_when_fired_at_the_stored_pass_over(monkeypatch):
+    with harness.fixture_server() as base_url:
+        with harness.environment("iss", base_url) as services:
+            import index
+
+            now = harness.datetime.now(timeconv.zone("Europe/Berlin").tzinfo)
+            # A pass over long gone, e.g. the rule fires at the retry rate while the predictor is down
+            index.write_next_targets_to_state(now - harness.timedelta(hours=5), [["topic/name", 400]])
+            index.handler(harness.SCHEDULED_EVENT, harness.Context())
+            assert services["iot-data"].calls == {}
+
+            index.write_next_targets_to_state(now - harness.timedelta(seconds=30), [["topic/name", 400]])
+            index.handler(harness.SCHEDULED_EVENT, harness.Context())
+
+    assert services["iot-data"].calls == {"publish": 1}
@@ -0,0 +1,60 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "function", "iss"))
+
+import predictor    # noqa: E402
+
+TLE = """ISS (ZARYA)
+1 25544U 98067A   24290.51782528  .00016717  00000-0  30129-3 0  9990
+2 25544  51.6398 188.6221 0008600 105.6427  16.6392 15.49929880477045
+"""
+
+
+def test_parse_tle():
+    tle = predictor.parse_tle(TLE)
+    assert abs(tle.epoch - 1729081540.104192) < 1e-3
+    assert abs(tle.bstar - 0.00030129) < 1e-12
+    assert abs(np.degrees(tle.inclo) - 51.6398) < 1e-9
+
+
+def test_propagation_matches_reference_sgp4():
+    tle = predictor.parse_tle(TLE)
+    # Reference position 12h after epoch from the Vallado SGP4 implementation
+    position = predictor.Sgp4(tle).propagate([tle.epoch + 43200])[0]
+    expected = [-5356.0773436505815, -2938.013542393744, 2964.388333836444]
+    assert np.allclose(position, expected, atol=1e-3)
+
+
+def test_predict_passes_returns_milliseconds():
+    tle = predictor.parse_tle(TLE)
+    passes = predictor.predict_passes(tle, 52.52, 13.40, tle.epoch, days=2, visible_only=False)
+    assert len(passes) >= 8
+    for pass_over in passes:
+        assert pass_over.duration == pass_over.end - pass_over.begin
+        assert 0 < pass_over.duration < 15 * 60 * 1000
+        assert pass_over.max_elevation >= 10.0
+    # First pass above 10° over Berlin starts 13:42:10 UTC
+    assert abs(passes[0].begin - 1729086130000) <= 10000
+
+
+def test_batched_locations_match_single_predictions():
+    tle = predictor.parse_tle(TLE)
+    locations = [(52.52, 13.40), (37.77, -122.42), (-33.87, 151.21)]
+
+    batched = predictor.predict_passes_for(tle, locations, tle.epoch, days=2)
+
+    assert batched == [predictor.predict_passes(tle, lat, lon, tle.epoch, days=2) for lat, lon in locations]
+
+
+def test_load_tle_keeps_stale_copy_on_fetch_error(tmp_path):
+    path = str(tmp_path / "iss.tle")
+    predictor.load_tle("url", lambda url: TLE, path=path)
+
+    def failing_fetch(url):
+        raise IOError("upstream down")
+
+    tle = predictor.load_tle("url", failing_fetch, path=path, max_age=0)
+    assert tle.line1.startswith("1 25544U")
@@ -0,0 +1,56 @@
+import os
+import sys
+from math import degrees, radians
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "function", "lunar-lander"))
+
+import ephemeris    # noqa: E402
+from aws4home_runtime import timeconv    # noqa: E402
+
+BERLIN = ("52.52", "13.405")
+
+
+def test_phases_match_published_times():
+    phases = ephemeris.phases(timeconv.wall(2024, 10, 1), timeconv.wall(2025, 1, 20))
+    # USNO: new moon 2024-10-02 18:49, full moon 2024-10-17 11:26 and 2025-01-13 22:27 (UTC)
+    expected = [
+        (timeconv.wall(2024, 10, 2, 18, 49), "new"),
+        (timeconv.wall(2024, 10, 17, 11, 26), "full"),
+        (timeconv.wall(2025, 1, 13, 22, 27), "full"),
+    ]
+    for utc, kind in expected:
+        assert any(found_kind == kind and abs(found - utc) <= 120 for found, found_kind in phases)
+    assert [kind for _, kind in phases[:4]] == ["new", "full", "new", "full"]
+
+
+def test_moonrises_are_horizon_crossings_once_a_day():
+    start = timeconv.wall(2024, 10, 1)
+    rises = ephemeris.moonrises(*BERLIN, start, start + 30 * timeconv.DAY)
+    assert 27 <= len(rises) <= 30
+    phi, lam = radians(52.52), radians(13.405)
+    for rise in rises:
+        assert degrees(ephemeris.moon_altitude(rise - 60, phi, lam)) < 0.125 <= degrees(ephemeris.moon_altitude(rise + 60, phi, lam))
+    assert all(22 * 3600 < later - earlier < 27 * 3600 for earlier, later in zip(rises, rises[1:]))
+
+
+def test_table_is_sorted_by_minute_and_kept_in_tmp(tmp_path):
+    now = timeconv.wall(2024, 10, 16, 12)
+    events = ephemeris.table(*BERLIN, ["moonrise", "full"], now, directory=str(tmp_path))
+    assert list(events.times) == sorted(events.times)
+    assert all(utc % 60 == 0 for utc in events.times)
+    assert {ephemeris.KINDS[kind] for kind in events.kinds} == {"moonrise", "full"}
+    assert events.times[-1] >= now + 365 * timeconv.DAY
+
+    ephemeris._tables.clear()
+    (path,) = tmp_path.iterdir()
+    assert ephemeris.table(*BERLIN, ["moonrise", "full"], now, directory=str(tmp_path)) == ephemeris.load(str(path)) == events
+
+
+def test_next_and_due_event():
+    events = ephemeris.Table(ephemeris.array("q", [600, 1200]), ephemeris.array("b", [0, 2]))
+    assert ephemeris.next_index(events, 599) == 0
+    # The rule fires in the event's minute, the event itself is past
+    assert ephemeris.next_index(events, 600) == 1
+    assert ephemeris.due(events, 605, 300) == 0
+    assert ephemeris.due(events, 900, 300) is None
+    assert ephemeris.due(events, 500, 300) is None
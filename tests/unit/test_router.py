@@ -0,0 +1,40 @@
+import json
+import sys
+
+import pytest
+
+from tests import harness
+
+RULE_EVENT = harness.FUNCTIONS["router"]["event"]
+SQS_EVENT = {"Records": [{"body": json.dumps({"door": "open"}), "eventSourceARN": "arn:aws:sqs:eu-central-1:000000000000:garagedoor"}]}
+SCHEDULE_EVENT = {"source": "aws4home.schedule", "prefix": "iss", "pattern": "iss.gif", "duration": 240}
+
+
+@pytest.fixture
+def router():
+    with harness.fixture_server() as base_url:
+        with harness.environment("router", base_url) as services:
+            import index
+
+            yield index, services
+
+
+def test_route(router):
+    index, _ = router
+    assert index.route(RULE_EVENT) == "bond"
+    assert index.route(SQS_EVENT) == "garagedoor"
+    assert index.route(SCHEDULE_EVENT) == "iss"
+    # Anything else, e.g. a sensor state
+    assert index.route({"door": "closed"}) == "garagedoor"
+
+
+def test_features_share_one_environment(router):
+    index, services = router
+    index.handler(RULE_EVENT, harness.Context())
+    index.handler({"door": "closed"}, harness.Context())
+    index.handler(RULE_EVENT, harness.Context())
+
+    # No show starts at replay time, Bond only reschedules
+    assert harness.calls(services) == {"events.put_rule": 1, "iot-data.update_thing_shadow": 1}
+    assert sorted(index._handlers) == ["bond", "garagedoor"]
+    assert "aws4home_feature_bond" in sys.modules and "aws4home_feature_iss" not in sys.modules
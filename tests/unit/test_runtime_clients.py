@@ -0,0 +1,22 @@
+import os
+
+from aws4home_runtime import clients
+
+
+def setup_function():
+    os.environ.setdefault("AWS_DEFAULT_REGION", "eu-central-1")
+    clients.reset()
+
+
+def test_client_is_built_once_per_environment():
+    assert clients.get("events") is clients.get("events")
+    assert clients.get("events") is not clients.get("route53")
+
+
+def test_override_returns_stand_in():
+    stand_in = object()
+    clients.override("iot-data", stand_in)
+    assert clients.get("iot-data") is stand_in
+
+    clients.reset()
+    assert clients.get("iot-data") is not stand_in
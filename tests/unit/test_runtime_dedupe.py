@@ -0,0 +1,39 @@
+from aws4home_runtime import dedupe, state
+
+
+def setup_function():
+    dedupe.reset()
+
+
+def teardown_function():
+    dedupe.reset()
+
+
+def test_write_once_skips_identical_value(tmp_path, monkeypatch):
+    monkeypatch.setattr(dedupe, "FINGERPRINT_PATH", str(tmp_path / "fingerprints.json"))
+    writes = []
+
+    assert dedupe.write_once("rule:iss", "cron(1 2 3 4 ? 2026)", lambda: writes.append(1))
+    assert not dedupe.write_once("rule:iss", "cron(1 2 3 4 ? 2026)", lambda: writes.append(1))
+    assert dedupe.write_once("rule:iss", "cron(5 2 3 4 ? 2026)", lambda: writes.append(1))
+
+    assert len(writes) == 2
+    assert dedupe.stats == {"written": 2, "skipped": 1}
+
+
+def test_fingerprints_survive_a_new_module_state_and_expire(tmp_path, monkeypatch):
+    monkeypatch.setattr(dedupe, "FINGERPRINT_PATH", str(tmp_path / "fingerprints.json"))
+    dedupe.record("rule:bond", "cron(0 20 1 1 ? 2027)", now=1000)
+
+    # Fresh execution environment state, same /tmp
+    monkeypatch.setattr(dedupe, "_fingerprints", None)
+    assert dedupe.unchanged("rule:bond", "cron(0 20 1 1 ? 2027)", now=1000 + dedupe.MAX_AGE - 1)
+    assert not dedupe.unchanged("rule:bond", "cron(0 20 1 1 ? 2027)", now=1000 + dedupe.MAX_AGE)
+
+
+def test_state_put_skips_unchanged_values(tmp_path):
+    store = state.StateStore(state.FileBackend(str(tmp_path / "state.json")))
+
+    assert store.put(duration="120", risetime="2026-10-18 18:55:00+02:00")
+    assert not store.put(duration="120")
+    assert dedupe.stats == {"written": 1, "skipped": 1}
@@ -0,0 +1,87 @@
+import pytest
+
+from aws4home_runtime import http_cache
+
+
+class Response:
+
+    def __init__(self, status_code, text="", headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise IOError(self.status_code)
+
+
+class Upstream:
+
+    def __init__(self, status_code=200):
+        self.requests = []
+        self.responses = []
+        self.status_code = status_code
+
+    def __call__(self, url, headers=None):
+        self.requests.append(headers)
+        if headers.get("If-None-Match") == '"v1"':
+            response = Response(304)
+        else:
+            response = Response(self.status_code, "listing", {"ETag": '"v1"', "Last-Modified": "Sat, 17 Oct 2026 10:00:00 GMT"})
+        self.responses.append(response)
+        return response
+
+
+def setup_function():
+    http_cache._entries.clear()
+    for key in http_cache.stats:
+        http_cache.stats[key] = 0
+
+
+def test_fresh_entry_and_not_modified_skip_parsing(tmp_path, monkeypatch):
+    monkeypatch.setattr(http_cache, "CACHE_DIR", str(tmp_path))
+    upstream = Upstream()
+    parsed = []
+
+    def parse(response):
+        parsed.append(response.text)
+        return response.text.upper()
+
+    assert http_cache.get("http://bond", parse, ttl=3600, fetch=upstream) == "LISTING"
+    assert http_cache.get("http://bond", parse, ttl=3600, fetch=upstream) == "LISTING"
+    assert len(upstream.requests) == 1
+
+    assert http_cache.get("http://bond", parse, ttl=0, fetch=upstream) == "LISTING"
+    assert upstream.requests[-1] == {"If-None-Match": '"v1"', "If-Modified-Since": "Sat, 17 Oct 2026 10:00:00 GMT"}
+
+    assert parsed == ["listing"]
+    assert http_cache.stats == {"hit": 1, "not_modified": 1, "miss": 1}
+
+
+def test_entries_survive_in_tmp(tmp_path, monkeypatch):
+    monkeypatch.setattr(http_cache, "CACHE_DIR", str(tmp_path))
+    http_cache.get("http://iss", lambda response: response.text, ttl=3600, fetch=Upstream())
+    http_cache._entries.clear()
+
+    def unreachable(url, headers=None):
+        raise AssertionError("served from /tmp")
+
+    assert http_cache.get("http://iss", lambda response: response.text, ttl=3600, fetch=unreachable) == "listing"
+
+
+def test_responses_are_closed_on_every_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(http_cache, "CACHE_DIR", str(tmp_path))
+    upstream = Upstream()
+    http_cache.get("http://bond", lambda response: response.text, fetch=upstream)
+    http_cache.get("http://bond", lambda response: response.text, fetch=upstream)
+
+    failing = Upstream(status_code=503)
+    with pytest.raises(IOError):
+        http_cache.get("http://iss", lambda response: response.text, fetch=failing)
+
+    assert [response.status_code for response in upstream.responses + failing.responses] == [200, 304, 503]
+    assert all(response.closed for response in upstream.responses + failing.responses)
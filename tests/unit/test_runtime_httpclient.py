@@ -0,0 +1,98 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from aws4home_runtime import httpclient
+
+
+class Upstream(BaseHTTPRequestHandler):
+    # Answers with the next status of `statuses`, 200 once they are used up, sleeps `delay` seconds first
+    statuses = []
+    delay = 0.0
+    requests = []
+
+    def respond(self):
+        Upstream.requests.append(self.command)
+        time.sleep(Upstream.delay)
+        status = Upstream.statuses.pop(0) if Upstream.statuses else 200
+        try:
+            self.send_response(status)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+        except (BrokenPipeError, ConnectionResetError):
+            # Client gave up waiting
+            pass
+
+    do_GET = respond
+    do_POST = respond
+
+    def log_message(self, *args):
+        pass
+
+
+class Context:
+
+    def __init__(self, remaining_ms):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    monkeypatch.setattr(httpclient, "BACKOFF_BASE", 0.01)
+    Upstream.statuses, Upstream.delay, Upstream.requests = [], 0.0, []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Upstream)
+    server.block_on_close = False
+    threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+    httpclient.reset()
+
+
+def test_get_retries_server_errors(upstream):
+    Upstream.statuses = [503, 502]
+
+    response = httpclient.get(upstream)
+
+    assert response.status_code == 200
+    assert Upstream.requests == ["GET", "GET", "GET"]
+
+
+def test_non_idempotent_requests_are_not_retried(upstream):
+    Upstream.statuses = [503]
+
+    response = httpclient.request("POST", upstream)
+
+    assert response.status_code == 503
+    assert Upstream.requests == ["POST"]
+
+
+def test_last_response_is_returned_when_attempts_are_used_up(upstream):
+    Upstream.statuses = [500] * httpclient.MAX_ATTEMPTS
+
+    assert httpclient.get(upstream).status_code == 500
+    assert len(Upstream.requests) == httpclient.MAX_ATTEMPTS
+
+
+def test_read_timeout_is_capped_by_the_deadline(upstream):
+    Upstream.delay = 2.0
+
+    # 1 s remaining, 0.5 s margin
+    handler = httpclient.deadline(margin=0.5)(lambda event, context: httpclient.get(upstream))
+    started = time.monotonic()
+    with pytest.raises((requests.Timeout, httpclient.DeadlineExceeded)):
+        handler({}, Context(1000))
+
+    assert time.monotonic() - started < 1.5
+    assert httpclient._deadline is None
+
+
+def test_session_is_reused(upstream):
+    assert httpclient.session() is httpclient.session()
@@ -0,0 +1,73 @@
+import json
+import threading
+
+from aws4home_runtime import instrument
+
+
+class MetricsStandIn:
+
+    def __init__(self):
+        self.metrics = {}
+
+    def add_metric(self, name, unit, value):
+        self.metrics[name] = value
+
+
+def teardown_function():
+    instrument.reset()
+
+
+def test_stages_are_summed_per_name_and_nest():
+    with instrument.stage("fetch") as fetch:
+        fetch.add(bytes=1000)
+        with instrument.stage("parse"):
+            instrument.add(retries=1)
+    with instrument.stage("fetch"):
+        instrument.add(bytes=500, retries=2)
+
+    totals = instrument.snapshot()
+    assert totals["fetch"]["count"] == 2
+    assert totals["fetch"]["bytes"] == 1500
+    assert totals["fetch"]["retries"] == 2
+    assert totals["parse"]["retries"] == 1
+    assert totals["fetch"]["ms"] >= totals["parse"]["ms"]
+
+
+def test_stages_in_threads_are_attributed_to_their_own_thread():
+    timed_publish = instrument.timed("publish")(lambda: instrument.add(bytes=10))
+
+    with instrument.stage("handler"):
+        thread = threading.Thread(target=timed_publish)
+        thread.start()
+        thread.join()
+
+    totals = instrument.snapshot()
+    assert totals["publish"]["bytes"] == 10
+    assert totals["handler"]["bytes"] == 0
+
+
+def test_report_writes_metrics_once_and_resets(tmp_path, monkeypatch):
+    stage_file = tmp_path / "stages.jsonl"
+    monkeypatch.setattr(instrument, "STAGE_FILE", str(stage_file))
+    metrics = MetricsStandIn()
+
+    @instrument.report(metrics)
+    def handler(event, context):
+        with instrument.stage("rule"):
+            instrument.add(retries=1)
+
+    handler({}, None)
+
+    assert metrics.metrics["rule.retries"] == 1
+    assert "rule.duration" in metrics.metrics
+    assert "rule.bytes" not in metrics.metrics
+    assert instrument.snapshot() == {}
+    assert list(json.loads(stage_file.read_text())) == ["rule"]
+
+
+def test_table_shows_percentiles_per_stage():
+    invocations = [{"fetch": {"ms": float(ms), "count": 1, "bytes": 100, "retries": 0}} for ms in range(1, 101)]
+
+    lines = instrument.table(invocations).splitlines()
+
+    assert lines[1].split() == ["fetch", "100", "50.0", "95.0", "99.0", "100", "0"]
@@ -0,0 +1,61 @@
+import io
+import json
+import logging
+
+from aws_lambda_powertools import Logger
+
+from aws4home_runtime import logpolicy
+
+
+class Context:
+    function_name = "fn"
+    function_version = "$LATEST"
+    memory_limit_in_mb = 128
+    invoked_function_arn = "arn:aws:lambda:eu-central-1:000000000000:function:fn"
+    aws_request_id = "request"
+
+
+def make_logger(name, level):
+    # Powertools keeps the handler of the first Logger per service name
+    stream = io.StringIO()
+    logger = Logger(service=f"logpolicy-{name}", level=level, logger_handler=logging.StreamHandler(stream))
+    return logger, stream
+
+
+def lines(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_disabled_messages_are_not_formatted():
+    logger, stream = make_logger("lazy", "INFO")
+    calls = []
+    logger.debug("value: %s", logpolicy.lazy(lambda: calls.append(1)))
+    assert calls == [] and stream.getvalue() == ""
+
+
+def test_truncate():
+    assert logpolicy.truncate({"a": 1}, max_bytes=100) == '{"a":1}'
+    truncated = logpolicy.truncate({"body": "x" * 100}, max_bytes=20)
+    assert truncated.startswith('{"body":"xxxxxxxxxxx') and truncated.endswith("...(111 bytes)")
+
+
+def test_event_is_logged_cut_to_size(monkeypatch):
+    monkeypatch.setattr(logpolicy, "EVENT_MAX_BYTES", 16)
+    logger, stream = make_logger("event", "INFO")
+    logpolicy.inject(logger)(lambda event, context: None)({"Records": ["x" * 100]}, Context())
+    (line,) = lines(stream)
+    assert line["message"].startswith('event: {"Records":["x') and line["function_request_id"] == "request"
+
+
+def test_debug_is_sampled_per_invocation(monkeypatch):
+    logger, stream = make_logger("sampled", "INFO")
+    monkeypatch.setattr(logpolicy, "LOG_EVENT", False)
+    handler = logpolicy.inject(logger)(lambda event, context: logger.debug("sampled"))
+
+    monkeypatch.setattr(logpolicy, "SAMPLE_RATE", 1.0)
+    handler({}, Context())
+    monkeypatch.setattr(logpolicy, "SAMPLE_RATE", 0.0)
+    handler({}, Context())
+
+    assert [line["message"] for line in lines(stream)] == ["sampled"]
+    assert logger.log_level == logging.INFO
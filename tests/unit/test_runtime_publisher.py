@@ -0,0 +1,104 @@
+import json
+import threading
+import time
+
+from botocore.exceptions import ClientError, EndpointConnectionError
+
+from aws4home_runtime import clients, publisher
+
+
+class IotData:
+
+    def __init__(self, fail_topics=(), delay=0):
+        self.published = []
+        self.fail_topics = fail_topics
+        self.delay = delay
+        self.sent = threading.Event()
+
+    def publish(self, topic, qos, retain, payload):
+        time.sleep(self.delay)
+        if topic == "unreachable":
+            raise EndpointConnectionError(endpoint_url="https://iot.example.com")
+        if topic in self.fail_topics:
+            raise ClientError({"Error": {"Code": "ForbiddenException", "Message": "denied"}}, "Publish")
+        self.published.append((topic, json.loads(payload)))
+        self.sent.set()
+
+
+def setup_function():
+    clients.reset()
+    publisher.reset()
+
+
+def teardown_function():
+    clients.reset()
+    publisher.reset()
+
+
+def test_duplicates_are_merged_per_topic_and_pattern(monkeypatch):
+    monkeypatch.setattr(publisher, "WINDOW", 60)
+    iot = IotData()
+    clients.override("iot-data", iot)
+
+    publisher.publish("home", "iss.gif", 300)
+    publisher.publish("home", "iss.gif", 420)
+    publisher.publish("home", "iss.gif", None)
+    publisher.publish("office", "iss.gif", None)
+    publisher.publish("home", "bond", 7200)
+    assert iot.published == []
+
+    assert publisher.flush() == 3
+    assert sorted(iot.published, key=lambda message: (message[0], message[1]["pattern"])) == [
+        ("home", {"pattern": "bond", "duration": 7200}),
+        ("home", {"pattern": "iss.gif", "duration": 420}),
+        ("office", {"pattern": "iss.gif", "duration": None}),
+    ]
+    assert publisher.stats == {"queued": 5, "coalesced": 2, "published": 3, "failed": 0}
+    assert publisher.flush() == 0
+
+
+def test_queue_is_sent_once_the_window_passed(monkeypatch):
+    monkeypatch.setattr(publisher, "WINDOW", 0.01)
+    iot = IotData()
+    clients.override("iot-data", iot)
+
+    publisher.publish("home", "lunar-lander", 600)
+    assert iot.sent.wait(5)
+    assert iot.published == [("home", {"pattern": "lunar-lander", "duration": 600})]
+
+
+def test_handler_returns_after_its_messages_were_sent(monkeypatch):
+    monkeypatch.setattr(publisher, "WINDOW", 60)
+    iot = IotData(fail_topics={"denied"})
+    clients.override("iot-data", iot)
+    logged = []
+
+    class Logger:
+        def error(self, message):
+            logged.append(message)
+
+    @publisher.batched(Logger())
+    def handler(event, context):
+        publisher.publish("home", "bond", 7200)
+        publisher.publish("denied", "bond", 7200)
+        publisher.publish("unreachable", "bond", 7200)
+
+    handler({}, None)
+    assert iot.published == [("home", {"pattern": "bond", "duration": 7200})]
+    assert sorted(type(error).__name__ for error in logged) == ["ClientError", "EndpointConnectionError"]
+    assert publisher.stats["failed"] == 2
+
+
+def test_handler_outliving_the_window_waits_for_the_send_in_flight(monkeypatch):
+    monkeypatch.setattr(publisher, "WINDOW", 0.05)
+    iot = IotData(delay=0.3)
+    clients.override("iot-data", iot)
+
+    @publisher.batched()
+    def handler(event, context):
+        publisher.publish("home", "iss.gif", 300)
+        # The window's timer flushes meanwhile
+        time.sleep(0.1)
+
+    handler({}, None)
+    assert iot.published == [("home", {"pattern": "iss.gif", "duration": 300})]
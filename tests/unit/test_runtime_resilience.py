@@ -0,0 +1,100 @@
+import threading
+
+import pytest
+
+from aws4home_runtime import http_cache, resilience
+
+
+class Response:
+
+    def __init__(self, text):
+        self.status_code = 200
+        self.text = text
+        self.headers = {}
+
+    def close(self):
+        pass
+
+    def raise_for_status(self):
+        pass
+
+
+class Upstream:
+    # Answers with the next of `answers`: text, an exception to raise or an Event to wait for first
+
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.calls = 0
+
+    def __call__(self, url, headers=None):
+        self.calls += 1
+        answer = self.answers.pop(0)
+        if isinstance(answer, threading.Event):
+            answer.wait(5)
+            answer = self.answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return Response(answer)
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.setattr(http_cache, "CACHE_DIR", str(tmp_path))
+    http_cache._entries.clear()
+    resilience.reset()
+
+
+def get(upstream, budget=1.0):
+    return resilience.get("http://upstream/listing", lambda response: response.text, fetch=upstream, budget=budget)
+
+
+def test_breaker_opens_and_probes_half_open():
+    now = [0.0]
+    breaker = resilience.CircuitBreaker("upstream", failure_threshold=2, reset_timeout=60, clock=lambda: now[0])
+    breaker.failure()
+    assert breaker.allow()
+    breaker.failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    now[0] = 60
+    assert breaker.allow() and breaker.state == "half-open"
+    # Only the probe is let through
+    assert not breaker.allow()
+    breaker.failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    now[0] = 120
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_last_good_value_when_upstream_fails():
+    upstream = Upstream("v1", IOError("down"), IOError("down"), IOError("down"))
+    assert get(upstream) == "v1"
+    assert [get(upstream) for _ in range(3)] == ["v1"] * 3
+    # Breaker is open now, upstream isn't called anymore
+    assert get(upstream) == "v1"
+    assert upstream.calls == 4
+    assert resilience.stats == {"stale": 4, "rejected": 1}
+
+
+def test_errors_without_a_last_good_value():
+    with pytest.raises(IOError):
+        get(Upstream(IOError("down")))
+
+
+def test_slow_upstream_is_refreshed_in_the_background():
+    released = threading.Event()
+    upstream = Upstream("v1", released, "v2")
+    assert get(upstream) == "v1"
+
+    assert get(upstream, budget=0.05) == "v1"
+    assert resilience.stats["stale"] == 1
+    released.set()
+    for _ in range(100):
+        if http_cache.peek("http://upstream/listing")["value"] == "v2":
+            break
+        threading.Event().wait(0.01)
+    assert http_cache.peek("http://upstream/listing")["value"] == "v2"
+    assert upstream.calls == 2
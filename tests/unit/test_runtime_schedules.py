@@ -0,0 +1,64 @@
+import json
+
+from aws4home_runtime import clients, schedules
+
+
+class SchedulerStandIn:
+
+    class exceptions:
+
+        class ResourceNotFoundException(Exception):
+            pass
+
+    def __init__(self, names=()):
+        self.schedules = {name: None for name in names}
+        self.created = []
+        self.deleted = []
+
+    def get_paginator(self, operation):
+        stand_in = self
+
+        class Paginator:
+
+            def paginate(self, GroupName, NamePrefix):
+                yield {"Schedules": [{"Name": name} for name in stand_in.schedules if name.startswith(NamePrefix)]}
+
+        return Paginator()
+
+    def create_schedule(self, **kwargs):
+        self.created.append(kwargs)
+        self.schedules[kwargs["Name"]] = kwargs
+
+    def delete_schedule(self, Name, GroupName):
+        self.deleted.append(Name)
+        self.schedules.pop(Name)
+
+
+def teardown_function():
+    clients.reset()
+
+
+def test_at_expression_is_utc():
+    assert schedules.at_expression(1792267200) == "at(2026-10-17T20:00:00)"
+
+
+def test_reconcile_only_touches_changed_entries():
+    unchanged = schedules.Entry(1792267200, {"pattern": "iss.gif", "duration": 300})
+    moved = schedules.Entry(1792270800, {"pattern": "iss.gif", "duration": 240})
+    stand_in = SchedulerStandIn([
+        schedules.schedule_name("iss", unchanged),
+        schedules.schedule_name("iss", moved),
+        "bond-20261017T200000-00000000",
+    ])
+    clients.override("scheduler", stand_in)
+
+    updated = moved._replace(at=moved.at + 60)
+    result = schedules.reconcile("iss", [unchanged, updated], "arn:fn", group="aws4home", role_arn="arn:role")
+
+    assert result == {"created": 1, "deleted": 1, "unchanged": 1}
+    assert stand_in.deleted == [schedules.schedule_name("iss", moved)]
+    created = stand_in.created[0]
+    assert created["ScheduleExpression"] == "at(2026-10-17T21:01:00)"
+    assert created["ActionAfterCompletion"] == "DELETE"
+    assert json.loads(created["Target"]["Input"]) == {"pattern": "iss.gif", "duration": 240, "source": "aws4home.schedule", "prefix": "iss"}
+    assert "bond-20261017T200000-00000000" in stand_in.schedules
@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+
+from aws4home_runtime import stages
+
+
+def test_independent_stages_run_concurrently():
+    barrier = threading.Barrier(2, timeout=2)
+
+    def after_barrier(result):
+        barrier.wait()
+        return result
+
+    results = stages.run([
+        stages.Stage("publish", lambda: after_barrier("published")),
+        stages.Stage("fetch", lambda: after_barrier([1, 2])),
+        stages.Stage("rule", lambda passes: len(passes), ("fetch",)),
+    ])
+
+    assert results == {"publish": "published", "fetch": [1, 2], "rule": 2}
+
+
+def test_optional_stage_timeout_yields_none():
+    errors = []
+    started = time.monotonic()
+
+    results = stages.run([
+        stages.Stage("publish", lambda: time.sleep(1), timeout=0.05, optional=True),
+        stages.Stage("fetch", lambda: "ok"),
+    ], on_error=lambda stage, error: errors.append(stage))
+
+    assert results == {"publish": None, "fetch": "ok"}
+    assert errors == ["publish"]
+    assert time.monotonic() - started < 0.5
+
+
+def test_required_stage_failure_stops_dependents():
+    called = []
+
+    def fail():
+        raise IOError("upstream down")
+
+    with pytest.raises(stages.StageError) as error:
+        stages.run([
+            stages.Stage("fetch", fail),
+            stages.Stage("rule", lambda passes: called.append(passes), ("fetch",)),
+        ])
+
+    assert error.value.stage == "fetch"
+    assert called == []
+
+
+def test_timed_out_stage_is_abandoned():
+    released = threading.Event()
+    late = []
+
+    def slow():
+        released.wait(2)
+        try:
+            stages.check()
+            late.append("called")
+        except stages.StageAbandoned:
+            late.append("abandoned")
+
+    results = stages.run([
+        stages.Stage("rule", slow, timeout=0.05, optional=True),
+        stages.Stage("fetch", lambda: "ok"),
+    ])
+    released.set()
+    for _ in range(200):
+        if late:
+            break
+        time.sleep(0.01)
+
+    assert results == {"rule": None, "fetch": "ok"}
+    assert late == ["abandoned"]
+    # Only stage threads are affected
+    stages.check()
@@ -0,0 +1,101 @@
+import threading
+
+from aws4home_runtime import clients, state
+
+
+class CountingBackend(state.FileBackend):
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.loads = 0
+
+    def load(self):
+        self.loads += 1
+        return super().load()
+
+
+class Route53StandIn:
+
+    def __init__(self):
+        self.calls = []
+
+    def get_hosted_zone(self, **kwargs):
+        self.calls.append("get_hosted_zone")
+        return {"HostedZone": {"Name": "example.com."}}
+
+    def change_resource_record_sets(self, **kwargs):
+        self.calls.append("change_resource_record_sets")
+        self.batch = kwargs["ChangeBatch"]
+
+
+def teardown_function():
+    clients.reset()
+    state._zone_names.clear()
+
+
+def test_reads_are_cached_until_ttl(tmp_path):
+    backend = CountingBackend(str(tmp_path / "state.json"))
+    store = state.StateStore(backend)
+    store.put(duration="120")
+
+    assert store.get("duration") == "120"
+    assert store.get("missing", "0") == "0"
+    assert backend.loads == 1
+
+    fresh = state.StateStore(backend)
+    assert fresh.get("duration") == "120"
+
+
+def test_route53_mirror_looks_up_zone_once(tmp_path):
+    route53 = Route53StandIn()
+    clients.override("route53", route53)
+    mirror = state.Route53Backend("Z1", "iss", ["duration", "risetime"])
+    store = state.StateStore(state.FileBackend(str(tmp_path / "state.json")), mirror=mirror)
+
+    store.put(duration="300", risetime="2026-10-17 20:00:00+02:00")
+    store.put(duration="240")
+
+    assert route53.calls.count("get_hosted_zone") == 1
+    names = [change["ResourceRecordSet"]["Name"] for change in route53.batch["Changes"]]
+    assert names == ["duration.iss.example.com.", "risetime.iss.example.com."]
+    assert route53.batch["Changes"][0]["ResourceRecordSet"]["ResourceRecords"] == [{"Value": '"240"'}]
+
+
+def test_txt_values_are_escaped_and_split():
+    value = '[["home/iss", 300]]' + "x" * 300
+
+    record = state.txt_record(value)
+
+    assert record.startswith('"[[\\"home/iss\\", 300]]')
+    assert record.count('" "') == 1
+    assert state.txt_value(record) == value
+
+
+def test_slow_load_does_not_overwrite_a_concurrent_put(tmp_path):
+    loading = threading.Event()
+    release = threading.Event()
+
+    class SlowBackend(state.FileBackend):
+        def load(self):
+            values = super().load()
+            # Only the first load is slow
+            if not loading.is_set():
+                loading.set()
+                release.wait(2)
+            return values
+
+    backend = SlowBackend(str(tmp_path / "state.json"))
+    backend.save({"risetime": "old"})
+    store = state.StateStore(backend)
+    reader = threading.Thread(target=store.get, args=("risetime",))
+    reader.start()
+    loading.wait(2)
+    writer = threading.Thread(target=store.put, kwargs={"risetime": "new"})
+    writer.start()
+    # Done already without a lock, waiting for the load with one
+    writer.join(0.2)
+    release.set()
+    reader.join(2)
+    writer.join(2)
+
+    assert store.get("risetime") == "new"
@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from aws4home_runtime import timeconv
+
+# 2026-01-01 to 2028-01-01, covers two DST switches each year
+START = 1767225600
+END = 1830297600
+
+
+def reference(name, wall, fold=0):
+    local = datetime(1970, 1, 1) + timedelta(seconds=wall)
+    return int(local.replace(tzinfo=ZoneInfo(name), fold=fold).timestamp())
+
+
+@pytest.mark.parametrize("name", ["Europe/Berlin", "America/New_York", "Australia/Lord_Howe", "UTC"])
+def test_matches_zoneinfo_around_every_transition(name):
+    zone = timeconv.Zone(name, START, END)
+    walls = [START + day * 86400 + 37 * 60 for day in range(2, 700, 5)]
+    for transition, offset in zip(zone.transitions, zone.offsets):
+        walls += [transition + offset + delta for delta in range(-7200, 7201, 600)]
+    for fold in (0, 1):
+        assert zone.to_utc_many(walls, fold) == [reference(name, wall, fold) for wall in walls]
+
+
+def test_ambiguous_and_missing_times():
+    zone = timeconv.Zone("Europe/Berlin", START, END)
+    # 2026-10-25 02:30 happens twice, first in CEST
+    assert zone.to_utc(timeconv.wall(2026, 10, 25, 2, 30)) == timeconv.wall(2026, 10, 25, 0, 30)
+    assert zone.to_utc(timeconv.wall(2026, 10, 25, 2, 30), fold=1) == timeconv.wall(2026, 10, 25, 1, 30)
+    # 2026-03-29 02:30 doesn't exist, read as CET, i.e. 03:30 CEST
+    assert zone.to_utc(timeconv.wall(2026, 3, 29, 2, 30)) == timeconv.wall(2026, 3, 29, 1, 30)
+
+
+def test_outside_of_the_table():
+    zone = timeconv.Zone("Europe/Berlin", START, END)
+    wall = timeconv.wall(2030, 7, 1, 12)
+    assert zone.to_utc(wall) == reference("Europe/Berlin", wall)
+    assert zone.offset(wall) == 7200
+
+
+def test_expressions():
+    utc = timeconv.wall(2026, 3, 9, 7, 5, 59)
+    assert timeconv.cron(utc) == "cron(5 7 9 3 ? 2026)"
+    assert timeconv.at(utc) == "at(2026-03-09T07:05:59)"
@@ -0,0 +1,66 @@
+from aws4home_runtime import timeline
+
+PRIORITIES = {"iss": 3, "lunar": 2, "bond": 1}
+
+
+def event(start, duration, source, topic="home"):
+    return timeline.Event(start, duration, source, topic, f"{source}.gif")
+
+
+def spans(slots):
+    return [(slot.start, slot.end, slot.event.source) for slot in slots]
+
+
+def test_merge_keeps_start_order_across_sources():
+    bond = [event(100, 50, "bond"), event(400, 50, "bond")]
+    iss = [event(120, 10, "iss"), event(300, 10, "iss")]
+    lunar = [event(50, 10, "lunar")]
+    assert [e.start for e in timeline.merge(bond, iss, lunar)] == [50, 100, 120, 300, 400]
+
+
+def test_higher_priority_preempts_and_the_rest_resumes():
+    events = timeline.merge([event(0, 100, "bond")], [event(30, 20, "iss")], [event(40, 20, "lunar")])
+    assert spans(timeline.resolve(events, PRIORITIES)) == [(0, 30, "bond"), (30, 50, "iss"), (50, 60, "lunar"), (60, 100, "bond")]
+
+
+def test_without_preemption_the_running_event_finishes_first():
+    events = timeline.merge([event(0, 100, "bond")], [event(30, 100, "iss")])
+    assert spans(timeline.resolve(events, PRIORITIES, preempt=False)) == [(0, 100, "bond"), (100, 130, "iss")]
+
+
+def test_equal_priority_and_other_topics_do_not_interrupt():
+    events = timeline.merge([event(0, 100, "bond"), event(50, 100, "bond")], [event(20, 10, "iss", topic="office")])
+    assert spans(timeline.resolve(events, PRIORITIES)) == [(0, 100, "bond"), (20, 30, "iss"), (100, 150, "bond")]
+
+
+def test_next_slot_and_window_queries():
+    built = timeline.build(timeline.merge([event(start, 30, "bond") for start in range(0, 1000, 100)], [event(500, 200, "iss", topic="office")]), PRIORITIES)
+    assert built.slots[timeline.next_slot(built, 250)].start == 300
+    assert timeline.next_slot(built, 900) == len(built.slots)
+    # The long ISS slot started before the window and still runs
+    assert spans(timeline.window(built, 610, 720)) == [(500, 700, "iss"), (600, 630, "bond"), (700, 730, "bond")]
+    assert timeline.window(built, 940, 1000) == []
+
+
+def test_events_are_stored_per_source_and_the_rule_points_at_the_next_slot(tmp_path, monkeypatch):
+    monkeypatch.setattr(timeline, "TIMELINE_PREFIX", "timeline")
+    monkeypatch.setattr(timeline, "BACKEND", "file")
+    monkeypatch.setattr(timeline, "FILE_DIR", str(tmp_path))
+    monkeypatch.setattr(timeline, "SOURCES", ["bond", "iss"])
+    monkeypatch.setattr(timeline, "PRIORITIES", PRIORITIES)
+    rules = {}
+
+    class Events:
+        def put_rule(self, Name, ScheduleExpression, **kwargs):
+            rules[Name] = ScheduleExpression
+
+    monkeypatch.setattr(timeline.clients, "get", lambda service: Events())
+    monkeypatch.setattr(timeline.dedupe, "write_once", lambda key, value, write: write())
+
+    now = 1800000000
+    timeline.update("bond", [event(now - 7200, 600, "bond"), event(now + 3600, 7200, "bond")], now, "rate(30 minutes)")
+    assert rules == {"timeline": timeline.timeconv.cron(now + 3600)}
+    timeline.update("iss", [event(now + 600, 300, "iss")], now, "rate(30 minutes)")
+    assert rules == {"timeline": timeline.timeconv.cron(now + 600)}
+    # The past Bond show wasn't stored
+    assert [e.start for e in timeline.load()] == [now + 600, now + 3600]